@@ -1,37 +1,48 @@
 
 import os
+import json
+import queue
 import time
+import uuid
+import hashlib
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from enum import Enum
 from dataclasses import dataclass
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from importlib import import_module
 from config.sahayak_config import SahayakConfig
 
 from .agent_router import AgentRouter, AgentType, RouteIntent
-from .doubt_assistant_agent import DoubtAssistantAgent
-from .content_generation_agent import ContentGenerationAgent
-from .vision_agent import GeminiVisionAgent
-from .lesson_planner_agent import LessonPlannerAgent
-from .drawings_agent import DrawingsAgent
-from .mindmap_agent import MindMapAgent
-from .base_agent import BaseAgent
-from .rag_agent import RAGAgent
-from .braille_assistant_agent import BrailleAssistantAgent
-from .game_planner_agent import GamePlannerAgent
-
-class TaskStatus(Enum):
-    PENDING = "pending"
-    RUNNING = "running"
-    COMPLETED = "completed"
-    FAILED = "failed"
-    CANCELLED = "cancelled"
-
-class TaskPriority(Enum):
-    LOW = 1
-    NORMAL = 2
-    HIGH = 3
-    URGENT = 4
+from .base_agent import BaseAgent, find_model_error, get_coalescing_stats, get_hedge_stats
+from .task_scheduler import ANONYMOUS_TEACHER, TaskScheduler, TaskStatus, TaskPriority, AgentTask, AdmissionError
+from .rate_limiter import get_model_rate_limiter
+from .circuit_breaker import CircuitState, get_circuit_states
+from .extraction_cache import get_extraction_cache_stats
+from .image_preprocessing import get_image_preprocessing_stats
+from .llm_backend import get_context_cache_stats
+from .latency_stats import RequestStats
+from .tracing import current_span, propagate, start_span
+from .usage_accounting import get_usage_stats, usage_scope
+from .pipeline import PipelineStep, resolve_input, textbook_pipeline, validate_pipeline
+
+# Agents are imported and constructed on first use; see AgentManager.get_agent
+AGENT_FACTORIES = {
+    AgentType.DOUBT_ASSISTANT: ('doubt_assistant_agent', 'DoubtAssistantAgent'),
+    AgentType.CONTENT_GENERATION: ('content_generation_agent', 'ContentGenerationAgent'),
+    AgentType.VISION_AGENT: ('vision_agent', 'GeminiVisionAgent'),
+    AgentType.LESSON_PLANNER: ('lesson_planner_agent', 'LessonPlannerAgent'),
+    AgentType.DRAWINGS_AGENT: ('drawings_agent', 'DrawingsAgent'),
+    AgentType.MINDMAP_AGENT: ('mindmap_agent', 'MindMapAgent'),
+    AgentType.BRAILLE_ASSISTANT: ('braille_assistant_agent', 'BrailleAssistantAgent'),
+    AgentType.RAG: ('rag_agent', 'RAGAgent'),
+    AgentType.GAME_PLANNER: ('game_planner_agent', 'GamePlannerAgent'),
+}
+
+def _agent_class(module_name: str, class_name: str):
+    return getattr(import_module(f".{module_name}", __package__), class_name)
 
 @dataclass
 class AgentResponse:
@@ -50,53 +61,177 @@ class AgentManager:
         self.router = AgentRouter()
         self.agents = {}
         self.agent_stats = {}
-        self.execution_history = []
+        # Bounded history; old entries fall off the front in O(1)
+        self.execution_history = deque(maxlen=SahayakConfig.PERFORMANCE_CONFIG.get('execution_history_size', 1000))
+        self.latency_by_agent: Dict[str, RequestStats] = {}
+        self.latency_by_route_source: Dict[str, RequestStats] = {}
+        self._stats_lock = threading.Lock()
 
-        self._initialize_agents()
-
-    def _initialize_agents(self):
-        try:
-            self.agents = {
-                AgentType.DOUBT_ASSISTANT: DoubtAssistantAgent(),
-                AgentType.CONTENT_GENERATION: ContentGenerationAgent(),
-                AgentType.VISION_AGENT: GeminiVisionAgent(),
-                AgentType.LESSON_PLANNER: LessonPlannerAgent(),
-                AgentType.DRAWINGS_AGENT: DrawingsAgent(),
-                AgentType.MINDMAP_AGENT: MindMapAgent(),
-                AgentType.BRAILLE_ASSISTANT: BrailleAssistantAgent(),
-                AgentType.RAG: RAGAgent(),
-                AgentType.GAME_PLANNER: GamePlannerAgent(),
-            }
+        # Agent calls run on per-agent worker pools in priority order
+        self.scheduler = TaskScheduler(**SahayakConfig.SCHEDULER_CONFIG)
 
-            for agent_type in self.agents.keys():
-                self.agent_stats[agent_type.value] = {
-                    'total_requests': 0,
-                    'successful_requests': 0,
-                    'failed_requests': 0,
-                    'avg_response_time': 0.0,
-                    'last_used': None
-                }
+        self._initialize_agents()
 
-            self.logger.info(f"Initialized {len(self.agents)} agents successfully")
+        warm_up_agents = SahayakConfig.PERFORMANCE_CONFIG.get('warm_up_agents', [])
+        if warm_up_agents:
+            self.warm_up([AgentType(name) for name in warm_up_agents], background=True)
 
-        except Exception as e:
-            self.logger.error(f"Error initializing agents: {str(e)}")
+    def _initialize_agents(self):
+        """Register agent factories; nothing is imported or constructed until first use"""
+        self._agent_factories: Dict[AgentType, Callable[[], BaseAgent]] = {}
+        self._agent_locks: Dict[AgentType, threading.Lock] = {}
+
+        for agent_type, (module_name, class_name) in AGENT_FACTORIES.items():
+            self.register_agent(
+                agent_type,
+                lambda module_name=module_name, class_name=class_name: _agent_class(module_name, class_name)()
+            )
 
-    def process_request(self, user_request: str, context: Dict = None, priority: TaskPriority = TaskPriority.NORMAL) -> AgentResponse:
+        self.logger.info(f"Registered {len(self._agent_factories)} agents")
+
+    def register_agent(self, agent_type: AgentType, factory: Callable[[], BaseAgent]):
+        """Register (or replace) the factory used to build an agent on first use"""
+        self._agent_factories[agent_type] = factory
+        self._agent_locks.setdefault(agent_type, threading.Lock())
+        self.agents.pop(agent_type, None)
+        self.agent_stats.setdefault(agent_type.value, {
+            'total_requests': 0,
+            'successful_requests': 0,
+            'failed_requests': 0,
+            'avg_response_time': 0.0,
+            'last_used': None
+        })
+
+    def get_agent(self, agent_type: AgentType) -> Optional[BaseAgent]:
+        """Return the agent for a type, constructing it on first use"""
+        agent = self.agents.get(agent_type)
+        if agent is not None:
+            return agent
+
+        factory = self._agent_factories.get(agent_type)
+        if factory is None:
+            return None
+
+        with self._agent_locks[agent_type]:
+            if agent_type not in self.agents:
+                start_time = time.time()
+                self.agents[agent_type] = factory()
+                self.logger.info(f"Initialized {agent_type.value} in {time.time() - start_time:.2f}s")
+        return self.agents[agent_type]
+
+    def warm_up(self, agent_types: List[AgentType] = None, background: bool = False) -> Dict[str, str]:
+        """Construct agents ahead of their first request
+
+        Agents exposing warm_up() (e.g. RAGAgent loading its embedding model)
+        also get that called. With background=True this returns immediately.
+        """
+        agent_types = agent_types or list(self._agent_factories)
+
+        if background:
+            threading.Thread(target=self.warm_up, args=(agent_types,), name="agent-warm-up", daemon=True).start()
+            return {agent_type.value: 'warming' for agent_type in agent_types}
+
+        status = {}
+        for agent_type in agent_types:
+            try:
+                agent = self.get_agent(agent_type)
+                if hasattr(agent, 'warm_up'):
+                    agent.warm_up()
+                status[agent_type.value] = 'ready'
+            except Exception as e:
+                self.logger.error(f"Error warming up {agent_type.value}: {str(e)}")
+                status[agent_type.value] = f'error: {str(e)}'
+        return status
+
+    @staticmethod
+    def _fairness_key(context: Dict) -> str:
+        """Who a request is queued for: its teacher, else its session, else the shared anonymous key"""
+        if context.get('teacher_id'):
+            return context['teacher_id']
+        if context.get('session_id'):
+            return f"session:{context['session_id']}"
+        return ANONYMOUS_TEACHER
+
+    def submit_request(self, user_request: str, context: Dict = None,
+                       priority: TaskPriority = TaskPriority.NORMAL) -> AgentTask:
+        """Route a request and queue it on the chosen agent's worker pool
+
+        Returns a task handle immediately; call wait() on it for the
+        AgentResponse or cancel_task() while it is still pending.
+        Raises AdmissionError when the queue is full.
+        """
         context = context or {}
         start_time = time.time()
 
-        try:
+        with start_span("router.route_request", request_chars=len(user_request)) as span, \
+                usage_scope(teacher_id=context.get('teacher_id'), session_id=context.get('session_id'),
+                            language=context.get('language')):
             routing_result = self.router.route_request(user_request, context)
+            span.set_attributes(agent=routing_result.agent_type.value, confidence=routing_result.confidence,
+                                source=routing_result.source)
+
+        if not self.router.validate_routing(routing_result):
+            self.logger.warning(f"Low confidence routing: {routing_result.confidence}")
+
+        return self.scheduler.submit(
+            routing_result.agent_type.value,
+            propagate(lambda: self._run_task(routing_result, user_request, context, start_time)),
+            priority=priority,
+            teacher_id=self._fairness_key(context)
+        )
+
+    def _run_task(self, routing_result: RouteIntent, user_request: str, context: Dict,
+                  start_time: float) -> AgentResponse:
+        # Model calls made by the agent are charged to this teacher, session and language
+        scope = usage_scope(teacher_id=context.get('teacher_id'), session_id=context.get('session_id'),
+                            language=context.get('language') or routing_result.parameters.get('language'))
+        with scope, start_span("agent.execute", agent=routing_result.agent_type.value) as span:
+            response = self._execute_agent_task(routing_result, user_request, context=context)
+            span.set_attribute('success', response.success)
+            if not response.success:
+                span.set_error(response.error or "failed")
 
-            if not self.router.validate_routing(routing_result):
-                self.logger.warning(f"Low confidence routing: {routing_result.confidence}")
+        self._update_agent_stats(routing_result.agent_type, response, time.time() - start_time,
+                                 route_source=routing_result.source)
+        self._log_execution(user_request, routing_result, response, context)
 
-            response = self._execute_agent_task(routing_result, user_request, context=context)
+        return response
 
-            self._update_agent_stats(routing_result.agent_type, response, time.time() - start_time)
-            self._log_execution(user_request, routing_result, response, context)
+    def process_request(self, user_request: str, context: Dict = None, priority: TaskPriority = TaskPriority.NORMAL) -> AgentResponse:
+        context = context or {}
+        with start_span("agent_manager.process_request", priority=priority.name, request_chars=len(user_request),
+                        teacher_id=context.get('teacher_id', 'anonymous')) as span:
+            response = self._process_request(user_request, context, priority)
+            queue_wait = (response.metadata or {}).get('queue_wait')
+            span.set_attributes(agent=response.agent_name, success=response.success,
+                                queue_wait_ms=round(queue_wait * 1000, 3) if queue_wait is not None else None)
+            if not response.success:
+                span.set_error(response.error or "failed")
+            return response
+
+    def _process_request(self, user_request: str, context: Dict, priority: TaskPriority) -> AgentResponse:
+        start_time = time.time()
 
+        try:
+            task = self.submit_request(user_request, context, priority)
+            response = task.wait()
+
+            if task.status != TaskStatus.COMPLETED:
+                return AgentResponse(
+                    success=False,
+                    data=None,
+                    agent_name="AgentManager",
+                    execution_time=time.time() - start_time,
+                    error=task.error or f"Task {task.status.value}",
+                    metadata={'task_id': task.task_id}
+                )
+
+            response.metadata = {
+                **(response.metadata or {}),
+                'task_id': task.task_id,
+                'priority': priority.name,
+                'queue_wait': task.queue_wait
+            }
             return response
 
         except Exception as e:
@@ -109,10 +244,313 @@ class AgentManager:
                 error=str(e)
             )
 
+    def get_task_status(self, task_id: str) -> Optional[Dict]:
+        task = self.scheduler.get_task(task_id)
+        return task.to_dict() if task else None
+
+    def cancel_task(self, task_id: str) -> bool:
+        """Cancel a queued request; requests already running are not interrupted"""
+        return self.scheduler.cancel(task_id)
+
+    def _normalize_batch_item(self, item) -> Tuple[str, Dict]:
+        if isinstance(item, str):
+            return item, {}
+        return item['request'], item.get('context') or {}
+
+    def _batch_key(self, request: str, context: Dict) -> str:
+        payload = json.dumps({'request': request.strip(), 'context': context}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _load_batch_checkpoint(self, checkpoint_path: Optional[str]) -> Dict[str, Dict]:
+        completed = {}
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        completed[record['key']] = record
+        return completed
+
+    def process_batch(self, requests: List, concurrency: int = 4,
+                      on_result: Optional[Callable[[Dict], None]] = None,
+                      checkpoint_path: Optional[str] = None,
+                      agent_type: Optional[AgentType] = None,
+                      priority: TaskPriority = TaskPriority.LOW) -> Dict:
+        """
+        Run many requests offline, e.g. FAQ answers or stories per topic and language.
+
+        Args:
+            requests: Request strings or dicts with 'request' and optional 'context'
+            concurrency: Maximum requests in flight at once
+            on_result: Called with each result as soon as it completes
+            checkpoint_path: JSONL file of finished results; rerunning with the
+                same path skips work that already completed
+            agent_type: Skip routing and send every request to this agent
+            priority: Scheduler priority; LOW keeps bulk work behind interactive use
+
+        Returns:
+            Dict with per-request results in input order and throughput figures
+        """
+        start_time = time.time()
+        batch_id = f"batch-{uuid.uuid4().hex[:8]}"
+        # Each in-flight request counts as pending for this batch in the scheduler
+        concurrency = max(1, min(concurrency, self.scheduler.max_pending_per_teacher))
+
+        items = [self._normalize_batch_item(item) for item in requests]
+        keys = [self._batch_key(request, context) for request, context in items]
+        unique = {}
+        for key, item in zip(keys, items):
+            unique.setdefault(key, item)
+
+        completed = self._load_batch_checkpoint(checkpoint_path)
+        pending = [key for key in unique if key not in completed]
+        skipped = len(unique) - len(pending)
+        self.logger.info(f"{batch_id}: {len(items)} requests, {len(unique)} unique, {skipped} already checkpointed")
+
+        results_lock = threading.Lock()
+        checkpoint_file = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+
+        def route(key: str) -> RouteIntent:
+            request, context = unique[key]
+            if agent_type is not None:
+                return RouteIntent(agent_type=agent_type, confidence=1.0, parameters={},
+                                   reasoning="Agent fixed for batch request", source="fixed")
+            get_model_rate_limiter(self.router.model).acquire()
+            return self.router.route_request(request, context)
+
+        def run(key: str, routing_result: RouteIntent) -> Dict:
+            request, context = unique[key]
+            agent = self.get_agent(routing_result.agent_type)
+            if agent is not None:
+                get_model_rate_limiter(agent.model).acquire()
+
+            while True:
+                try:
+                    task = self.scheduler.submit(
+                        routing_result.agent_type.value,
+                        propagate(lambda: self._run_task(routing_result, request, context, time.time())),
+                        priority=priority,
+                        teacher_id=batch_id
+                    )
+                    break
+                except AdmissionError:
+                    time.sleep(1.0)  # Interactive traffic filled the queue; back off
+
+            response = task.wait()
+            return {
+                'key': key,
+                'request': request,
+                'agent': routing_result.agent_type.value,
+                'success': bool(response and response.success),
+                'data': response.data if response else None,
+                'error': response.error if response else task.error,
+                'execution_time': response.execution_time if response else None
+            }
+
+        def process(key: str) -> Dict:
+            # Route and run one item end to end, so results stream and are
+            # checkpointed from the first item on, and one failure stays one record
+            routing_result = None
+            try:
+                routing_result = route(key)
+                record = run(key, routing_result)
+            except Exception as e:
+                self.logger.error(f"{batch_id}: request {key[:12]} failed: {str(e)}")
+                record = {
+                    'key': key,
+                    'request': unique[key][0],
+                    'agent': routing_result.agent_type.value if routing_result else None,
+                    'success': False,
+                    'data': None,
+                    'error': str(e),
+                    'execution_time': None
+                }
+
+            with results_lock:
+                completed[key] = record
+                if checkpoint_file:
+                    try:
+                        checkpoint_file.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+                        checkpoint_file.flush()
+                    except Exception as e:
+                        self.logger.error(f"{batch_id}: could not checkpoint {key[:12]}: {str(e)}")
+                if on_result:
+                    try:
+                        on_result(record)
+                    except Exception as e:
+                        self.logger.error(f"{batch_id}: on_result failed for {key[:12]}: {str(e)}")
+            return record
+
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(propagate(process), pending))
+        finally:
+            if checkpoint_file:
+                checkpoint_file.close()
+
+        elapsed = time.time() - start_time
+        results = [completed[key] for key in keys]
+        by_agent = {}
+        for key in unique:
+            agent_name = completed[key]['agent']
+            if agent_name is not None:  # None: failed before routing
+                by_agent[agent_name] = by_agent.get(agent_name, 0) + 1
+
+        return {
+            'batch_id': batch_id,
+            'total_requests': len(items),
+            'unique_requests': len(unique),
+            'skipped_from_checkpoint': skipped,
+            'executed': len(pending),
+            'successful': sum(1 for key in unique if completed[key]['success']),
+            'failed': sum(1 for key in unique if not completed[key]['success']),
+            'by_agent': by_agent,
+            'elapsed_seconds': round(elapsed, 3),
+            'requests_per_second': round(len(pending) / elapsed, 3) if elapsed > 0 else None,
+            'results': results
+        }
+
+    def run_pipeline(self, steps: List[PipelineStep], user_request: str = "", context: Dict = None,
+                     priority: TaskPriority = TaskPriority.NORMAL) -> Dict:
+        """
+        Run dependent agent calls as a DAG, e.g. textbook_pipeline(image_path).
+
+        The request is routed once and the routed parameters (language, grade
+        level, ...) are shared by every step. A step is queued as soon as its
+        dependencies finish, so independent branches run concurrently on their
+        agents' worker pools, and outputs are handed to later steps without
+        calling the model again. Steps downstream of a failure are skipped.
+        """
+        with start_span("agent_manager.run_pipeline", steps=len(steps), priority=priority.name) as span:
+            result = self._run_pipeline(steps, user_request, context or {}, priority)
+            span.set_attributes(pipeline_id=result['pipeline_id'], status=result['status'])
+            if result['status'] == 'error':
+                span.set_error("No pipeline step completed")
+            return result
+
+    def _run_pipeline(self, steps: List[PipelineStep], user_request: str, context: Dict,
+                      priority: TaskPriority) -> Dict:
+        start_time = time.time()
+        pipeline_id = f"pipeline-{uuid.uuid4().hex[:8]}"
+        order = validate_pipeline(steps)
+        by_name = {step.name: step for step in steps}
+
+        if user_request:
+            with usage_scope(teacher_id=context.get('teacher_id'), session_id=context.get('session_id'),
+                             language=context.get('language')):
+                routing_result = self.router.route_request(user_request, context)
+        else:
+            untyped = [step.name for step in steps if step.agent_type is None]
+            if untyped:
+                raise ValueError(f"Steps {untyped} have no agent_type and there is no request to route")
+            routing_result = RouteIntent(agent_type=steps[0].agent_type, confidence=1.0, parameters={},
+                                         reasoning="Agents fixed by pipeline", source="fixed")
+
+        outputs: Dict[str, Any] = {}
+        records: Dict[str, Dict] = {}
+        running: Dict[str, AgentTask] = {}
+        finished = queue.Queue()
+        remaining = list(order)
+
+        def run_step(name: str, step_routing: RouteIntent, request: str, step_context: Dict) -> AgentResponse:
+            try:
+                with start_span("pipeline.step", pipeline_id=pipeline_id, step=name):
+                    return self._run_task(step_routing, request, step_context, time.time())
+            finally:
+                finished.put(name)
+
+        while remaining or running:
+            # Steps are visited in topological order, so skips cascade in one pass
+            for name in list(remaining):
+                step = by_name[name]
+                deps = step.dependencies
+                if any(records.get(dep, {}).get('status') in ('failed', 'skipped') for dep in deps):
+                    remaining.remove(name)
+                    records[name] = {'status': 'skipped', 'agent': None, 'data': None,
+                                     'error': 'A dependency did not complete', 'depends_on': deps}
+                    continue
+                if not all(dep in outputs for dep in deps):
+                    continue
+
+                remaining.remove(name)
+                agent_type = step.agent_type or routing_result.agent_type
+                try:
+                    resolved = {param: resolve_input(ref, outputs) for param, ref in step.inputs.items()}
+                    request = resolved.pop('request', None) or step.request or user_request
+                    step_routing = RouteIntent(
+                        agent_type=agent_type,
+                        confidence=routing_result.confidence,
+                        parameters=routing_result.parameters,
+                        reasoning=f"{pipeline_id} step '{name}': {routing_result.reasoning}",
+                        source="pipeline"
+                    )
+                    step_context = {**context, **step.parameters, **resolved}
+                    running[name] = self.scheduler.submit(
+                        agent_type.value,
+                        propagate(lambda name=name, r=step_routing, q=request, c=step_context: run_step(name, r, q, c)),
+                        priority=priority,
+                        teacher_id=self._fairness_key(context)
+                    )
+                except Exception as e:
+                    records[name] = {'status': 'failed', 'agent': agent_type.value, 'data': None,
+                                     'error': str(e), 'depends_on': deps}
+
+            if not running:
+                continue
+
+            name = finished.get()
+            task = running.pop(name)
+            task.wait()
+            response = task.result
+            data = response.data if response else None
+            succeeded = (task.status == TaskStatus.COMPLETED and response.success
+                         and not (isinstance(data, dict) and data.get('status') == 'error'))
+            if succeeded:
+                outputs[name] = data
+
+            records[name] = {
+                'status': 'completed' if succeeded else 'failed',
+                'agent': by_name[name].agent_type.value if by_name[name].agent_type else routing_result.agent_type.value,
+                'data': data,
+                'error': None if succeeded else (
+                    (response.error if response else task.error) or (data or {}).get('error')
+                ),
+                'execution_time': response.execution_time if response else None,
+                'queue_wait': task.queue_wait,
+                'task_id': task.task_id,
+                'depends_on': by_name[name].dependencies
+            }
+
+        num_completed = sum(1 for record in records.values() if record['status'] == 'completed')
+        if num_completed == len(steps):
+            status = 'success'
+        elif num_completed:
+            status = 'partial'
+        else:
+            status = 'error'
+
+        return {
+            'pipeline_id': pipeline_id,
+            'status': status,
+            'routing': {
+                'agent_type': routing_result.agent_type.value,
+                'confidence': routing_result.confidence,
+                'parameters': routing_result.parameters
+            },
+            'steps': {name: records[name] for name in order},
+            'elapsed_seconds': round(time.time() - start_time, 3),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def process_textbook_page(self, image_path: str, target_grades: List[int] = None,
+                              context: Dict = None, **kwargs) -> Dict:
+        """Extract a page once and derive worksheets, a mind map and Braille from it in parallel"""
+        return self.run_pipeline(textbook_pipeline(image_path, target_grades, **kwargs), context=context)
+
     def _execute_agent_task(self, routing_result: RouteIntent, original_request: str, context: Dict = None) -> AgentResponse:
         context = context or {}
         agent_type = routing_result.agent_type
-        agent = self.agents.get(agent_type)
+        agent = self.get_agent(agent_type)
 
         if not agent:
             raise ValueError(f"Agent {agent_type.value} not found")
@@ -123,11 +561,31 @@ class AgentManager:
             method_name, parameters = self._prepare_agent_call(agent_type, merged_params, original_request)
 
             self.logger.info(f"Calling method '{method_name}' on {agent_type.value} with parameters: {parameters}")
+            current_span().set_attribute('method', method_name)
 
             method = getattr(agent, method_name)
-            result = method(**parameters)
+            with usage_scope(method=method_name):
+                result = method(**parameters)
 
             execution_time = time.time() - start_time
+
+            # Agents report model failures inside their results; count them as failures
+            model_error = find_model_error(result)
+            if model_error is not None or (isinstance(result, dict) and result.get('status') == 'error'):
+                return AgentResponse(
+                    success=False,
+                    data=result,
+                    agent_name=agent.name,
+                    execution_time=execution_time,
+                    error=model_error.message if model_error is not None else str(result.get('error')),
+                    metadata={
+                        'routing_confidence': routing_result.confidence,
+                        'parameters_used': parameters,
+                        'error_type': model_error.error_type if model_error is not None else 'agent_error',
+                        'attempts': model_error.attempts if model_error is not None else None
+                    }
+                )
+
             return AgentResponse(
                 success=True,
                 data=result,
@@ -169,6 +627,13 @@ class AgentManager:
             }
             if task_type == 'generate_worksheets':
                 call_params['target_grades'] = parameters.get('target_grades', [3, 5])
+                if parameters.get('worksheet_mode'):
+                    call_params['worksheet_mode'] = parameters['worksheet_mode']
+            elif task_type == 'digitize_textbook':
+                call_params.update({key: parameters.get(key) for key in ('image_dir', 'images', 'book_name')})
+                call_params['add_to_knowledge_base'] = parameters.get('add_to_knowledge_base', False)
+                if call_params['add_to_knowledge_base']:
+                    call_params['rag_agent'] = self.get_agent(AgentType.RAG)
             return 'process_vision_task', call_params
 
         method_mappings = {
@@ -234,18 +699,24 @@ class AgentManager:
 
         return method_mappings.get(agent_type, ('process_request', {'request': original_request}))
 
-    def _update_agent_stats(self, agent_type: AgentType, response: AgentResponse, execution_time: float):
-        stats = self.agent_stats[agent_type.value]
-        stats['total_requests'] += 1
-        if response.success:
-            stats['successful_requests'] += 1
-        else:
-            stats['failed_requests'] += 1
-
-        total_requests = stats['total_requests']
-        current_avg = stats['avg_response_time']
-        stats['avg_response_time'] = (current_avg * (total_requests - 1) + execution_time) / total_requests
-        stats['last_used'] = datetime.now().isoformat()
+    def _update_agent_stats(self, agent_type: AgentType, response: AgentResponse, execution_time: float,
+                            route_source: str = "model"):
+        with self._stats_lock:
+            failed = not response.success
+            self.latency_by_agent.setdefault(agent_type.value, RequestStats()).record(execution_time, failed)
+            self.latency_by_route_source.setdefault(route_source, RequestStats()).record(execution_time, failed)
+
+            stats = self.agent_stats[agent_type.value]
+            stats['total_requests'] += 1
+            if response.success:
+                stats['successful_requests'] += 1
+            else:
+                stats['failed_requests'] += 1
+
+            total_requests = stats['total_requests']
+            current_avg = stats['avg_response_time']
+            stats['avg_response_time'] = (current_avg * (total_requests - 1) + execution_time) / total_requests
+            stats['last_used'] = datetime.now().isoformat()
 
     def _log_execution(self, request: str, routing_result: RouteIntent, response: AgentResponse, context: Dict = None):
         log_entry = {
@@ -253,21 +724,42 @@ class AgentManager:
             'request': request,
             'agent_used': routing_result.agent_type.value,
             'routing_confidence': routing_result.confidence,
+            'route_source': routing_result.source,
             'success': response.success,
             'execution_time': response.execution_time,
             'context': context,
             'error': response.error
         }
-        self.execution_history.append(log_entry)
-        if len(self.execution_history) > 1000:
-            self.execution_history = self.execution_history[-1000:]
+        with self._stats_lock:
+            self.execution_history.append(log_entry)
+
+    def get_execution_history(self, agent_type: Optional[AgentType] = None, limit: int = 50,
+                              failures_only: bool = False) -> List[Dict]:
+        """Most recent executions first, optionally for one agent or only failures"""
+        with self._stats_lock:
+            entries = list(self.execution_history)
+
+        history = []
+        for entry in reversed(entries):
+            if agent_type is not None and entry['agent_used'] != agent_type.value:
+                continue
+            if failures_only and entry['success']:
+                continue
+            history.append(entry)
+            if len(history) >= limit:
+                break
+        return history
 
     def list_available_agents(self) -> Dict[str, str]:
-        return {
-            agent_type.value: agent.description
-            for agent_type, agent in self.agents.items()
-            if agent is not None
-        }
+        available = {}
+        for agent_type in self._agent_factories:
+            agent = self.agents.get(agent_type)
+            if agent is not None:
+                available[agent_type.value] = agent.description
+            else:
+                module_name, class_name = AGENT_FACTORIES.get(agent_type, (None, agent_type.value))
+                available[agent_type.value] = f"{class_name} (loads on first use)"
+        return available
 
     def health_check(self) -> Dict:
         health_status = {
@@ -276,7 +768,11 @@ class AgentManager:
             'issues': []
         }
 
-        for agent_type, agent in self.agents.items():
+        for agent_type in self._agent_factories:
+            agent = self.agents.get(agent_type)
+            if agent is None:
+                health_status['agent_status'][agent_type.value] = 'not_loaded'
+                continue
             try:
                 if hasattr(agent, 'health_check'):
                     agent_health = agent.health_check()
@@ -287,13 +783,31 @@ class AgentManager:
                 health_status['agent_status'][agent_type.value] = 'error'
                 health_status['issues'].append(f"{agent_type.value}: {str(e)}")
 
+        health_status['circuit_breakers'] = get_circuit_states()
+        for model_name, circuit in health_status['circuit_breakers'].items():
+            if circuit['state'] != CircuitState.CLOSED.value:
+                health_status['issues'].append(f"Model {model_name} circuit is {circuit['state']}")
+
         if health_status['issues']:
             health_status['system_status'] = 'degraded'
 
         return health_status
 
     def get_agent_stats(self) -> Dict:
+        with self._stats_lock:
+            latency = {
+                'by_agent': {name: stats.to_dict() for name, stats in self.latency_by_agent.items()},
+                'by_route_source': {name: stats.to_dict() for name, stats in self.latency_by_route_source.items()}
+            }
         return {
             'total_requests': sum(a['total_requests'] for a in self.agent_stats.values()),
             'agent_statistics': self.agent_stats,
+            'latency': latency,
+            'scheduler': self.scheduler.get_stats(),
+            'request_coalescing': get_coalescing_stats(),
+            'hedging': get_hedge_stats(),
+            'usage': get_usage_stats(top=20),
+            'context_cache': get_context_cache_stats(),
+            'image_preprocessing': get_image_preprocessing_stats(),
+            'extraction_cache': get_extraction_cache_stats(),
         }
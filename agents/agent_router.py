@@ -1,18 +1,19 @@
 # Intelligent Agent Routing System
-import google.generativeai as genai
 import json
-import re
+import time
 from typing import Dict, List, Optional, Tuple
 from enum import Enum
 from dataclasses import dataclass
 import os
 from datetime import datetime
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, ModelError
+from agents.circuit_breaker import get_circuit_breaker, get_model_candidates
+from agents.llm_backend import get_llm_backend
+from agents.prompts import get_prompt, render_prompt
+from agents.structured_output import StructuredOutputError, parse_structured, response_schema, to_dict
+from agents.tracing import start_span
+from agents.usage_accounting import check_budget, record_usage
 from config.sahayak_config import SahayakConfig
-from sentence_transformers import SentenceTransformer
 
 class AgentType(Enum):
     """Available agent types in Sahayak system"""
@@ -35,6 +36,25 @@ class RouteIntent:
     confidence: float
     parameters: Dict
     reasoning: str
+    source: str = "model"  # how the route was decided: model, keyword, context, fallback, fixed, pipeline
+
+@dataclass
+class RouteParameters:
+    """Request details the model extracts; empty strings mean not mentioned"""
+    language: str = "english"
+    grade_level: int = 5
+    subject: str = ""
+    specific_topic: str = ""
+    context: str = ""
+    additional_info: str = ""
+
+@dataclass
+class RouteDecision:
+    """Intent classification as the model returns it in JSON mode"""
+    agent_type: AgentType
+    confidence: float
+    parameters: RouteParameters
+    reasoning: str
 
 class AgentRouter:
     """
@@ -44,89 +64,7 @@ class AgentRouter:
     
     def __init__(self, model: str = "gemini-2.0-flash"):
         self.model = model
-        self.intent_classifier_prompt = self._build_intent_classifier_prompt()
-        
-    def _build_intent_classifier_prompt(self) -> str:
-        """Build the master prompt for intent classification"""
-        return """
-You are an intelligent router for an AI teaching assistant system called "Sahayak". 
-Your job is to analyze user requests and determine which specialized agent should handle them.
-
-AVAILABLE AGENTS:
-1. DOUBT_ASSISTANT: Answers questions, explanations, clarifications
-   - Triggers: "why", "what is", "explain", "how does", questions ending with "?"
-   - Examples: "Why is sky blue?", "What is photosynthesis?", "Explain gravity"
-
-2. CONTENT_GENERATION: Creates stories, essays, lessons, explanations
-   - Triggers: "create", "generate", "write", "make a story", "compose"
-   - Examples: "Create a story about farmers", "Write lesson on water cycle"
-
-3. VISION_AGENT: Processes images, extracts text, creates worksheets from images
-   - Triggers: "image", "photo", "picture", "textbook page", "extract text from image"
-   - Examples: "Extract text from this image", "Create worksheet from textbook page"
-
-4. BRAILLE_ASSISTANT: Converts text and explanations to Braille format
-   - Triggers: "in braille", "braille format", "convert to braille", "braille"
-   - Examples: "explain photosynthesis in braille", "convert this to braille", "braille format"
-   - Note: Takes highest priority when "braille" is mentioned
-
-5. GAME_PLANNER: Creates educational games like Sudoku and Riddles
-   - Triggers: "sudoku", "riddles", "game", "puzzle", "play", "show game", "show answer"
-   - Examples: "Show game", "Show answer", "Play sudoku", "Play riddles"
-
-6. LESSON_PLANNER: Plans lessons, schedules, curriculum structure
-   - Triggers: "lesson plan", "schedule", "curriculum", "plan", "weekly", "daily plan"
-   - Examples: "Plan weekly lessons", "Create schedule for grade 5", "Lesson plan for math"
-
-7. DRAWINGS_AGENT: Creates visual aids, diagrams, simple drawings
-   - Triggers: "draw", "diagram", "visual", "chart", "illustration", "drawing"
-   - Examples: "Draw water cycle", "Create diagram of plant parts", "Visual for math concept"
-
-8. MINDMAP_AGENT: Creates mind maps and concept maps
-   - Triggers: "mind map", "concept map", "visual summary", "organize", "structure", "map of"
-   - Notes: If the phrase contains both "generate/create" and "mind map", this agent should take priority over CONTENT_GENERATION.
-
-9. VIDEO_INTELLIGENCE: Processes and analyzes video content
-   - Triggers: "video", "analyze video", "video summary", "video content"
-   - Examples: "Summarize this educational video", "Extract key points from video"
-
-10. ACCESSIBILITY_AGENT: Supports students with disabilities, special needs
-    - Triggers: "accessibility", "disability", "special needs", "visual impairment", "hearing impairment"
-    - Examples: "Make content accessible for blind students", "Sign language support"
-
-ANALYSIS INSTRUCTIONS:
-1. Analyze the user's request carefully
-2. Check for Braille-related keywords first (highest priority)
-3. Identify other key trigger words and phrases
-4. Determine the primary intent
-5. Extract relevant parameters (language, grade, subject, etc.)
-6. Assign confidence score (0.0 to 1.0)
-7. Provide brief reasoning
-
-RESPONSE FORMAT (JSON only):
-{
-    "agent_type": "agent_name",
-    "confidence": 0.95,
-    "parameters": {
-        "language": "english",
-        "grade_level": 5,
-        "subject": "science",
-        "specific_topic": "water cycle",
-        "context": "rural",
-        "additional_info": "any other relevant details"
-    },
-    "reasoning": "Brief explanation of why this agent was chosen"
-}
-
-Important: 
-- Always respond with valid JSON only
-- If unsure between agents, choose the one with highest relevance
-- Extract language, grade level, and subject when mentioned
-- Default to english/grade 5 if not specified
-- If request is too vague, choose DOUBT_ASSISTANT as fallback
-
-Now analyze this request:
-"""
+        self.intent_prompt = get_prompt("router.intent")
 
     def route_request(self, user_request: str, context: Dict = None) -> RouteIntent:
         """
@@ -151,7 +89,8 @@ Now analyze this request:
                     'language': 'english',
                     'grade_level': 5,
                 },
-                reasoning="Request contains Braille-related keywords"
+                reasoning="Request contains Braille-related keywords",
+                source="keyword"
             )
             
         # Check if documents are uploaded in context
@@ -166,7 +105,8 @@ Now analyze this request:
                     'context': 'knowledge_base_search',
                     'documents': context['uploaded_docs']
                 },
-                reasoning="Routing to RAG agent due to document upload context"
+                reasoning="Routing to RAG agent due to document upload context",
+                source="context"
             )
             
         # Add context to the request if available
@@ -175,22 +115,17 @@ Now analyze this request:
             context_str = f"Context: {json.dumps(context)}\n"
             full_request = context_str + user_request
             
-        prompt = self.intent_classifier_prompt + f"\nUser Request: {full_request}"
+        prompt = self.intent_prompt.render(request=full_request)
         
         try:
-            model = genai.GenerativeModel(self.model)
-            response = model.generate_content(prompt)
-            
-            # Parse JSON response
-            result_json = self._extract_json_from_response(response.text)
-            result_dict = json.loads(result_json)
+            decision = self._classify(prompt)
             
-            # Create RouteIntent object
+            # Create RouteIntent object; parameters the model left empty keep the agents' defaults
             intent = RouteIntent(
-                agent_type=AgentType(result_dict['agent_type']),
-                confidence=result_dict['confidence'],
-                parameters=result_dict['parameters'],
-                reasoning=result_dict['reasoning']
+                agent_type=decision.agent_type,
+                confidence=decision.confidence,
+                parameters={key: value for key, value in to_dict(decision.parameters).items() if value != ""},
+                reasoning=decision.reasoning
             )
             
             return intent
@@ -199,14 +134,62 @@ Now analyze this request:
             # Fallback routing using keyword matching
             return self._fallback_routing(user_request, context)
     
-    def _extract_json_from_response(self, response_text: str) -> str:
-        """Extract JSON from Gemini response"""
-        # Find JSON block in response
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            return json_match.group(0)
-        else:
-            raise ValueError("No valid JSON found in response")
+    def _classify(self, prompt: str) -> RouteDecision:
+        """Ask the model for a RouteDecision in JSON mode, with one repair request if it doesn't validate"""
+        schema = response_schema(RouteDecision)
+        response_text = self._generate(prompt, schema)
+        repair_attempts = SahayakConfig.PERFORMANCE_CONFIG.get('structured_output_repair_attempts', 1)
+        for attempt in range(repair_attempts + 1):
+            try:
+                return parse_structured(response_text, RouteDecision)
+            except StructuredOutputError as e:
+                if attempt == repair_attempts:
+                    raise
+                response_text = self._generate(render_prompt("structured.repair", error=str(e),
+                                                             response=response_text), schema)
+    
+    def _select_model(self) -> Optional[str]:
+        """The router's model, or the first fallback whose circuit lets the call through"""
+        if not SahayakConfig.CIRCUIT_BREAKER_CONFIG.get('enabled', True):
+            return self.model
+        for model_name in get_model_candidates(self.model):
+            if get_circuit_breaker(model_name).allow_request():
+                return model_name
+        return None
+
+    def _generate(self, prompt: str, schema: Dict) -> str:
+        # Over budget, this raises and routing falls back to keywords
+        check_budget("Intent Router", self.model)
+        # Every request is routed first, so a failing model must not hold it up:
+        # fall back to another model, or to keyword routing when all circuits are open
+        model_name = self._select_model()
+        if model_name is None:
+            raise RuntimeError(f"{self.model} and its fallback models are unavailable (circuit open)")
+        breaker = get_circuit_breaker(model_name) if SahayakConfig.CIRCUIT_BREAKER_CONFIG.get('enabled', True) else None
+        config = SahayakConfig.PERFORMANCE_CONFIG
+        backend = get_llm_backend()
+        start_time = time.monotonic()
+        try:
+            with start_span("llm.generate", backend=backend.name, model=model_name, prompt_chars=len(prompt)) as span:
+                response_text = backend.generate(
+                    model_name, prompt,
+                    timeout=config.get('router_timeout_seconds', config.get('max_response_time_seconds', 30)),
+                    agent_name="Intent Router",
+                    cache_prefix=getattr(prompt, 'static_prefix', None),
+                    response_schema=schema
+                )
+                span.set_attributes(response_chars=len(response_text),
+                                    cached_tokens=getattr(response_text, 'cached_tokens', None))
+        except Exception as e:
+            # Only upstream trouble counts against the model, not bad requests
+            if breaker:
+                breaker.record(not ModelError.from_exception(e).retriable, time.monotonic() - start_time)
+            raise
+        latency = time.monotonic() - start_time
+        if breaker:
+            breaker.record(True, latency)
+        record_usage("Intent Router", model_name, prompt, response_text, latency)
+        return response_text
     
     def _fallback_routing(self, user_request: str, context: Dict = None) -> RouteIntent:
         """Fallback routing using simple keyword matching"""
@@ -241,7 +224,8 @@ Now analyze this request:
                         'grade_level': 5,
                         'context': 'rural'
                     },
-                    reasoning=f"Fallback routing based on keyword match"
+                    reasoning=f"Fallback routing based on keyword match",
+                    source="fallback"
                 )
         
         # Default to doubt assistant
@@ -253,7 +237,8 @@ Now analyze this request:
                 'grade_level': 5,
                 'context': 'rural'
             },
-            reasoning="Default routing - request unclear"
+            reasoning="Default routing - request unclear",
+            source="fallback"
         )
     
     def batch_route_requests(self, requests: List[str]) -> List[RouteIntent]:
@@ -1,15 +1,18 @@
 import os
 from datetime import datetime
 from typing import Dict, List
-from google import genai
-from google.genai.types import HttpOptions, Part
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, ModelError
 from config.sahayak_config import SahayakConfig
-# from google.ai.generativelanguage import Part  # Assuming you're using Google AI SDK (generativeai)
 
-from datetime import datetime
-import os
-from google.generativeai import GenerativeModel, configure
+# Extensions to the MIME types Gemini expects for inline audio
+AUDIO_MIME_TYPES = {
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.m4a': 'audio/mp4',
+    '.aac': 'audio/aac',
+    '.ogg': 'audio/ogg',
+    '.flac': 'audio/flac',
+}
 
 class AudioAssessmentAgent(BaseAgent):
     def __init__(self):
@@ -18,20 +21,15 @@ class AudioAssessmentAgent(BaseAgent):
             description="Assesses pronunciation and generates TTS",
             model="gemini-1.5-pro"  # or gemini-1.5-flash depending on your access
         )
-        configure(api_key=os.getenv("GOOGLE_API_KEY"))
-        self.model = GenerativeModel(self.model)
 
     def assess_pronunciation(self, audio_path: str, reference_text: str, language: str = 'english') -> dict:
         """Evaluate user's pronunciation against a reference sentence"""
 
-        lang_name = SahayakConfig.LANGUAGES.get(language, 'English')
-
-        with open(audio_path, "rb") as f:
-            audio_data = f.read()
+        lang_name = SahayakConfig.get_language_info(language)['name']
 
         # Construct prompt
-        prompt_1 = f"Transcribe the following audio in {lang_name}."
-        prompt_2 = (
+        prompt = (
+            f"Transcribe the attached audio in {lang_name}.\n"
             f"Compare it with the reference text:\n\"{reference_text}\"\n"
             "Give feedback in this format:\n"
             "- Pronunciation score (1 to 5)\n"
@@ -41,8 +39,16 @@ class AudioAssessmentAgent(BaseAgent):
         )
 
         # Send request to Gemini
-        response = self.model.generate_content([prompt_1, audio_data, prompt_2])
-        result_text = response.text.strip()
+        extension = os.path.splitext(audio_path)[1].lower()
+        mime_type = AUDIO_MIME_TYPES.get(extension)
+        if mime_type is None:
+            result_text = ModelError(f"Unsupported audio format '{extension or 'unknown'}', "
+                                     f"expected one of {', '.join(sorted(AUDIO_MIME_TYPES))}",
+                                     error_type="invalid_audio")
+        else:
+            with open(audio_path, "rb") as f:
+                audio_data = f.read()
+            result_text = self._make_request(prompt, parts=[{'mime_type': mime_type, 'data': audio_data}])
 
         # Save result
         base = os.path.splitext(os.path.basename(audio_path))[0]
@@ -1,12 +1,148 @@
-import google.generativeai as genai
 import time
+import json
+import random
+import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Type, TypeVar, Union
 from collections import deque
 from PIL import Image
 import os
 
 from config.sahayak_config import SahayakConfig
+from agents.circuit_breaker import CircuitState, get_circuit_breaker, get_model_candidates
+from agents.image_preprocessing import ImageRejectedError, PreparedImage, prepare_images
+from agents.llm_backend import get_llm_backend
+from agents.prompts import render_prompt, static_prefix_of
+from agents.structured_output import StructuredOutputError, parse_structured, response_schema
+from agents.tracing import current_span, propagate, start_span
+from agents.usage_accounting import BudgetExceededError, check_budget, record_usage
+
+
+RETRIABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+T = TypeVar('T')
+
+
+class ModelError(str):
+    """Result of a failed model call
+
+    Reads as the usual "❌ Error: ..." string so existing agent code keeps
+    working, and carries the failure details for callers that check
+    isinstance(result, ModelError).
+    """
+
+    def __new__(cls, message: str, error_type: str = "error", retriable: bool = False,
+                attempts: int = 1, status_code: Optional[int] = None):
+        error = super().__new__(cls, f"❌ Error: {message}")
+        error.message = message
+        error.error_type = error_type
+        error.retriable = retriable
+        error.attempts = attempts
+        error.status_code = status_code
+        return error
+
+    @classmethod
+    def from_exception(cls, e: Exception, attempts: int = 1) -> "ModelError":
+        status_code = getattr(e, 'code', None)
+        status_code = int(status_code) if isinstance(status_code, int) else None
+        if isinstance(e, (TimeoutError, FutureTimeoutError)) or status_code in (408, 504):
+            error_type = "timeout"
+        elif status_code == 429:
+            error_type = "rate_limited"
+        elif status_code is not None and status_code >= 500:
+            error_type = "upstream_unavailable"
+        else:
+            error_type = "error"
+        return cls(str(e) or type(e).__name__, error_type=error_type, retriable=_is_retriable(e),
+                   attempts=attempts, status_code=status_code)
+
+    def to_dict(self) -> Dict:
+        return {
+            'error': self.message,
+            'error_type': self.error_type,
+            'retriable': self.retriable,
+            'attempts': self.attempts,
+            'status_code': self.status_code
+        }
+
+
+def _is_retriable(e: Exception) -> bool:
+    status_code = getattr(e, 'code', None)
+    if isinstance(status_code, int):
+        return status_code in RETRIABLE_STATUS_CODES
+    return isinstance(e, (TimeoutError, FutureTimeoutError, ConnectionError))
+
+
+def find_model_error(data, depth: int = 0) -> Optional[ModelError]:
+    """First ModelError inside an agent result (dicts and lists are searched)"""
+    if isinstance(data, ModelError):
+        return data
+    if depth < 4:
+        values = data.values() if isinstance(data, dict) else data if isinstance(data, (list, tuple)) else []
+        for value in values:
+            found = find_model_error(value, depth + 1)
+            if found is not None:
+                return found
+    return None
+
+
+# Recent successful latencies per model; their p95 sets the hedging delay
+_model_latencies: Dict[str, deque] = {}
+_latency_lock = threading.Lock()
+_hedge_stats: Dict[str, Dict[str, int]] = {}
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _record_latency(model: str, seconds: float):
+    with _latency_lock:
+        _model_latencies.setdefault(model, deque(maxlen=200)).append(seconds)
+
+
+def _hedge_delay(model: str) -> Optional[float]:
+    config = SahayakConfig.PERFORMANCE_CONFIG
+    with _latency_lock:
+        samples = sorted(_model_latencies.get(model, ()))
+    if len(samples) < config.get('hedge_min_samples', 20):
+        return None
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return max(p95, config.get('hedge_min_delay_seconds', 1.0))
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _latency_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="model-call")
+        return _hedge_executor
+
+
+def get_hedge_stats() -> Dict[str, Dict[str, int]]:
+    """Hedged requests sent and won per model"""
+    with _latency_lock:
+        return {model: dict(counts) for model, counts in _hedge_stats.items()}
+
+
+class _InFlightRequest:
+    """An upstream model call that concurrent identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+
+
+# Single-flight state shared by every agent in the process
+_in_flight: Dict[str, _InFlightRequest] = {}
+_in_flight_lock = threading.Lock()
+_coalescing_stats: Dict[str, Dict[str, int]] = {}
+
+
+def get_coalescing_stats() -> Dict[str, Dict[str, int]]:
+    """Upstream vs coalesced request counts per model"""
+    with _in_flight_lock:
+        return {model: dict(counts) for model, counts in _coalescing_stats.items()}
+
 
 class BaseAgent:
     """Base class for all Sahayak AI agents"""
@@ -17,32 +153,249 @@ class BaseAgent:
         self.model = model
         self.conversation_history = []
         self.request_timestamps = deque(maxlen=5)  # Track last 5 requests for 5/s limit
-
-        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))  # Required in .env
+        self.throttle_waits = 0
+        self.throttle_wait_seconds = 0.0
+        self._throttle_lock = threading.Lock()
 
     def _wait_if_needed(self):
-        """Auto-throttle to max 5 requests/sec"""
-        now = time.time()
-        if len(self.request_timestamps) == 5:
-            elapsed = now - self.request_timestamps[0]
-            if elapsed < 1:
-                sleep_time = 1 - elapsed
-                print(f"⏳ Waiting {sleep_time:.2f}s to avoid hitting rate limit...")
-                time.sleep(sleep_time)
-        self.request_timestamps.append(time.time())
-
-    def _make_request(self, prompt: str, image_path: Optional[str] = None) -> str:
+        """Auto-throttle to max 5 requests/sec
+
+        Agents are called from several threads at once, so the check and the
+        append happen under a lock; a waiting caller holds it, which queues
+        the others behind it instead of letting them all through at once.
+        """
+        with self._throttle_lock:
+            now = time.time()
+            if len(self.request_timestamps) == 5:
+                elapsed = now - self.request_timestamps[0]
+                if elapsed < 1:
+                    sleep_time = 1 - elapsed
+                    print(f"⏳ Waiting {sleep_time:.2f}s to avoid hitting rate limit...")
+                    with start_span("rate_limit.wait", agent=self.name, wait_ms=round(sleep_time * 1000, 3)):
+                        time.sleep(sleep_time)
+                    self.throttle_waits += 1
+                    self.throttle_wait_seconds += sleep_time
+            self.request_timestamps.append(time.time())
+
+    def _request_key(self, prompt: str, images: List[PreparedImage], schema: Optional[Dict] = None,
+                     parts: Optional[List[Dict]] = None) -> str:
+        """Identity of a model call: model, prompt, response schema and the hashes of any images and parts"""
+        digest = hashlib.sha256()
+        digest.update(self.model.encode('utf-8'))
+        digest.update(b'\0' + prompt.encode('utf-8'))
+        if schema is not None:
+            digest.update(b'\0' + json.dumps(schema, sort_keys=True).encode('utf-8'))
+        for image in images:
+            digest.update(b'\0' + image.digest.encode('ascii'))
+        for part in parts or []:
+            digest.update(b'\0' + part['mime_type'].encode('utf-8') + hashlib.sha256(part['data']).digest())
+        return digest.hexdigest()
+
+    def _make_request(self, prompt: str, image_path: Optional[str] = None,
+                      images: Optional[List[Union[Image.Image, bytes]]] = None, schema: Optional[Dict] = None,
+                      parts: Optional[List[Dict]] = None) -> str:
+        """Call the model with a prompt and optionally an image file and in-memory images or image bytes
+
+        Images are downscaled and re-encoded before upload (see
+        agents/image_preprocessing.py). An image over the size limit or in an
+        unsupported format gives a ModelError with error_type "invalid_image".
+        Other media, e.g. audio, go in parts as {'mime_type': ..., 'data': ...}
+        blobs and are sent after the images as they are.
+        """
+        with start_span("llm.request", agent=self.name, model=self.model, prompt_chars=len(prompt),
+                        num_images=(1 if image_path else 0) + len(images or []), num_parts=len(parts or []),
+                        structured=schema is not None) as span:
+            try:
+                prepared = prepare_images(image_path, images)
+                # Checked per caller, before joining an identical in-flight request
+                check_budget(self.name, self.model)
+            except ImageRejectedError as e:
+                result = ModelError(str(e), error_type="invalid_image")
+            except BudgetExceededError as e:
+                result = ModelError(str(e), error_type="budget_exceeded")
+            else:
+                span.set_attribute('image_bytes', sum(len(image.data) for image in prepared))
+                result = self._coalesced_request(prompt, prepared, schema, parts)
+            span.set_attribute('response_chars', len(result))
+            if isinstance(result, ModelError):
+                span.set_error(result.message)
+            return result
+
+    def _make_structured_request(self, prompt: str, result_type: Type[T], image_path: Optional[str] = None,
+                                 images: Optional[List[Union[Image.Image, bytes]]] = None) -> Union[T, ModelError]:
+        """Ask for a dataclass result in JSON mode and parse it
+
+        The model is constrained to the dataclass's response schema, and the
+        response is validated against it. A response that still doesn't fit
+        gets one repair request (see 'structured_output_repair_attempts'),
+        which sends only the invalid JSON and the error, not the original
+        prompt or images. Returns the result_type instance or a ModelError.
+        """
+        schema = response_schema(result_type)
+        repair_attempts = SahayakConfig.PERFORMANCE_CONFIG.get('structured_output_repair_attempts', 1)
+        response = self._make_request(prompt, image_path, images, schema=schema)
+        for attempt in range(repair_attempts + 1):
+            if isinstance(response, ModelError):
+                return response
+            try:
+                return parse_structured(response, result_type)
+            except StructuredOutputError as e:
+                error = e
+            if attempt == repair_attempts:
+                break
+            current_span().set_attribute('structured_repairs', attempt + 1)
+            response = self._make_request(render_prompt("structured.repair", error=str(error), response=response),
+                                          schema=schema)
+        return ModelError(f"Invalid {result_type.__name__} from {self.name}: {error}",
+                          error_type="invalid_output", attempts=repair_attempts + 1)
+
+    def _coalesced_request(self, prompt: str, images: List[PreparedImage], schema: Optional[Dict] = None,
+                           parts: Optional[List[Dict]] = None) -> str:
+        if not SahayakConfig.PERFORMANCE_CONFIG.get('coalesce_requests', True):
+            return self._send_request(prompt, images, schema, parts)
+
+        key = self._request_key(prompt, images, schema, parts)
+
+        # Single flight: the first caller sends the request, identical
+        # concurrent callers wait for and share its result
+        with _in_flight_lock:
+            counts = _coalescing_stats.setdefault(self.model, {'upstream_requests': 0, 'coalesced_requests': 0})
+            call = _in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _in_flight[key] = _InFlightRequest()
+                counts['upstream_requests'] += 1
+            else:
+                counts['coalesced_requests'] += 1
+
+        current_span().set_attribute('coalesced', not is_leader)
+        if not is_leader:
+            call.done.wait()
+            return call.result
+
+        try:
+            call.result = self._send_request(prompt, images, schema, parts)
+        except Exception as e:
+            # Followers must get an error value, never None
+            call.result = ModelError(f"Unexpected error calling {self.model}: {e}", error_type="internal")
+        finally:
+            with _in_flight_lock:
+                del _in_flight[key]
+            call.done.set()
+        return call.result
+
+    def _send_request(self, prompt: str, images: List[PreparedImage], schema: Optional[Dict] = None,
+                      parts: Optional[List[Dict]] = None) -> str:
+        """Call the model with a deadline, retrying retriable errors with backoff
+
+        Returns the response text, or a ModelError (still a "❌ Error" string)
+        once attempts or the deadline run out.
+        """
+        config = SahayakConfig.PERFORMANCE_CONFIG
+        deadline = time.monotonic() + config.get('max_response_time_seconds', 30)
+        attempts = max(1, config.get('retry_attempts', 1))
+        backoff_base = config.get('retry_backoff_base_seconds', 0.5)
+        backoff_max = config.get('retry_backoff_max_seconds', 8.0)
+
+        parts = [*(image.to_part() for image in images), *(parts or [])]
+        contents = [prompt, *parts] if parts else prompt
+
+        for attempt in range(1, attempts + 1):
+            model_name = self._select_model()
+            if model_name is None:
+                error = ModelError(f"{self.model} and its fallback models are unavailable (circuit open)",
+                                   error_type="circuit_open", attempts=attempt)
+                break
+            try:
+                with start_span("llm.attempt", attempt=attempt, model=model_name):
+                    return self._call_with_hedging(contents, deadline, model_name, schema)
+            except Exception as e:
+                error = ModelError.from_exception(e, attempts=attempt)
+
+            if not error.retriable or attempt == attempts:
+                break
+            # Full backoff doubles per attempt; jitter spreads out synchronized retries
+            backoff = min(backoff_max, backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            if time.monotonic() + backoff >= deadline:
+                break
+            time.sleep(backoff)
+
+        return error
+
+    def _select_model(self) -> Optional[str]:
+        """This agent's model, or the first fallback whose circuit lets the call through"""
+        if not SahayakConfig.CIRCUIT_BREAKER_CONFIG.get('enabled', True):
+            return self.model
+        for model_name in get_model_candidates(self.model):
+            if get_circuit_breaker(model_name).allow_request():
+                return model_name
+        return None
+
+    def _call_model(self, contents, deadline: float, model_name: str, schema: Optional[Dict] = None) -> str:
+        breaker = get_circuit_breaker(model_name) if SahayakConfig.CIRCUIT_BREAKER_CONFIG.get('enabled', True) else None
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            if breaker:
+                breaker.release()  # the probe _select_model reserved was never sent
+            raise TimeoutError("Model call deadline exceeded")
+
         self._wait_if_needed()
+        start_time = time.monotonic()
+        backend = get_llm_backend()
         try:
-            model = genai.GenerativeModel(self.model)
-            if image_path:
-                image = Image.open(image_path)
-                response = model.generate_content([prompt, image])
-            else:
-                response = model.generate_content(prompt)
-            return response.text.strip()
+            with start_span("llm.generate", backend=backend.name, model=model_name) as span:
+                text = backend.generate(model_name, contents, timeout=timeout, agent_name=self.name,
+                                        cache_prefix=static_prefix_of(contents), response_schema=schema)
+                span.set_attributes(response_chars=len(text), cached_tokens=getattr(text, 'cached_tokens', None))
         except Exception as e:
-            return f"❌ Error: {str(e)}"
+            # Only upstream trouble counts against the model, not bad requests
+            if breaker:
+                breaker.record(not _is_retriable(e), time.monotonic() - start_time)
+            raise
+
+        latency = time.monotonic() - start_time
+        if breaker:
+            breaker.record(True, latency)
+        _record_latency(model_name, latency)
+        record_usage(self.name, model_name, contents, text, latency)
+        return text
+
+    def _call_with_hedging(self, contents, deadline: float, model_name: str, schema: Optional[Dict] = None) -> str:
+        """Send a second identical request if the first is slower than this model's p95"""
+        delay = _hedge_delay(model_name) if SahayakConfig.PERFORMANCE_CONFIG.get('hedge_requests') else None
+        if delay is not None and get_circuit_breaker(model_name).state != CircuitState.CLOSED:
+            delay = None  # Never double the load on a model that is already struggling
+        if delay is None or time.monotonic() + delay >= deadline:
+            return self._call_model(contents, deadline, model_name, schema)
+
+        executor = _get_hedge_executor()
+        primary = executor.submit(propagate(self._call_model), contents, deadline, model_name, schema)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+
+        hedge = executor.submit(propagate(self._call_model), contents, deadline, model_name, schema)
+        current_span().set_attribute('hedged', True)
+        with _latency_lock:
+            counts = _hedge_stats.setdefault(model_name, {'hedged_requests': 0, 'hedge_wins': 0})
+            counts['hedged_requests'] += 1
+
+        pending = {primary, hedge}
+        last_error: Exception = TimeoutError("Model call deadline exceeded")
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with _latency_lock:
+                            _hedge_stats[model_name]['hedge_wins'] += 1
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
 
     def log_interaction(self, request: str, response: str, metadata: Dict = None):
         """Log interaction for tracking"""
@@ -60,5 +413,7 @@ class BaseAgent:
         return {
             'name': self.name,
             'total_requests': len(self.conversation_history),
-            'last_used': self.request_timestamps[-1] if self.request_timestamps else None
+            'last_used': self.request_timestamps[-1] if self.request_timestamps else None,
+            'throttle_waits': self.throttle_waits,
+            'throttle_wait_seconds': round(self.throttle_wait_seconds, 3)
         }
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Dict, List
+
+from config.sahayak_config import SahayakConfig
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"        # healthy, requests flow
+    OPEN = "open"            # failing, requests go to fallback models
+    HALF_OPEN = "half_open"  # cooling down, a few probe requests allowed
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker over a sliding window of recent calls.
+
+    Opens when the failure rate or the slow-call rate over the window
+    crosses its threshold, stays open for open_seconds, then lets up to
+    half_open_max_calls probes through. A successful probe closes it, a
+    failed one opens it again.
+    """
+
+    def __init__(self, model_name: str, window_seconds: float = 60.0, min_calls: int = 10,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 15.0,
+                 slow_call_rate_threshold: float = 0.8, open_seconds: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.model_name = model_name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._calls = deque()  # (timestamp, failed, slow)
+        self._state = CircuitState.CLOSED
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._times_opened = 0
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to this model now; reserves a probe when half-open"""
+        with self._lock:
+            self._update_state()
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def record(self, success: bool, latency: float):
+        with self._lock:
+            now = time.monotonic()
+            slow = latency >= self.slow_call_seconds
+
+            if self._state == CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if success and not slow:
+                    self._state = CircuitState.CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, not success, slow))
+            self._trim(now)
+            if self._state == CircuitState.CLOSED and len(self._calls) >= self.min_calls:
+                failure_rate = sum(1 for _, failed, _ in self._calls if failed) / len(self._calls)
+                slow_rate = sum(1 for _, _, is_slow in self._calls if is_slow) / len(self._calls)
+                if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                    self._open(now)
+
+    def release(self):
+        """Give back a probe reserved by allow_request() for a call that was never sent"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            self._update_state()
+            self._trim(time.monotonic())
+            num_calls = len(self._calls)
+            return {
+                'state': self._state.value,
+                'calls_in_window': num_calls,
+                'failure_rate': round(sum(1 for _, failed, _ in self._calls if failed) / num_calls, 3)
+                if num_calls else 0.0,
+                'slow_call_rate': round(sum(1 for _, _, slow in self._calls if slow) / num_calls, 3)
+                if num_calls else 0.0,
+                'times_opened': self._times_opened
+            }
+
+    def _open(self, now: float):
+        self._state = CircuitState.OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._times_opened += 1
+
+    def _update_state(self):
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._probes_in_flight = 0
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(model_name: str) -> CircuitBreaker:
+    """Shared breaker for a model, configured from CIRCUIT_BREAKER_CONFIG"""
+    with _breakers_lock:
+        if model_name not in _breakers:
+            config = {key: value for key, value in SahayakConfig.CIRCUIT_BREAKER_CONFIG.items()
+                      if key not in ('enabled', 'fallback_models')}
+            _breakers[model_name] = CircuitBreaker(model_name, **config)
+        return _breakers[model_name]
+
+
+def get_circuit_states() -> Dict[str, Dict]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.model_name: breaker.to_dict() for breaker in breakers}
+
+
+def get_model_candidates(model_name: str) -> List[str]:
+    """The model followed by its fallbacks, in the order they should be tried
+
+    Fallbacks come from CIRCUIT_BREAKER_CONFIG['fallback_models'], then any
+    other models configured for the current tier.
+    """
+    candidates = [model_name]
+    for fallback in SahayakConfig.CIRCUIT_BREAKER_CONFIG.get('fallback_models', {}).get(model_name, []):
+        if fallback not in candidates:
+            candidates.append(fallback)
+    for model_config in SahayakConfig.MODEL_CONFIGS[SahayakConfig.MODEL_TIER].values():
+        if model_config and model_config.name not in candidates:
+            candidates.append(model_config.name)
+    return candidates
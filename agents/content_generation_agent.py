@@ -1,6 +1,7 @@
 from datetime import datetime
 from config.sahayak_config import SahayakConfig
 from agents.base_agent import BaseAgent
+from agents.prompts import render_prompt
 
 class ContentGenerationAgent(BaseAgent):
     """Agent for generating educational content"""
@@ -15,30 +16,10 @@ class ContentGenerationAgent(BaseAgent):
     def create_story(self, topic: str, language: str = 'english', 
                      grade_level: int = 5, setting: str = 'rural') -> dict:
         """Create an educational story"""
-        language_name = SahayakConfig.LANGUAGES.get(language, 'English')
+        language_name = SahayakConfig.get_language_info(language)['name']
         
-        prompt = f"""
-        Create an engaging educational story in {language_name} for grade {grade_level} students.
-
-        Topic: {topic}
-        Setting: {setting} India
-        Target Age: {6 + grade_level} years old
-
-        Requirements:
-        1. Culturally relevant to the Indian context
-        2. Include educational information about {topic}
-        3. Use age-appropriate vocabulary
-        4. Add relatable characters and dialogues
-        5. Clear moral or learning outcome
-        6. Limit: 200–300 words
-
-        Format:
-        **Title:** [Story title]
-        **Characters:** [Main characters]
-        **Story:** [The complete story]
-        **Learning Points:** [Key educational takeaways]
-        **Discussion Questions:** [2–3 questions for classroom discussion]
-        """
+        prompt = render_prompt("content.story", language=language_name, grade_level=grade_level,
+                               age=6 + grade_level, setting=setting, topic=topic)
 
         response = self._make_request(prompt)
 
@@ -64,28 +45,10 @@ class ContentGenerationAgent(BaseAgent):
                        difficulty: str = 'medium') -> dict:
         """Create a detailed explanation of a concept"""
 
-        language_name = SahayakConfig.LANGUAGES.get(language, 'English')
+        language_name = SahayakConfig.get_language_info(language)['name']
 
-        prompt = f"""
-        Explain this concept in {language_name} with {difficulty} difficulty level:
-
-        Concept: {concept}
-
-        Requirements:
-        1. Start with a simple definition
-        2. Use analogies from daily Indian life
-        3. Include real-world examples
-        4. Break down complex ideas into simple parts
-        5. Add visual descriptions where helpful
-        6. Suggest simple experiments or activities if applicable
-
-        Format:
-        **Definition:** [Simple definition]
-        **Explanation:** [Detailed explanation with analogies]
-        **Examples:** [2-3 real-world examples]
-        **Activity:** [A simple classroom activity]
-        **Remember:** [Key points to remember]
-        """
+        prompt = render_prompt("content.explanation", language=language_name, difficulty=difficulty,
+                               concept=concept)
 
         raw_response = self._make_request(prompt)
 
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from agents.usage_accounting import estimate_tokens
+
+
+class _CacheEntry:
+    def __init__(self, handle: Any, expires_at: float, tokens: Optional[int]):
+        self.handle = handle
+        self.expires_at = expires_at
+        self.tokens = tokens
+
+
+class ContextCache:
+    """
+    Static prompt prefixes uploaded once as provider-side cached contents.
+
+    lookup() returns a handle for (model, prefix), creating it through the
+    backend's `create` callable on first use and extending its TTL through
+    `refresh` when it is close to expiring. Whenever caching cannot be used
+    (prefix below the provider's minimum size, creation or refresh failing,
+    model not supporting it) lookup() returns None and the caller sends the
+    full prompt; a model whose cache creation failed is not tried again for
+    retry_after_seconds.
+    """
+
+    def __init__(self, create: Callable[[str, str, float], Tuple[Any, Optional[int]]],
+                 refresh: Callable[[Any, float], None], ttl_seconds: float = 600,
+                 refresh_margin_seconds: float = 60, min_prefix_tokens: int = 4096,
+                 retry_after_seconds: float = 300):
+        self._create = create
+        self._refresh = refresh
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.min_prefix_tokens = min_prefix_tokens
+        self.retry_after_seconds = retry_after_seconds
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _CacheEntry] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._unavailable_until: Dict[str, float] = {}
+        self._stats = {'hits': 0, 'creations': 0, 'refreshes': 0, 'too_small': 0,
+                       'fallbacks': 0, 'invalidations': 0}
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _key(model_name: str, prefix: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{prefix}".encode('utf-8')).hexdigest()
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def lookup(self, model_name: str, prefix: str) -> Optional[Any]:
+        """Cached-content handle for this prefix, or None to send the prompt uncached"""
+        if estimate_tokens(prefix) < self.min_prefix_tokens:
+            self._count('too_small')
+            return None
+        if time.monotonic() < self._unavailable_until.get(model_name, 0.0):
+            self._count('fallbacks')
+            return None
+
+        key = self._key(model_name, prefix)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # One upload per prefix; concurrent callers wait for it instead of creating duplicates
+        with key_lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry and entry.expires_at - now > self.refresh_margin_seconds:
+                self._count('hits')
+                return entry.handle
+
+            if entry and entry.expires_at > now:
+                try:
+                    self._refresh(entry.handle, self.ttl_seconds)
+                    entry.expires_at = now + self.ttl_seconds
+                    self._count('refreshes')
+                    return entry.handle
+                except Exception as e:
+                    self.logger.warning(f"Refreshing cached prefix for {model_name} failed: {str(e)}")
+
+            try:
+                handle, tokens = self._create(model_name, prefix, self.ttl_seconds)
+            except Exception as e:
+                self.logger.warning(f"Context caching unavailable for {model_name}, sending full prompts: {str(e)}")
+                self._entries.pop(key, None)
+                self._unavailable_until[model_name] = now + self.retry_after_seconds
+                self._count('fallbacks')
+                return None
+
+            self._entries[key] = _CacheEntry(handle, now + self.ttl_seconds, tokens)
+            self._count('creations')
+            return handle
+
+    def invalidate(self, model_name: str, prefix: str):
+        """Forget a handle the provider rejected, e.g. one that expired server-side"""
+        with self._lock:
+            if self._entries.pop(self._key(model_name, prefix), None) is not None:
+                self._stats['invalidations'] += 1
+
+    def get_stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            live = [entry for entry in self._entries.values() if entry.expires_at > now]
+            return {
+                **self._stats,
+                'cached_prefixes': len(live),
+                'cached_tokens': sum(entry.tokens or 0 for entry in live),
+                'unavailable_models': sorted(model for model, until in self._unavailable_until.items() if until > now)
+            }
+
+
+def split_cached_prefix(contents, prefix: Optional[str]):
+    """contents with the prefix removed from its leading text, or None if it doesn't start with it"""
+    if not prefix:
+        return None
+    if isinstance(contents, str):
+        return contents[len(prefix):] if contents.startswith(prefix) else None
+    if contents and isinstance(contents[0], str) and contents[0].startswith(prefix):
+        return [contents[0][len(prefix):], *contents[1:]]
+    return None
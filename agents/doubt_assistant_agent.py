@@ -1,5 +1,6 @@
 from config.sahayak_config import SahayakConfig
 from agents.base_agent import BaseAgent
+from agents.prompts import render_prompt
 from datetime import datetime
 from typing import Dict
 
@@ -43,28 +44,8 @@ class DoubtAssistantAgent(BaseAgent):
         context_info = SahayakConfig.get_context_info(context)
         adaptations = context_info['adaptations']
 
-        prompt = f"""
-        You are a helpful teaching assistant for a {context} Indian classroom.
-        A student has asked the following question. Answer it in {language_name} language ({native_name}) using the native script (if applicable).
-
-        Question: {question}
-        Grade Level: {grade_level}
-        Context: {context}
-        Adaptations: {', '.join(adaptations)}
-
-        Guidelines:
-        1. Use simple, age-appropriate language for grade {grade_level}
-        2. Keep the explanation concise and clear
-        3. Use relatable Indian examples (village, festivals, farming, etc.)
-        4. Encourage curiosity and engagement
-        5. If possible, include a short practical activity or real-life analogy
-
-        Return your answer in this format:
-
-        **Answer:** [Main explanation]
-        **Example:** [Simple, relatable example]
-        **Fun Fact:** [Interesting fact, activity, or trivia related to the topic]
-        """
+        prompt = render_prompt("doubt.answer", language=language_name, native_name=native_name, context=context,
+                               adaptations=', '.join(adaptations), grade_level=grade_level, question=question)
 
         response = self._make_request(prompt)
 
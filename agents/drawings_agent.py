@@ -2,6 +2,8 @@ import os
 from datetime import datetime
 from typing import Dict, List
 from agents.base_agent import BaseAgent
+from agents.prompts import render_prompt
+from agents.tracing import start_span
 
 
 class DrawingsAgent(BaseAgent):
@@ -21,42 +23,15 @@ class DrawingsAgent(BaseAgent):
         os.makedirs(folder, exist_ok=True)
 
         file_path = os.path.join(folder, filename)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        with start_span("file.write", path=file_path, chars=len(content)):
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(content)
         return file_path
 
     def generate_diagram_instructions(self, concept: str, diagram_type: str = "simple_drawing") -> Dict:
         """Generate step-by-step drawing instructions"""
 
-        prompt = f"""
-        Create step-by-step instructions for drawing a {diagram_type} to explain: {concept}
-
-        Requirements:
-        1. Use only basic shapes (circles, lines, rectangles, triangles)
-        2. Suitable for blackboard/whiteboard drawing
-        3. Clear, numbered steps
-        4. Include labels and annotations
-        5. Mention chalk colors if helpful
-        6. Add teaching tips for each step
-
-        Format:
-        **Diagram Title:** [Title for the drawing]
-        **Materials Needed:** [Chalk colors, tools needed]
-        **Step-by-Step Instructions:**
-
-        Step 1: [First step with detailed description]
-        - Teacher tip: [Helpful teaching note]
-
-        Step 2: [Second step]
-        - Teacher tip: [Helpful teaching note]
-
-        [Continue for all steps]
-
-        **Labels to Add:** [All text labels needed]
-        **Key Points to Explain:** [What to emphasize while drawing]
-        **Common Mistakes:** [What to avoid]
-        **Variations:** [How to adapt for different grades]
-        """
+        prompt = render_prompt("drawings.diagram_instructions", diagram_type=diagram_type, concept=concept)
 
         response = self._make_request(prompt)
 
@@ -83,23 +58,7 @@ class DrawingsAgent(BaseAgent):
 
         grades_str = ", ".join(map(str, grade_levels))
 
-        prompt = f"""
-        Create a comprehensive visual aid plan for teaching: {topic}
-        Grade Levels: {grades_str}
-
-        Include:
-        1. List of all visual aids needed
-        2. Drawing instructions for each
-        3. When to use each visual during lesson
-        4. How to adapt for different grades
-        5. Student interaction opportunities
-
-        Consider:
-        - Progression from simple to complex
-        - Interactive elements
-        - Local/cultural relevance
-        - Low-cost materials
-        """
+        prompt = render_prompt("drawings.visual_aid_plan", grades=grades_str, topic=topic)
 
         response = self._make_request(prompt)
 
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+
+def exact_hash(path: str) -> str:
+    """SHA-256 of the file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def perceptual_hash(path: str, hash_size: int = 16) -> int:
+    """
+    Difference hash of an image: one bit per horizontally adjacent pixel
+    pair of a (hash_size + 1) x hash_size grayscale thumbnail.
+
+    Re-encoding, resizing, EXIF rotation and mild brightness changes leave
+    it (nearly) unchanged, so re-shared copies of one photo match. Different
+    photos with a similar layout can come close too.
+    """
+    with Image.open(path) as image:
+        image.draft('L', (hash_size * 8, hash_size * 8))  # JPEG: decode at reduced size
+        image = ImageOps.exif_transpose(image)
+        small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+class ExtractionCache:
+    """
+    Content-addressed store of text extractions, shared by every process on the host.
+
+    Each entry is a JSON file named <perceptual hash>_<sha256>.json in a
+    directory per namespace (model and prompt), written atomically, so
+    concurrent processes can share the directory. get() returns the entry
+    for the same bytes. With max_distance set, it otherwise returns the
+    closest image whose perceptual hash differs in at most that many bits.
+    Pages of one textbook share their layout and can be that close, so
+    perceptual matches may serve another page's text and are off by default.
+    File names are listed again whenever the directory changes, which picks
+    up other processes' entries without reading them.
+    """
+
+    def __init__(self, folder: str, max_distance: Optional[int] = None, hash_size: int = 16):
+        self.folder = folder
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[int, str]] = {}  # sha256 -> (perceptual hash, file name)
+        self._listed_mtime = None
+        self._stats = {'exact_hits': 0, 'perceptual_hits': 0, 'misses': 0, 'stores': 0}
+
+    def _refresh(self):
+        mtime = os.stat(self.folder).st_mtime_ns
+        if mtime == self._listed_mtime:
+            return
+        entries = {}
+        for name in os.listdir(self.folder):
+            stem, ext = os.path.splitext(name)
+            if ext != '.json' or '_' not in stem:
+                continue
+            phash, sha = stem.split('_', 1)
+            try:
+                entries[sha] = (int(phash, 16), name)
+            except ValueError:
+                continue
+        self._entries = entries
+        self._listed_mtime = mtime
+
+    def _nearest(self, phash: int) -> Optional[str]:
+        best_name, best_distance = None, self.max_distance + 1
+        for entry_phash, name in self._entries.values():
+            distance = (entry_phash ^ phash).bit_count()
+            if distance < best_distance:
+                best_name, best_distance = name, distance
+        return best_name
+
+    def _read(self, name: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.folder, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None  # removed or being replaced by another process
+
+    def get(self, sha: str, phash: Optional[int]) -> Optional[Dict]:
+        """Stored entry for these hashes with 'match' set to 'exact' or 'perceptual', or None"""
+        with self._lock:
+            self._refresh()
+            match, name = 'exact', self._entries.get(sha, (None, None))[1]
+            if name is None and phash is not None and self.max_distance is not None:
+                match, name = 'perceptual', self._nearest(phash)
+        entry = self._read(name) if name else None
+        with self._lock:
+            self._stats[f'{match}_hits' if entry else 'misses'] += 1
+        return {**entry, 'match': match} if entry else None
+
+    def put(self, sha: str, phash: int, extraction: str, metadata: Dict = None):
+        name = f"{phash:0{self.hash_size * self.hash_size // 4}x}_{sha}.json"
+        path = os.path.join(self.folder, name)
+        entry = {'sha256': sha, 'perceptual_hash': f"{phash:x}", 'extraction': extraction,
+                 'created': time.time(), **(metadata or {})}
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)  # atomic, so other processes never read a partial entry
+        with self._lock:
+            self._entries[sha] = (phash, name)
+            self._stats['stores'] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries)}
+
+
+_caches: Dict[str, ExtractionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_extraction_cache(namespace: str, root: str, max_distance: Optional[int] = None) -> ExtractionCache:
+    """Process-wide cache for a namespace, stored under root/<namespace>"""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = ExtractionCache(os.path.join(root, namespace), max_distance=max_distance)
+        return _caches[namespace]
+
+
+def get_extraction_cache_stats() -> Dict[str, Dict]:
+    with _caches_lock:
+        return {namespace: cache.get_stats() for namespace, cache in _caches.items()}
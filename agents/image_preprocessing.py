@@ -0,0 +1,216 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+
+from PIL import Image, ImageOps
+
+from config.sahayak_config import SahayakConfig
+
+
+class ImageRejectedError(ValueError):
+    """An image that is too large, unreadable or of an unsupported format"""
+
+
+class PreparedImage:
+    """An image re-encoded for upload, identified by the hash of its source"""
+
+    __slots__ = ('data', 'mime_type', 'size', 'digest')
+
+    def __init__(self, data: bytes, mime_type: str, size: tuple, digest: str):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.digest = digest
+
+    def to_part(self) -> Dict:
+        """Inline blob part as the Gemini SDK accepts it in generate_content contents"""
+        return {'mime_type': self.mime_type, 'data': self.data}
+
+
+_MIME_TYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp', 'png': 'image/png'}
+# Pillow names phone photos with embedded previews MPO; they decode as JPEG
+_FORMAT_ALIASES = {'jpg': 'jpeg', 'mpo': 'jpeg'}
+
+
+class ImagePreprocessor:
+    """
+    Prepares images for vision requests instead of sending full-resolution photos.
+
+    Each image is rotated upright from its EXIF orientation and downscaled so
+    its longest side is at most max_dimension. It is then re-encoded as JPEG or
+    WebP without metadata, which drops EXIF including GPS location. JPEGs are
+    downscaled while decoding, which makes 12 MP phone photos cheap to open.
+    Results are kept in an LRU cache of at most cache_mb, keyed by the SHA-256
+    of the source bytes. Repeated requests for the same photo, e.g. extraction
+    followed by worksheet generation, reuse the prepared bytes.
+    """
+
+    def __init__(self, max_dimension: int = 2048, image_format: str = 'jpeg', quality: int = 85,
+                 max_file_size_mb: Optional[float] = 10, supported_formats: Optional[List[str]] = None,
+                 cache_mb: float = 64, enabled: bool = True):
+        image_format = _FORMAT_ALIASES.get(image_format.lower(), image_format.lower())
+        if image_format not in ('jpeg', 'webp'):
+            raise ValueError(f"Unsupported upload format '{image_format}', use 'jpeg' or 'webp'")
+        self.max_dimension = max_dimension
+        self.image_format = image_format
+        self.quality = quality
+        self.max_file_size_mb = max_file_size_mb
+        self.supported_formats = {_FORMAT_ALIASES.get(f.lower(), f.lower()) for f in supported_formats or []}
+        self.cache_bytes = int(cache_mb * 1024 * 1024)
+        self.enabled = enabled
+
+        self._cache: "OrderedDict[str, PreparedImage]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'source_bytes': 0, 'prepared_bytes': 0}
+
+    def prepare_file(self, path: str) -> PreparedImage:
+        """Prepared upload of an image file, rejecting files over max_file_size_mb before reading them"""
+        try:
+            file_size = os.path.getsize(path)
+        except OSError as e:
+            raise ImageRejectedError(f"Cannot read image {path}: {e}")
+        if self.max_file_size_mb is not None and file_size > self.max_file_size_mb * 1024 * 1024:
+            raise ImageRejectedError(f"Image {os.path.basename(path)} is {file_size / (1024 * 1024):.1f} MB, "
+                                     f"over the {self.max_file_size_mb} MB limit")
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise ImageRejectedError(f"Cannot read image {path}: {e}")
+        return self.prepare_bytes(data, check_format=True)
+
+    def prepare_bytes(self, data: bytes, check_format: bool = False) -> PreparedImage:
+        digest = hashlib.sha256(data).hexdigest()
+        cached = self._get_cached(digest)
+        if cached is not None:
+            return cached
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            source_format = _FORMAT_ALIASES.get((image.format or '').lower(), (image.format or '').lower())
+        except Exception as e:
+            raise ImageRejectedError(f"Unreadable image: {e}")
+        if check_format and self.supported_formats and source_format not in self.supported_formats:
+            raise ImageRejectedError(f"Unsupported image format '{source_format or 'unknown'}', "
+                                     f"expected one of {', '.join(sorted(self.supported_formats))}")
+        if not self.enabled:
+            prepared = PreparedImage(data, _MIME_TYPES.get(source_format, 'image/jpeg'), image.size, digest)
+        else:
+            # Image.open() only reads the header; a truncated or corrupt file fails while decoding
+            try:
+                if image.format == 'JPEG' or image.format == 'MPO':
+                    # Let the decoder scale down by a power of two; thumbnail() finishes the resize
+                    image.draft('RGB', (self.max_dimension, self.max_dimension))
+                prepared = self._encode(image, digest)
+            except (OSError, ValueError) as e:
+                raise ImageRejectedError(f"Unreadable image: {e}")
+        return self._store(prepared, len(data))
+
+    def prepare_image(self, image: Image.Image) -> PreparedImage:
+        """Prepared upload of an in-memory image, e.g. a rendered PDF page"""
+        try:
+            hasher = hashlib.sha256(f"{image.mode}{image.size}".encode('utf-8'))
+            hasher.update(image.tobytes())
+            digest = hasher.hexdigest()
+            cached = self._get_cached(digest)
+            if cached is not None:
+                return cached
+            if not self.enabled:
+                buffer = io.BytesIO()
+                image.save(buffer, format='PNG')
+                prepared = PreparedImage(buffer.getvalue(), 'image/png', image.size, digest)
+            else:
+                prepared = self._encode(image, digest)
+        except (OSError, ValueError) as e:
+            raise ImageRejectedError(f"Unreadable image: {e}")
+        return self._store(prepared, 0)
+
+    def _encode(self, image: Image.Image, digest: str) -> PreparedImage:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if has_alpha:
+            image = image.convert('RGBA')
+            if self.image_format == 'jpeg':
+                # JPEG has no alpha channel: flatten onto white like a printed page
+                flattened = Image.new('RGB', image.size, (255, 255, 255))
+                flattened.paste(image, mask=image.getchannel('A'))
+                image = flattened
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if self.image_format == 'webp':
+            image.save(buffer, format='WEBP', quality=self.quality, method=4)
+        else:
+            image.save(buffer, format='JPEG', quality=self.quality, optimize=True)
+        return PreparedImage(buffer.getvalue(), _MIME_TYPES[self.image_format], image.size, digest)
+
+    def _get_cached(self, digest: str) -> Optional[PreparedImage]:
+        with self._lock:
+            prepared = self._cache.get(digest)
+            if prepared is not None:
+                self._cache.move_to_end(digest)
+                self._stats['hits'] += 1
+            return prepared
+
+    def _store(self, prepared: PreparedImage, source_bytes: int) -> PreparedImage:
+        with self._lock:
+            self._stats['misses'] += 1
+            self._stats['source_bytes'] += source_bytes
+            self._stats['prepared_bytes'] += len(prepared.data)
+            if prepared.digest not in self._cache and len(prepared.data) <= self.cache_bytes:
+                self._cache[prepared.digest] = prepared
+                self._cached_bytes += len(prepared.data)
+                while self._cached_bytes > self.cache_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_bytes -= len(evicted.data)
+        return prepared
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'cached_images': len(self._cache), 'cached_bytes': self._cached_bytes}
+
+
+_preprocessor: Optional[ImagePreprocessor] = None
+_preprocessor_lock = threading.Lock()
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    """Process-wide preprocessor, configured from SahayakConfig.IMAGE_PREPROCESSING_CONFIG"""
+    global _preprocessor
+    with _preprocessor_lock:
+        if _preprocessor is None:
+            config = SahayakConfig.IMAGE_PREPROCESSING_CONFIG
+            vision_config = SahayakConfig.AGENT_CONFIGS.get('vision_agent', {})
+            _preprocessor = ImagePreprocessor(
+                max_dimension=config.get('max_dimension', 2048),
+                image_format=config.get('format', 'jpeg'),
+                quality=config.get('quality', 85),
+                max_file_size_mb=vision_config.get('max_file_size_mb'),
+                supported_formats=vision_config.get('supported_formats'),
+                cache_mb=config.get('cache_mb', 64),
+                enabled=config.get('enabled', True)
+            )
+        return _preprocessor
+
+
+def prepare_images(image_path: Optional[str] = None,
+                   images: Optional[List[Union[Image.Image, bytes]]] = None) -> List[PreparedImage]:
+    """Prepared uploads for a request's image file and in-memory images or encoded image bytes"""
+    preprocessor = get_image_preprocessor()
+    prepared = [preprocessor.prepare_file(image_path)] if image_path else []
+    for image in images or []:
+        if isinstance(image, (bytes, bytearray)):
+            prepared.append(preprocessor.prepare_bytes(bytes(image)))
+        else:
+            prepared.append(preprocessor.prepare_image(image))
+    return prepared
+
+
+def get_image_preprocessing_stats() -> Optional[Dict]:
+    return _preprocessor.get_stats() if _preprocessor else None
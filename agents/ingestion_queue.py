@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Dict, List, Optional
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    """Progress and per-stage timings of one background ingestion job"""
+    job_id: str
+    description: str
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = 0.0
+    current_stage: Optional[str] = None
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    submitted_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+    @contextmanager
+    def stage(self, name: str, progress: float = None):
+        """Time a pipeline stage; timings of repeated stages are summed"""
+        self.current_stage = name
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.stage_timings[name] = self.stage_timings.get(name, 0.0) + (time.time() - start)
+        if progress is not None:
+            self.progress = progress
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'description': self.description,
+            'status': self.status.value,
+            'progress': round(self.progress, 3),
+            'current_stage': self.current_stage,
+            'stage_timings': {name: round(seconds, 3) for name, seconds in self.stage_timings.items()},
+            'result': self.result,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class IngestionQueue:
+    """Thread pool that runs ingestion jobs in the background and tracks their status"""
+
+    def __init__(self, max_workers: int = 2, max_jobs_kept: int = 100):
+        self.max_jobs_kept = max_jobs_kept
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-ingestion")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, description: str, fn: Callable[[IngestionJob], Dict]) -> str:
+        """Queue fn(job) and return the job id immediately"""
+        job = IngestionJob(job_id=uuid.uuid4().hex[:12], description=description)
+        with self._lock:
+            self._prune_finished_jobs()
+            self._jobs[job.job_id] = job
+            self._futures[job.job_id] = self._executor.submit(self._run, job, fn)
+        return job.job_id
+
+    def _run(self, job: IngestionJob, fn: Callable[[IngestionJob], Dict]) -> Dict:
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.now().isoformat()
+        try:
+            result = fn(job)
+            job.result = result
+            if result.get('status') == 'error':
+                job.status = JobStatus.FAILED
+                job.error = result.get('error')
+            else:
+                job.status = JobStatus.COMPLETED
+                job.progress = 1.0
+            return result
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            return {'status': 'error', 'error': str(e)}
+        finally:
+            job.current_stage = None
+            job.finished_at = datetime.now().isoformat()
+
+    def _prune_finished_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in (JobStatus.COMPLETED, JobStatus.FAILED)]
+        excess = len(self._jobs) - self.max_jobs_kept + 1
+        for job_id in finished[:max(excess, 0)]:
+            del self._jobs[job_id]
+            self._futures.pop(job_id, None)
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def wait(self, job_id: str, timeout: float = None) -> Optional[Dict]:
+        """Block until the job finishes and return its result"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None:
+            return None
+        return future.result(timeout=timeout)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,115 @@
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram in the style of HdrHistogram.
+
+    Bucket boundaries grow geometrically by (1 + precision), so recording is
+    O(1), memory is bounded by the dynamic range rather than the number of
+    samples, and any percentile is accurate to within `precision`.
+    """
+
+    def __init__(self, precision: float = 0.02, min_seconds: float = 1e-4):
+        self.precision = precision
+        self.min_seconds = min_seconds
+        self._log_base = math.log1p(precision)
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        bucket = int(math.log(max(seconds, self.min_seconds) / self.min_seconds) / self._log_base)
+        self._counts[bucket] = self._counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency in seconds below which q percent of samples fall"""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * q / 100)
+        seen = 0
+        for bucket in sorted(self._counts):
+            seen += self._counts[bucket]
+            if seen >= rank:
+                # Report the bucket's upper edge, never above the observed max
+                return min(self.min_seconds * (1 + self.precision) ** (bucket + 1), self.max)
+        return self.max
+
+
+class RollingCounter:
+    """Requests and errors per second over the last `seconds` seconds, in a ring of slots"""
+
+    def __init__(self, seconds: int = 300):
+        self.seconds = seconds
+        self._slots = [[-1, 0, 0] for _ in range(seconds)]  # [second, requests, errors]
+
+    def record(self, failed: bool, now: float = None):
+        second = int(now if now is not None else time.time())
+        slot = self._slots[second % self.seconds]
+        if slot[0] != second:
+            slot[0], slot[1], slot[2] = second, 0, 0
+        slot[1] += 1
+        if failed:
+            slot[2] += 1
+
+    def totals(self, window: int, now: float = None) -> Tuple[int, int]:
+        second = int(now if now is not None else time.time())
+        requests = errors = 0
+        for slot_second, slot_requests, slot_errors in self._slots:
+            if second - window < slot_second <= second:
+                requests += slot_requests
+                errors += slot_errors
+        return requests, errors
+
+
+class RequestStats:
+    """Latency percentiles, error rate and recent throughput for one stream of requests"""
+
+    WINDOWS = {'1m': 60, '5m': 300}
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.window = RollingCounter(max(self.WINDOWS.values()))
+        self.errors = 0
+
+    def record(self, seconds: float, failed: bool):
+        self.histogram.record(seconds)
+        self.window.record(failed)
+        if failed:
+            self.errors += 1
+
+    def to_dict(self) -> Dict:
+        histogram = self.histogram
+
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        throughput = {}
+        for name, window in self.WINDOWS.items():
+            requests, errors = self.window.totals(window)
+            throughput[name] = {
+                'requests': requests,
+                'errors': errors,
+                'requests_per_second': round(requests / window, 3),
+                'error_rate': round(errors / requests, 3) if requests else 0.0
+            }
+
+        return {
+            'count': histogram.count,
+            'errors': self.errors,
+            'error_rate': round(self.errors / histogram.count, 3) if histogram.count else 0.0,
+            'latency_ms': {
+                'p50': ms(histogram.percentile(50)),
+                'p90': ms(histogram.percentile(90)),
+                'p99': ms(histogram.percentile(99)),
+                'mean': ms(histogram.total / histogram.count) if histogram.count else None,
+                'max': ms(histogram.max) if histogram.count else None
+            },
+            'throughput': throughput
+        }
@@ -1,10 +1,77 @@
 import os
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, List
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, ModelError
+from agents.prompts import render_prompt
+from agents.structured_output import to_dict
+from agents.tracing import start_span
 from config.sahayak_config import SahayakConfig
 
 
+@dataclass
+class LessonSlot:
+    time: str
+    subject: str  # "BREAK" for breaks
+    grade: str = ""
+    topic: str = ""
+    activity: str = ""
+
+
+@dataclass
+class DayPlan:
+    day: str
+    slots: List[LessonSlot]
+
+
+@dataclass
+class WeeklyPlan:
+    overview: str
+    days: List[DayPlan]
+    assessments: List[str]
+    resources: List[str]
+    preparation_hours: float
+    differentiation: List[str]
+    homework: List[str]
+
+
+@dataclass
+class ScheduleSlot:
+    time: str
+    activity: str
+    teacher_notes: str = ""
+
+
+@dataclass
+class DailySchedule:
+    slots: List[ScheduleSlot]
+
+
+def format_weekly_plan(plan: Dict) -> str:
+    """Render a weekly plan dict as the sectioned text saved and shown to teachers"""
+    lines = [f"**Week Overview:** {plan['overview']}", "", "**Daily Breakdown:**"]
+    for day in plan['days']:
+        lines += ["", f"**{day['day'].upper()}**"]
+        for slot in day['slots']:
+            parts = [slot['subject'], f"Grade {slot['grade']}" if slot['grade'] else "", slot['topic'], slot['activity']]
+            lines.append(f"- {slot['time']}: {' – '.join(part for part in parts if part)}")
+    sections = [('Assessment Schedule', plan['assessments']),
+                ('Resource Requirements', plan['resources'] + [f"Preparation time: {plan['preparation_hours']:g} hours"]),
+                ('Differentiation Strategies', plan['differentiation']), ('Homework Plan', plan['homework'])]
+    for heading, items in sections:
+        lines += ["", f"**{heading}:**", *(f"- {item}" for item in items)]
+    return "\n".join(lines)
+
+
+def format_daily_schedule(schedule: Dict) -> str:
+    lines = []
+    for slot in schedule['slots']:
+        lines.append(f"- {slot['time']}: {slot['activity']}")
+        if slot['teacher_notes']:
+            lines.append(f"  Teacher notes: {slot['teacher_notes']}")
+    return "\n".join(lines)
+
+
 class LessonPlannerAgent(BaseAgent):
     """Agent for creating lesson plans and schedules"""
 
@@ -23,62 +90,28 @@ class LessonPlannerAgent(BaseAgent):
         os.makedirs(folder, exist_ok=True)
 
         filepath = os.path.join(folder, filename)
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(content)
+        with start_span("file.write", path=filepath, chars=len(content)):
+            with open(filepath, "w", encoding="utf-8") as f:
+                f.write(content)
         return filepath
 
     def generate_weekly_plan(self, subjects: List[str], grade_levels: List[int],
                              total_hours: int = 30, language: str = 'english') -> Dict:
         """Generate a comprehensive weekly lesson plan"""
 
-        language_name = SahayakConfig.LANGUAGES.get(language, 'English')
+        language_name = SahayakConfig.get_language_info(language)['name']
         subjects_str = ", ".join(subjects)
         grades_str = ", ".join(map(str, grade_levels))
 
-        prompt = f"""
-        Create a detailed weekly lesson plan in {language_name} for a multi-grade classroom:
-
-        Subjects: {subjects_str}
-        Grade Levels: {grades_str}
-        Total Teaching Hours: {total_hours} per week
-        Context: Rural Indian school with limited resources
-
-        Requirements:
-        1. Distribute time fairly among subjects and grades
-        2. Include mixed-grade activities where possible
-        3. Use locally available materials
-        4. Add assessment methods for each subject
-        5. Include break times and physical activities
-        6. Consider different learning styles
-
-        Format:
-        **Week Overview:**
-        - Total Hours: {total_hours}
-        - Subjects Covered: {subjects_str}
-        - Grade Levels: {grades_str}
-
-        **Daily Breakdown:**
-        **MONDAY**
-        - 9:00–9:45: [Subject] – Grade [X] – [Topic] – [Activity]
-        - 9:45–10:30: [Subject] – Grade [Y] – [Topic] – [Activity]
-        - 10:30–10:45: BREAK
-        ...
-
-        **Assessment Schedule:**
-        - [Subject]: [Assessment method and timing]
-
-        **Resource Requirements:**
-        - Materials: [List]
-        - Preparation Time: [Hours]
-
-        **Differentiation Strategies:**
-        [How to handle different grade levels simultaneously]
-
-        **Homework Plan:**
-        [Weekly homework assignments by grade]
-        """
+        prompt = render_prompt("lesson_planner.weekly_plan", language=language_name, subjects=subjects_str,
+                               grades=grades_str, total_hours=total_hours)
 
-        response = self._make_request(prompt)
+        plan = self._make_structured_request(prompt, WeeklyPlan)
+        if isinstance(plan, ModelError):
+            response, plan = plan, None
+        else:
+            plan = to_dict(plan)
+            response = format_weekly_plan(plan)
 
         filename = f"weekly_plan_{'_'.join(subjects)}.txt".lower().replace(" ", "_")
         saved_path = self._save_text(response, filename)
@@ -89,6 +122,7 @@ class LessonPlannerAgent(BaseAgent):
             'total_hours': total_hours,
             'language': language,
             'lesson_plan': response,
+            'plan': plan,
             'saved_path': saved_path,
             'timestamp': datetime.now().isoformat(),
             'agent': self.name
@@ -108,23 +142,15 @@ class LessonPlannerAgent(BaseAgent):
 
         special_events = special_events or []
 
-        prompt = f"""
-        Create a detailed daily schedule for {date}:
+        prompt = render_prompt("lesson_planner.daily_schedule", date=date, subjects=', '.join(subjects_today),
+                               special_events=', '.join(special_events) if special_events else 'None')
 
-        Subjects Today: {', '.join(subjects_today)}
-        Special Events: {', '.join(special_events) if special_events else 'None'}
-
-        Include:
-        1. Time slots with buffer time
-        2. Transition activities
-        3. Brain breaks
-        4. Assessment opportunities
-        5. Cleanup and preparation time
-
-        Format: hour-by-hour with activities and teacher notes.
-        """
-
-        response = self._make_request(prompt)
+        schedule = self._make_structured_request(prompt, DailySchedule)
+        if isinstance(schedule, ModelError):
+            response, schedule = schedule, None
+        else:
+            schedule = to_dict(schedule)
+            response = format_daily_schedule(schedule)
 
         filename = f"daily_schedule_{date.replace('-', '_')}.txt"
         saved_path = self._save_text(response, filename)
@@ -134,6 +160,7 @@ class LessonPlannerAgent(BaseAgent):
             'subjects': subjects_today,
             'special_events': special_events,
             'schedule': response,
+            'slots': schedule['slots'] if schedule else None,
             'saved_path': saved_path,
             'timestamp': datetime.now().isoformat(),
             'agent': self.name
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Union
+
+from config.sahayak_config import SahayakConfig
+from agents.context_cache import ContextCache, split_cached_prefix
+from agents.usage_accounting import estimate_tokens
+
+
+class ModelResponse(str):
+    """Response text that also carries the token usage reported by the backend"""
+
+    def __new__(cls, text: str, input_tokens: Optional[int] = None, output_tokens: Optional[int] = None,
+                cached_tokens: Optional[int] = None):
+        response = super().__new__(cls, text)
+        response.input_tokens = input_tokens
+        response.output_tokens = output_tokens
+        response.cached_tokens = cached_tokens  # part of input_tokens served from a context cache
+        return response
+
+
+class LLMBackend:
+    """Interface every model call goes through; see get_llm_backend()"""
+
+    name = "base"
+    context_cache: Optional[ContextCache] = None
+
+    def generate(self, model_name: str, contents, timeout: Optional[float] = None,
+                 agent_name: Optional[str] = None, cache_prefix: Optional[str] = None,
+                 response_schema: Optional[Dict] = None) -> str:
+        """Return the model's text response for a prompt (str) or a list of parts
+
+        cache_prefix is the static start of the prompt, which backends that
+        support context caching may upload once and reference instead of
+        resending. With a response_schema (see agents/structured_output.py)
+        the response is JSON matching it. Backends that know the token usage
+        return a ModelResponse.
+        """
+        raise NotImplementedError
+
+    def count_tokens(self, model_name: str, contents) -> int:
+        """Input tokens the model would bill for contents; estimated unless the backend can count"""
+        return estimate_tokens(contents)
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through google-generativeai"""
+
+    name = "gemini"
+
+    def __init__(self):
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise ImportError("google-generativeai is required. Please install it using 'pip install google-generativeai'")
+        self._genai = genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))  # Required in .env
+
+        config = SahayakConfig.CONTEXT_CACHE_CONFIG
+        if config.get('enabled', True):
+            self.context_cache = ContextCache(
+                self._create_cached_content, self._refresh_cached_content,
+                ttl_seconds=config.get('ttl_seconds', 600),
+                refresh_margin_seconds=config.get('refresh_margin_seconds', 60),
+                min_prefix_tokens=config.get('min_prefix_tokens', 4096),
+                retry_after_seconds=config.get('retry_after_seconds', 300)
+            )
+
+    def _create_cached_content(self, model_name: str, prefix: str, ttl_seconds: float):
+        from google.generativeai import caching
+
+        cached = caching.CachedContent.create(
+            model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+            display_name=f"sahayak-{hashlib.sha256(prefix.encode('utf-8')).hexdigest()[:12]}",
+            contents=[prefix],
+            ttl=timedelta(seconds=ttl_seconds)
+        )
+        return cached, getattr(cached.usage_metadata, 'total_token_count', None)
+
+    def _refresh_cached_content(self, cached, ttl_seconds: float):
+        cached.update(ttl=timedelta(seconds=ttl_seconds))
+
+    def generate(self, model_name: str, contents, timeout: Optional[float] = None,
+                 agent_name: Optional[str] = None, cache_prefix: Optional[str] = None,
+                 response_schema: Optional[Dict] = None) -> str:
+        request_options = {'timeout': timeout} if timeout else None
+        generation_config = None
+        if response_schema is not None:
+            generation_config = {'response_mime_type': 'application/json', 'response_schema': response_schema}
+
+        remainder = split_cached_prefix(contents, cache_prefix) if self.context_cache else None
+        cached = self.context_cache.lookup(model_name, cache_prefix) if remainder is not None else None
+        if cached is not None:
+            try:
+                model = self._genai.GenerativeModel.from_cached_content(cached_content=cached)
+                return self._to_response(model.generate_content(remainder, generation_config=generation_config,
+                                                                request_options=request_options))
+            except Exception as e:
+                # A cache the API no longer accepts (expired, deleted) is dropped and the
+                # full prompt sent; transient errors go to the caller's retry logic
+                if getattr(e, 'code', None) not in (400, 403, 404):
+                    raise
+                self.context_cache.invalidate(model_name, cache_prefix)
+
+        model = self._genai.GenerativeModel(model_name)
+        return self._to_response(model.generate_content(contents, generation_config=generation_config,
+                                                        request_options=request_options))
+
+    @staticmethod
+    def _to_response(response) -> "ModelResponse":
+        usage = getattr(response, 'usage_metadata', None)
+        return ModelResponse(response.text.strip(),
+                             input_tokens=getattr(usage, 'prompt_token_count', None),
+                             output_tokens=getattr(usage, 'candidates_token_count', None),
+                             cached_tokens=getattr(usage, 'cached_content_token_count', None))
+
+    def count_tokens(self, model_name: str, contents) -> int:
+        return self._genai.GenerativeModel(model_name).count_tokens(contents).total_tokens
+
+
+class SimulatedAPIError(Exception):
+    """Injected upstream failure; `code` mimics the HTTP status of a real API error"""
+
+    def __init__(self, code: int, message: str = "Simulated upstream error"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def _simulated_route(prompt: str) -> str:
+    """Router stand-in: keyword routing on the request, answered as the router's JSON"""
+    from agents.agent_router import AgentRouter
+
+    match = re.search(r'User Request:\s*(.*)\Z', prompt, re.DOTALL)
+    request = match.group(1) if match else prompt
+    if request.startswith("Context:"):
+        request = request.split("\n", 1)[-1]
+    intent = AgentRouter()._fallback_routing(request)
+    return json.dumps({
+        'agent_type': intent.agent_type.value,
+        'confidence': 0.9,
+        'parameters': intent.parameters,
+        'reasoning': "Simulated routing"
+    })
+
+
+def _simulated_json(schema: Dict):
+    """Smallest value matching a response schema, for agents without a canned response"""
+    schema_type = schema.get('type')
+    if schema_type == 'object':
+        return {name: _simulated_json(prop) for name, prop in schema.get('properties', {}).items()}
+    if schema_type == 'array':
+        return [_simulated_json(schema['items'])]
+    if schema.get('enum'):
+        return schema['enum'][0]
+    return {'integer': 1, 'number': 1.0, 'boolean': True}.get(schema_type, "Simulated")
+
+
+class SimulatedBackend(LLMBackend):
+    """
+    Offline stand-in for load and tail-latency testing; makes no network calls.
+
+    Latency is drawn from a configurable distribution (constant, uniform,
+    exponential or lognormal), optionally per agent. A fraction of calls
+    fail with SimulatedAPIError carrying a retriable status code, so the
+    retry, hedging and circuit breaker paths are exercised too. Responses
+    come from per-agent templates or callables, with a generic default.
+    """
+
+    name = "simulated"
+
+    DEFAULT_TEMPLATE = "[Simulated {model} response for {agent}]\n{prompt_excerpt}"
+
+    def __init__(self, latency: Dict = None, latency_by_agent: Dict[str, Dict] = None,
+                 error_rate: float = 0.0, error_codes: List[int] = None,
+                 responses: Dict[str, Union[str, Callable[[str], str]]] = None, seed: int = 0,
+                 context_cache: Dict = None):
+        self.latency = latency or {'distribution': 'constant', 'seconds': 0.0}
+        self.latency_by_agent = latency_by_agent or {}
+        self.error_rate = error_rate
+        self.error_codes = error_codes or [503]
+        self.responses = {'Intent Router': _simulated_route, **(responses or {})}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        if context_cache is not None:
+            # In-memory stand-in for provider caching, e.g. {'min_prefix_tokens': 0}
+            self.context_cache = ContextCache(
+                lambda model_name, prefix, ttl: (f"cachedContents/{len(prefix)}", estimate_tokens(prefix)),
+                lambda handle, ttl: None, **context_cache)
+
+    def _sample_latency(self, spec: Dict) -> float:
+        distribution = spec.get('distribution', 'constant')
+        with self._lock:
+            if distribution == 'uniform':
+                return self._rng.uniform(spec.get('min_seconds', 0.0), spec['max_seconds'])
+            if distribution == 'exponential':
+                return self._rng.expovariate(1 / spec['mean_seconds'])
+            if distribution == 'lognormal':
+                return self._rng.lognormvariate(math.log(spec['median_seconds']), spec.get('sigma', 0.5))
+            return spec.get('seconds', 0.0)
+
+    def _should_fail(self) -> Optional[int]:
+        with self._lock:
+            self.calls += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self._rng.choice(self.error_codes)
+        return None
+
+    def generate(self, model_name: str, contents, timeout: Optional[float] = None,
+                 agent_name: Optional[str] = None, cache_prefix: Optional[str] = None,
+                 response_schema: Optional[Dict] = None) -> str:
+        latency = self._sample_latency(self.latency_by_agent.get(agent_name, self.latency))
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Simulated call exceeded its {timeout:.1f}s deadline")
+        time.sleep(latency)
+
+        error_code = self._should_fail()
+        if error_code is not None:
+            raise SimulatedAPIError(error_code)
+
+        cached_tokens = None
+        if self.context_cache and split_cached_prefix(contents, cache_prefix) is not None:
+            if self.context_cache.lookup(model_name, cache_prefix) is not None:
+                cached_tokens = estimate_tokens(cache_prefix)
+
+        prompt = contents if isinstance(contents, str) else " ".join(p for p in contents if isinstance(p, str))
+        response = self.responses.get(agent_name, self.DEFAULT_TEMPLATE)
+        if response_schema is not None and agent_name not in self.responses:
+            text = json.dumps(_simulated_json(response_schema), ensure_ascii=False)
+        elif callable(response):
+            text = response(prompt)
+        else:
+            text = response.format(model=model_name, agent=agent_name or "agent", prompt=prompt,
+                                   prompt_excerpt=" ".join(prompt.split())[:200])
+        return ModelResponse(text, input_tokens=estimate_tokens(contents), output_tokens=estimate_tokens(text),
+                             cached_tokens=cached_tokens)
+
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_llm_backend(config: Dict = None) -> LLMBackend:
+    config = config or SahayakConfig.LLM_BACKEND_CONFIG
+    backend = config.get('backend', 'gemini')
+    if backend == 'gemini':
+        return GeminiBackend()
+    if backend == 'simulated':
+        return SimulatedBackend(**config.get('simulated', {}))
+    raise ValueError(f"Unknown LLM backend '{backend}'")
+
+
+def get_llm_backend() -> LLMBackend:
+    """Process-wide backend, created from SahayakConfig.LLM_BACKEND_CONFIG on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_llm_backend()
+        return _backend
+
+
+def get_context_cache_stats() -> Optional[Dict]:
+    """Context cache counters of the current backend, or None if it does not cache"""
+    cache = getattr(_backend, 'context_cache', None)
+    return cache.get_stats() if cache else None
+
+
+def set_llm_backend(backend: LLMBackend):
+    """Swap the backend for every agent, e.g. a SimulatedBackend in a load test"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -1,6 +1,29 @@
+from dataclasses import dataclass, field
+from typing import List
 from config.sahayak_config import SahayakConfig
-from agents.base_agent import BaseAgent
-from agents.visualizer import visualize_mindmap_with_networkx, save_mindmap_text
+from agents.base_agent import BaseAgent, ModelError
+from agents.prompts import render_prompt
+from agents.structured_output import to_dict
+from agents.visualizer import format_mindmap_text, visualize_mindmap_with_networkx, save_mindmap_text
+
+
+@dataclass
+class MindMapSubBranch:
+    title: str
+    details: List[str] = field(default_factory=list)
+
+
+@dataclass
+class MindMapBranch:
+    title: str
+    sub_branches: List[MindMapSubBranch]
+
+
+@dataclass
+class MindMap:
+    central_topic: str
+    branches: List[MindMapBranch]
+
 
 class MindMapAgent(BaseAgent):
     def __init__(self):
@@ -11,44 +34,34 @@ class MindMapAgent(BaseAgent):
         )
 
     def create_topic_mindmap(self, topic: str, language: str = "english") -> dict:
-        language_name = SahayakConfig.LANGUAGES.get(language.lower(), "English")
-
-        prompt = (
-            f"You are an educational assistant helping teachers explain the concept of **{topic}** using a clean, classroom-friendly mind map. "
-            f"Generate a mind map in {language_name} with no more than 3 levels of depth and 3–4 items per level.\n\n"
-            "Use this format exactly:\n"
-            "**CENTRAL TOPIC: Photosynthesis**\n"
-            "**MAIN BRANCHES (Level 1):**\n"
-            "Branch 1: Reactants and Products\n"
-            "  ├── Sub-branch 1.1: Reactants\n"
-            "  │   └── 1.1.1: Water (H₂O), CO₂\n"
-            "  └── Sub-branch 1.2: Products\n"
-            "      └── 1.2.1: Glucose, Oxygen (O₂)\n"
-            "Branch 2: Process Stages\n"
-            "  ├── Sub-branch 2.1: Light Reaction\n"
-            "  │   └── 2.1.1: ATP & NADPH formation\n"
-            "  └── Sub-branch 2.2: Calvin Cycle\n"
-            "      └── 2.2.1: Glucose synthesis\n"
-            "Branch 3: Importance\n"
-            "  ├── Sub-branch 3.1: Oxygen supply\n"
-            "  └── Sub-branch 3.2: Basis of food chain\n\n"
-            "Only return the mind map structure in this format. Do not add extra text, explanations, or headings."
-        )
+        language_name = SahayakConfig.get_language_info(language)['name']
+
+        prompt = render_prompt("mindmap.topic", language=language_name, topic=topic)
 
-        response = self._make_request(prompt)
+        mindmap = self._make_structured_request(prompt, MindMap)
+        if isinstance(mindmap, ModelError):
+            return {
+                "topic": topic,
+                "language": language_name,
+                "mindmap_structure": mindmap
+            }
 
+        mindmap = to_dict(mindmap)
         return {
             "topic": topic,
             "language": language_name,
-            "mindmap_structure": response
+            "mindmap": mindmap,
+            "mindmap_structure": format_mindmap_text(mindmap)
         }
     
 
     def generate_mindmap(self, topic: str, language: str = "english", **kwargs) -> dict:
         output = self.create_topic_mindmap(topic, language)
+        if "mindmap" not in output:
+            return output
         
         # Save visual and text
-        img_path = visualize_mindmap_with_networkx(output["mindmap_structure"], topic)
+        img_path = visualize_mindmap_with_networkx(output["mindmap"], topic)
         txt_path = save_mindmap_text(output["mindmap_structure"], topic)
 
         # Include in output
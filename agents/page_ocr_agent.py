@@ -0,0 +1,117 @@
+import os
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from agents.base_agent import BaseAgent
+from agents.prompts import render_prompt
+from agents.tracing import propagate
+from config.sahayak_config import SahayakConfig
+
+
+class PageOCRAgent(BaseAgent):
+    """Agent for transcribing scanned page images that have no text layer"""
+
+    def __init__(self):
+        super().__init__(
+            name="Page OCR",
+            description="Transcribes scanned textbook pages for the knowledge base",
+            model=SahayakConfig.DEFAULT_MODEL
+        )
+        rag_config = SahayakConfig.AGENT_CONFIGS.get('rag_agent', {})
+        self.batch_size = rag_config.get('ocr_batch_size', 4)
+        self.max_concurrency = rag_config.get('ocr_max_concurrency', 3)
+
+        # Transcriptions are cached by SHA-256 of the page image, in memory and on disk
+        self.cache_dir = os.path.join(self._get_root_folder(), "data", "ocr_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._cache: Dict[str, str] = {}
+        self._cache_lock = threading.Lock()
+
+    def _get_root_folder(self) -> str:
+        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def _build_prompt(self, num_pages: int) -> str:
+        return render_prompt("ocr.pages", num_pages=num_pages)
+
+    def _get_cached(self, image_hash: str) -> Optional[str]:
+        with self._cache_lock:
+            if image_hash in self._cache:
+                return self._cache[image_hash]
+
+        cache_path = os.path.join(self.cache_dir, f"{image_hash}.txt")
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            with self._cache_lock:
+                self._cache[image_hash] = text
+            return text
+        return None
+
+    def _store_cached(self, image_hash: str, text: str):
+        with self._cache_lock:
+            self._cache[image_hash] = text
+
+        cache_path = os.path.join(self.cache_dir, f"{image_hash}.txt")
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _split_pages(self, response: str, num_pages: int) -> Optional[List[str]]:
+        parts = re.split(r'^\s*#{2,}\s*PAGE\s*\d+\s*$', response, flags=re.MULTILINE | re.IGNORECASE)
+        pages = [part.strip() for part in parts[1:]]
+        return pages if len(pages) == num_pages else None
+
+    def _transcribe_batch(self, batch: List[bytes]) -> List[str]:
+        response = self._make_request(self._build_prompt(len(batch)), images=batch)
+        if response.startswith("❌ Error"):
+            return [""] * len(batch)
+
+        pages = self._split_pages(response, len(batch))
+        if pages is None:
+            if len(batch) == 1:
+                pages = [response.strip()]
+            else:
+                # The model merged or dropped page markers; retry one page per request
+                return [text for data in batch for text in self._transcribe_batch([data])]
+
+        return pages
+
+    def extract_text(self, page_images: List[bytes]) -> List[str]:
+        """Transcribe page images, returning one text per image in input order"""
+        hashes = [hashlib.sha256(data).hexdigest() for data in page_images]
+        results: List[Optional[str]] = [self._get_cached(h) for h in hashes]
+
+        # Deduplicate repeated pages before sending anything upstream
+        pending: Dict[str, bytes] = {}
+        for image_hash, data, cached in zip(hashes, page_images, results):
+            if cached is None and image_hash not in pending:
+                pending[image_hash] = data
+
+        pending_hashes = list(pending)
+        batches = [pending_hashes[i:i + self.batch_size]
+                   for i in range(0, len(pending_hashes), self.batch_size)]
+
+        if batches:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                transcribed = executor.map(
+                    propagate(lambda batch: self._transcribe_batch([pending[h] for h in batch])),
+                    batches
+                )
+                for batch, texts in zip(batches, transcribed):
+                    for image_hash, text in zip(batch, texts):
+                        if text:
+                            self._store_cached(image_hash, text)
+
+        texts = []
+        for image_hash, cached in zip(hashes, results):
+            texts.append(cached if cached is not None else self._get_cached(image_hash) or "")
+
+        self.log_interaction("Page OCR", f"Transcribed {len(page_images)} page images", {
+            'num_pages': len(page_images),
+            'num_requested': len(pending_hashes),
+            'num_batches': len(batches)
+        })
+
+        return texts
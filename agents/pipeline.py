@@ -0,0 +1,104 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .agent_router import AgentType
+
+# An input is either "step" / "step.key" naming an earlier step's output, or a
+# callable that receives the outputs of all finished steps by name
+StepInput = Union[str, Callable[[Dict[str, Any]], Any]]
+
+
+@dataclass
+class PipelineStep:
+    """One agent call in a pipeline
+
+    `inputs` maps a parameter name to an earlier step's output; the special
+    name 'request' replaces the request text the agent receives. Steps that
+    are referenced by inputs are dependencies automatically.
+    """
+    name: str
+    agent_type: Optional[AgentType] = None  # None: use the pipeline's routed agent
+    request: Optional[str] = None
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    inputs: Dict[str, StepInput] = field(default_factory=dict)
+    depends_on: List[str] = field(default_factory=list)
+
+    @property
+    def dependencies(self) -> List[str]:
+        deps = list(self.depends_on)
+        for ref in self.inputs.values():
+            if isinstance(ref, str):
+                step_name = ref.split('.', 1)[0]
+                if step_name not in deps:
+                    deps.append(step_name)
+        return deps
+
+
+def resolve_input(ref: StepInput, outputs: Dict[str, Any]) -> Any:
+    """Look up an input reference in the outputs of finished steps"""
+    if callable(ref):
+        return ref(outputs)
+
+    step_name, _, key_path = ref.partition('.')
+    value = outputs[step_name]
+    for key in filter(None, key_path.split('.')):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def validate_pipeline(steps: List[PipelineStep]) -> List[str]:
+    """Check names and dependencies and return the steps in topological order"""
+    by_name = {}
+    for step in steps:
+        if step.name in by_name:
+            raise ValueError(f"Duplicate pipeline step '{step.name}'")
+        by_name[step.name] = step
+
+    for step in steps:
+        for dep in step.dependencies:
+            if dep not in by_name:
+                raise ValueError(f"Step '{step.name}' depends on unknown step '{dep}'")
+
+    order, visiting, visited = [], set(), set()
+
+    def visit(name: str):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a dependency cycle through '{name}'")
+        visiting.add(name)
+        for dep in by_name[name].dependencies:
+            visit(dep)
+        visiting.discard(name)
+        visited.add(name)
+        order.append(name)
+
+    for step in steps:
+        visit(step.name)
+    return order
+
+
+def _main_topic(outputs: Dict[str, Any]) -> str:
+    content = (outputs['extract'] or {}).get('extracted_content', '')
+    match = re.search(r'\*\*Main Topic:\*\*\s*(.+)', content)
+    return match.group(1).strip() if match else content[:200]
+
+
+def textbook_pipeline(image_path: str, target_grades: List[int] = None,
+                      include_mindmap: bool = True, include_braille: bool = True) -> List[PipelineStep]:
+    """Extract a textbook page once, then build worksheets, a mind map and Braille from it"""
+    steps = [
+        PipelineStep('extract', AgentType.VISION_AGENT,
+                     parameters={'task_type': 'extract_text', 'image_path': image_path}),
+        PipelineStep('worksheets', AgentType.VISION_AGENT,
+                     parameters={'task_type': 'generate_worksheets', 'target_grades': target_grades or [3, 5]},
+                     inputs={'content': 'extract.extracted_content'}),
+    ]
+    if include_mindmap:
+        steps.append(PipelineStep('mindmap', AgentType.MINDMAP_AGENT,
+                                  inputs={'specific_topic': _main_topic}, depends_on=['extract']))
+    if include_braille:
+        steps.append(PipelineStep('braille', AgentType.BRAILLE_ASSISTANT,
+                                  inputs={'request': 'extract.extracted_content'}))
+    return steps
@@ -0,0 +1,363 @@
+import re
+import textwrap
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+from agents.usage_accounting import estimate_tokens
+
+
+class RenderedPrompt(str):
+    """Prompt text that remembers its template and static prefix, e.g. for context caching"""
+
+    def __new__(cls, text: str, template_name: str, static_prefix: str):
+        prompt = super().__new__(cls, text)
+        prompt.template_name = template_name
+        prompt.static_prefix = static_prefix
+        return prompt
+
+
+class PromptTemplate:
+    """
+    A prompt compiled once at import instead of rebuilt per call.
+
+    The text is dedented and trailing whitespace and blank-line runs are
+    dropped, so source indentation is never sent to the model. It is then
+    split into literal chunks and {fields} that render() joins. Templates
+    keep static instructions first and per-request values last, so the
+    static prefix is identical across calls (see static_prefix).
+    """
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = _compact(text)
+        self._parts: List[Tuple[str, Optional[str], str, Optional[str]]] = list(Formatter().parse(self.text))
+        self.fields = tuple(dict.fromkeys(field for _, field, _, _ in self._parts if field is not None))
+        if any(field == '' or field.isdigit() for field in self.fields):
+            raise ValueError(f"Prompt '{name}' must use named fields")
+        # Everything before the first field, i.e. what every rendering starts with
+        self.static_prefix = self._parts[0][0] if self._parts else ""
+        self.static_text = "".join(literal for literal, _, _, _ in self._parts)
+
+    def render(self, **values) -> RenderedPrompt:
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"Prompt '{self.name}' is missing {', '.join(missing)}")
+
+        chunks = []
+        for literal, field, format_spec, conversion in self._parts:
+            chunks.append(literal)
+            if field is not None:
+                value = values[field]
+                if conversion == 'r':
+                    value = repr(value)
+                elif conversion == 's':
+                    value = str(value)
+                chunks.append(format(value, format_spec) if format_spec else str(value))
+        return RenderedPrompt("".join(chunks), self.name, self.static_prefix)
+
+    def stats(self) -> Dict:
+        return {
+            'fields': list(self.fields),
+            'static_chars': len(self.static_text),
+            'static_tokens': estimate_tokens(self.static_text),
+            'static_prefix_chars': len(self.static_prefix)
+        }
+
+
+def _compact(text: str) -> str:
+    lines = [line.rstrip() for line in textwrap.dedent(text).strip().splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', "\n".join(lines))
+
+
+_registry: Dict[str, PromptTemplate] = {}
+
+
+def register_prompt(name: str, text: str) -> PromptTemplate:
+    if name in _registry:
+        raise ValueError(f"Prompt '{name}' is already registered")
+    template = _registry[name] = PromptTemplate(name, text)
+    return template
+
+
+def get_prompt(name: str) -> PromptTemplate:
+    try:
+        return _registry[name]
+    except KeyError:
+        raise KeyError(f"Unknown prompt '{name}'. Registered: {', '.join(sorted(_registry))}")
+
+
+def render_prompt(name: str, **values) -> RenderedPrompt:
+    return get_prompt(name).render(**values)
+
+
+def list_prompts() -> List[str]:
+    return sorted(_registry)
+
+
+def static_prefix_of(contents) -> Optional[str]:
+    """Static prefix of a rendered prompt, alone or as the first of a list of parts"""
+    prompt = contents if isinstance(contents, str) else (contents[0] if contents else None)
+    return getattr(prompt, 'static_prefix', None) or None
+
+
+# ---------------------------------------------------------------------------
+# Templates. Static instructions first, per-request values at the end.
+# ---------------------------------------------------------------------------
+
+register_prompt("router.intent", """
+    You route requests for "Sahayak", an AI teaching assistant, to the one agent that should handle them.
+
+    Agents, with trigger words:
+    - doubt_assistant: questions and clarifications; "why", "what is", "how does", "explain", questions ending in "?"
+    - content_generation: stories, essays, lessons, explanations; "create", "generate", "write", "compose"
+    - vision_agent: images and textbook pages, text extraction, worksheets from images; "image", "photo", "picture", "textbook page"
+    - braille_assistant: anything to be given in Braille; "braille", "in braille", "convert to braille"
+    - game_planner: educational games; "sudoku", "riddles", "game", "puzzle", "play", "show game", "show answer"
+    - lesson_planner: lesson plans, schedules, curriculum; "lesson plan", "schedule", "curriculum", "weekly", "daily plan"
+    - drawings_agent: visual aids, diagrams, simple drawings; "draw", "diagram", "visual", "chart", "illustration"
+    - mindmap_agent: mind maps and concept maps; "mind map", "concept map", "visual summary", "organize"
+    - video_intelligence: video analysis and summaries; "video", "analyze video", "video summary"
+    - accessibility_agent: disabilities and special needs; "accessibility", "disability", "special needs", "visual impairment"
+
+    Rules:
+    - Braille takes priority over every other agent.
+    - mindmap_agent takes priority over content_generation when a mind map is asked for.
+    - If unsure, choose the most relevant agent; if the request is too vague, choose doubt_assistant.
+    - Extract language, grade level, subject and topic when mentioned; default to english and grade 5.
+
+    Give a confidence between 0 and 1 and a one-sentence reasoning; leave parameters that are not mentioned empty.
+
+    User Request: {request}
+    """)
+
+register_prompt("lesson_planner.weekly_plan", """
+    Create a detailed weekly lesson plan for a multi-grade classroom in a rural Indian school with limited resources.
+
+    Requirements:
+    1. Distribute time fairly among subjects and grades
+    2. Include mixed-grade activities where possible
+    3. Use locally available materials
+    4. Add assessment methods for each subject
+    5. Include break times and physical activities
+    6. Consider different learning styles
+
+    Fields:
+    - overview: total hours, subjects covered, grade levels
+    - days: Monday to Friday, each with time slots like "9:00–9:45"; breaks have subject "BREAK"
+    - assessments: "[Subject]: [assessment method and timing]" per subject
+    - resources: materials list; preparation_hours: preparation time
+    - differentiation: how to teach different grade levels at the same time
+    - homework: weekly homework by grade
+
+    Language: {language}
+    Subjects: {subjects}
+    Grade levels: {grades}
+    Teaching hours per week: {total_hours}
+    """)
+
+register_prompt("lesson_planner.daily_schedule", """
+    Create a detailed hour-by-hour school day schedule with activities and teacher notes.
+
+    Include:
+    1. Time slots with buffer time
+    2. Transition activities
+    3. Brain breaks
+    4. Assessment opportunities
+    5. Cleanup and preparation time
+
+    Date: {date}
+    Subjects today: {subjects}
+    Special events: {special_events}
+    """)
+
+register_prompt("vision.extract_text", """
+    Analyze this textbook page and extract its text, subject, grade level (if identifiable), key concepts and any diagrams, charts or images.
+
+    Format:
+    **Subject:** [Subject identified]
+    **Grade Level:** [Estimated grade level]
+    **Main Topic:** [Primary topic]
+    **Text Content:** [All text content]
+    **Key Concepts:** [Important concepts listed]
+    **Visual Elements:** [Description of any diagrams/images]
+    **Learning Objectives:** [What students should learn from this page]
+    """)
+
+# Shared by the per-grade and multi-grade worksheet prompts
+_WORKSHEET_RULES = """
+    Requirements:
+    1. Adjust vocabulary to the grade level
+    2. Create age-appropriate questions
+    3. Include variety: MCQ, short answer, fill-in-blanks, true/false
+    4. Add visual thinking questions
+    5. Include practical applications
+
+    Sections, each question with its correct answer:
+    - multiple_choice: 3 questions with 4 options each
+    - short_answers: 3 questions
+    - fill_in_the_blanks: 3 questions, the blank written as ____
+    - think_and_apply: 1 practical application question
+    """
+
+register_prompt("vision.worksheet", """
+    Create a worksheet for one grade based on the textbook content below.
+    """ + _WORKSHEET_RULES + """
+    Grade: {grade}
+    Content: {content}
+    """)
+
+register_prompt("vision.worksheets_multi_grade", """
+    Create one worksheet for each grade listed below, all based on the textbook content below.
+    """ + _WORKSHEET_RULES + """
+    Grades: {grades}
+    Content: {content}
+    """)
+
+register_prompt("content.story", """
+    Write an engaging educational story for Indian school students.
+
+    Requirements:
+    1. Culturally relevant to the Indian context
+    2. Teaches about the topic
+    3. Age-appropriate vocabulary
+    4. Relatable characters and dialogue
+    5. A clear moral or learning outcome
+    6. 200–300 words
+
+    Format:
+    **Title:** [Story title]
+    **Characters:** [Main characters]
+    **Story:** [The complete story]
+    **Learning Points:** [Key educational takeaways]
+    **Discussion Questions:** [2–3 questions for classroom discussion]
+
+    Language: {language}
+    Grade: {grade_level} (age {age})
+    Setting: {setting} India
+    Topic: {topic}
+    """)
+
+register_prompt("content.explanation", """
+    Explain a concept for Indian school students.
+
+    Requirements:
+    1. Start with a simple definition
+    2. Use analogies from daily Indian life
+    3. Include real-world examples
+    4. Break complex ideas into simple parts
+    5. Add visual descriptions where helpful
+    6. Suggest a simple experiment or activity if applicable
+
+    Format:
+    **Definition:** [Simple definition]
+    **Explanation:** [Detailed explanation with analogies]
+    **Examples:** [2-3 real-world examples]
+    **Activity:** [A simple classroom activity]
+    **Remember:** [Key points to remember]
+
+    Language: {language}
+    Difficulty: {difficulty}
+    Concept: {concept}
+    """)
+
+register_prompt("doubt.answer", """
+    You are a helpful teaching assistant in an Indian classroom. Answer the student's question.
+
+    Guidelines:
+    1. Simple language suited to the student's grade
+    2. Concise and clear
+    3. Relatable Indian examples (village, festivals, farming, etc.)
+    4. Encourage curiosity and engagement
+    5. If possible, include a short practical activity or real-life analogy
+
+    Format:
+    **Answer:** [Main explanation]
+    **Example:** [Simple, relatable example]
+    **Fun Fact:** [Interesting fact, activity, or trivia related to the topic]
+
+    Language: {language} ({native_name}), in its native script
+    Classroom: {context} ({adaptations})
+    Grade: {grade_level}
+    Question: {question}
+    """)
+
+register_prompt("drawings.diagram_instructions", """
+    Write step-by-step instructions for drawing a diagram on the blackboard to explain a concept.
+
+    Requirements:
+    1. Use only basic shapes (circles, lines, rectangles, triangles)
+    2. Clear, numbered steps
+    3. Include labels and annotations
+    4. Mention chalk colors if helpful
+    5. Add a teaching tip for each step
+
+    Format:
+    **Diagram Title:** [Title for the drawing]
+    **Materials Needed:** [Chalk colors, tools needed]
+    **Step-by-Step Instructions:**
+    Step 1: [First step with detailed description]
+    - Teacher tip: [Helpful teaching note]
+    [Continue for all steps]
+    **Labels to Add:** [All text labels needed]
+    **Key Points to Explain:** [What to emphasize while drawing]
+    **Common Mistakes:** [What to avoid]
+    **Variations:** [How to adapt for different grades]
+
+    Diagram type: {diagram_type}
+    Concept: {concept}
+    """)
+
+register_prompt("drawings.visual_aid_plan", """
+    Create a visual aid plan for teaching a topic.
+
+    Include:
+    1. All visual aids needed
+    2. Drawing instructions for each
+    3. When to use each visual during the lesson
+    4. How to adapt for different grades
+    5. Student interaction opportunities
+
+    Prefer a progression from simple to complex, interactive elements, local and cultural relevance, and low-cost materials.
+
+    Grade levels: {grades}
+    Topic: {topic}
+    """)
+
+register_prompt("mindmap.topic", """
+    You help teachers explain a concept with a clean, classroom-friendly mind map.
+
+    Requirements:
+    1. A central topic with 3–4 branches
+    2. 2–3 sub-branches per branch, each with 1–2 short details
+    3. Short labels of a few words, no full sentences
+
+    Language: {language}
+    Topic: {topic}
+    """)
+
+# Same extraction goals as vision.extract_text, but plain text only since
+# the output feeds the RAG chunker, not a human reader
+register_prompt("ocr.pages", """
+    Transcribe all visible text content from each of the scanned textbook page images exactly as written, keeping the original language and script. Describe any diagrams or charts in one short line each. Do not add commentary.
+
+    Start each page with a header line of the form:
+    ### PAGE <number>
+
+    Number of pages, in order: {num_pages}
+    """)
+
+register_prompt("rag.answer", """
+    Answer the question from the context below. Give a detailed response that incorporates relevant information from the context while staying focused on the question.
+
+    Context:
+    {context}
+
+    Question: {question}
+    """)
+
+register_prompt("structured.repair", """
+    This JSON response did not match its schema. Return it corrected, changing only what the error requires.
+
+    Error: {error}
+    Response: {response}
+    """)
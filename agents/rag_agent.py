@@ -1,49 +1,54 @@
 import os
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
 try:
     import numpy as np
 except ImportError:
     raise ImportError("Numpy is required. Please install it using 'pip install numpy'")
 
-try:
-    from sklearn.metrics.pairwise import cosine_similarity
-except ImportError:
-    raise ImportError("Scikit-learn is required. Please install it using 'pip install scikit-learn'")
-
+import importlib
 import pickle
 from agents.base_agent import BaseAgent
+from agents.ingestion_queue import IngestionJob, IngestionQueue
+from agents.page_ocr_agent import PageOCRAgent
+from agents.prompts import render_prompt
 from config.sahayak_config import SahayakConfig
-import google.generativeai as genai
 
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError:
-    raise ImportError("Sentence-transformers is required. Please install it using 'pip install sentence-transformers'")
+import json
+import re
 
-try:
-    import PyPDF2
-except ImportError:
-    raise ImportError("PyPDF2 is required. Please install it using 'pip install PyPDF2'")
+# Heavy dependencies (torch via sentence-transformers, scikit-learn, pandas,
+# PyPDF2, python-docx, openpyxl) are imported on first use so that importing
+# this module stays cheap for callers that never ingest or search.
+def _require(module_name: str, package: str):
+    """Import a heavy dependency on first use, with the usual install hint"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise ImportError(f"{package} is required. Please install it using 'pip install {package}'")
 
-try:
-    import docx
-except ImportError:
-    raise ImportError("python-docx is required. Please install it using 'pip install python-docx'")
 
-try:
-    import pandas as pd
-except ImportError:
-    raise ImportError("Pandas is required. Please install it using 'pip install pandas'")
+EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+_shared_embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+
+def _load_embedding_model():
+    """One SentenceTransformer per process, shared by every RAGAgent instance"""
+    global _shared_embedding_model
+    with _embedding_model_lock:
+        if _shared_embedding_model is None:
+            SentenceTransformer = _require('sentence_transformers', 'sentence-transformers').SentenceTransformer
+            _shared_embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        return _shared_embedding_model
 
-import json
-import re
 
 class RAGAgent(BaseAgent):
     """Agent for Retrieval Augmented Generation with multi-document support"""
     
-    def __init__(self):
+    def __init__(self, embedding_model=None):
         super().__init__(
             name="RAG Assistant",
             description="Handles context-aware responses using multi-document knowledge base",
@@ -63,44 +68,174 @@ class RAGAgent(BaseAgent):
             self.logger.addHandler(console_handler)
         
         try:
-            self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            # Any object with a SentenceTransformer-style encode() can be injected,
+            # e.g. the deterministic encoder used by benchmarks/rag_benchmark.py.
+            # Otherwise the shared model is loaded on first use.
+            self._embedding_model = embedding_model
             self.chunk_size = 500
             self.chunk_overlap = 50
-            self.knowledge_base = {
-                'documents': [],  # List of document texts
-                'embeddings': None,  # numpy array of embeddings
-                'metadata': []  # List of document metadata
-            }
+
+            # Embeddings live in a preallocated buffer that grows geometrically,
+            # so appending a document does not copy the whole matrix
+            self.initial_capacity = 1024
+            self.compaction_threshold = 0.25  # Compact once 25% of rows are tombstoned
+            self._embedding_buffer = None
+            self._num_rows = 0
+            self.knowledge_base = self._empty_knowledge_base()
+
+            # Writers swap or extend the index under this lock; readers take a
+            # consistent snapshot under it. kb_version increments on every change.
+            self._kb_lock = threading.RLock()
+            self.kb_version = 0
+            # Rebuilds can overlap on the ingestion queue; only the latest one is swapped in
+            self._rebuild_generation = 0
+            rag_config = SahayakConfig.AGENT_CONFIGS.get('rag_agent', {})
+            self.ingestion_queue = IngestionQueue(
+                max_workers=rag_config.get('ingestion_workers', 2),
+                max_jobs_kept=rag_config.get('max_jobs_kept', 100)
+            )
+
+            # Scanned pages without a text layer are transcribed by the OCR agent
+            self.ocr_enabled = rag_config.get('ocr_enabled', True)
+            self.ocr_min_text_chars = rag_config.get('ocr_min_text_chars', 20)
+            self.ocr_agent = PageOCRAgent()
+
+            # Spreadsheets are streamed in row groups and embedded in batches
+            self.excel_rows_per_chunk = rag_config.get('excel_rows_per_chunk', 50)
+            self.embedding_batch_size = rag_config.get('embedding_batch_size', 256)
             
-            # Create uploads directory
+            # Create uploads and knowledge base directories
             self.uploads_dir = os.path.join(self._get_root_folder(), "data", "uploads")
             os.makedirs(self.uploads_dir, exist_ok=True)
+            self.kb_dir = os.path.join(self._get_root_folder(), "data", "knowledge_base")
+            os.makedirs(self.kb_dir, exist_ok=True)
             
         except Exception as e:
             self.logger.error(f"Error initializing RAG Agent: {str(e)}")
             raise
         
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            self._embedding_model = _load_embedding_model()
+        return self._embedding_model
+
+    def warm_up(self):
+        """Load the embedding model now instead of on the first query"""
+        return self.embedding_model
+
     def _get_root_folder(self) -> str:
         return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
     def _get_knowledge_base_path(self) -> str:
         return os.path.join(self.kb_dir, "knowledge_base.pkl")
 
+    def _empty_knowledge_base(self) -> Dict:
+        self._embedding_buffer = None
+        self._num_rows = 0
+        return {
+            'documents': [],  # List of document texts
+            'embeddings': None,  # numpy array of embeddings (view into the buffer)
+            'metadata': [],  # List of document metadata
+            'deleted': set()  # Row indices tombstoned by remove_document
+        }
+
+    def _reset_embeddings(self, embeddings: Optional[np.ndarray]):
+        """Replace the embedding buffer with the given matrix"""
+        if embeddings is None or len(embeddings) == 0:
+            self._embedding_buffer = None
+            self._num_rows = 0
+            self.knowledge_base['embeddings'] = None
+            return
+
+        embeddings = np.asarray(embeddings)
+        capacity = max(self.initial_capacity, len(embeddings))
+        self._embedding_buffer = np.empty((capacity, embeddings.shape[1]), dtype=embeddings.dtype)
+        self._embedding_buffer[:len(embeddings)] = embeddings
+        self._num_rows = len(embeddings)
+        self.knowledge_base['embeddings'] = self._embedding_buffer[:self._num_rows]
+
+    def _append_embeddings(self, new_embeddings: np.ndarray):
+        """Append embeddings in amortized O(1) per row by doubling the buffer"""
+        new_embeddings = np.asarray(new_embeddings)
+        if self._embedding_buffer is None:
+            self._reset_embeddings(new_embeddings)
+            return
+
+        required = self._num_rows + len(new_embeddings)
+        capacity = len(self._embedding_buffer)
+        if required > capacity:
+            while capacity < required:
+                capacity *= 2
+            grown = np.empty((capacity, self._embedding_buffer.shape[1]), dtype=self._embedding_buffer.dtype)
+            grown[:self._num_rows] = self._embedding_buffer[:self._num_rows]
+            self._embedding_buffer = grown
+
+        self._embedding_buffer[self._num_rows:required] = new_embeddings
+        self._num_rows = required
+        self.knowledge_base['embeddings'] = self._embedding_buffer[:self._num_rows]
+
+    def _live_indices(self) -> List[int]:
+        deleted = self.knowledge_base['deleted']
+        return [i for i in range(len(self.knowledge_base['documents'])) if i not in deleted]
+
+    def _count_live_documents(self) -> int:
+        deleted = self.knowledge_base['deleted']
+        return len(set(
+            meta['source_file']
+            for i, meta in enumerate(self.knowledge_base['metadata'])
+            if i not in deleted
+        ))
+
+    def _count_live_chunks(self) -> int:
+        return len(self.knowledge_base['documents']) - len(self.knowledge_base['deleted'])
+
+    def _largest_page_image(self, page) -> Optional[bytes]:
+        """Return the biggest embedded image of a PDF page, i.e. the scan itself"""
+        try:
+            images = [image.data for image in page.images]
+        except Exception as e:
+            self.logger.warning(f"Could not read page images: {str(e)}")
+            return None
+        return max(images, key=len) if images else None
+
     def _extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file"""
-        text = ""
+        """Extract text from PDF file, transcribing image-only pages via OCR"""
+        page_texts = []
+        scanned_pages = {}  # page index -> page image bytes
+        PyPDF2 = _require('PyPDF2', 'PyPDF2')
         try:
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+                for page_idx, page in enumerate(pdf_reader.pages):
+                    page_text = page.extract_text() or ""
+                    page_texts.append(page_text)
+
+                    if self.ocr_enabled and len(page_text.strip()) < self.ocr_min_text_chars:
+                        page_image = self._largest_page_image(page)
+                        if page_image:
+                            scanned_pages[page_idx] = page_image
+
+            if scanned_pages:
+                self.logger.info(f"Running OCR on {len(scanned_pages)} scanned pages of {file_path}")
+                ocr_texts = self.ocr_agent.extract_text(list(scanned_pages.values()))
+                for page_idx, ocr_text in zip(scanned_pages, ocr_texts):
+                    page_texts[page_idx] = ocr_text
         except Exception as e:
             self.logger.error(f"Error extracting text from PDF {file_path}: {str(e)}")
-        return text
+        return "".join(page_text + "\n" for page_text in page_texts)
+
+    def _extract_text_from_image(self, file_path: str) -> str:
+        """Extract text from a photographed or scanned page via OCR"""
+        if not self.ocr_enabled:
+            return ""
+        with open(file_path, 'rb') as f:
+            return self.ocr_agent.extract_text([f.read()])[0]
 
     def _extract_text_from_docx(self, file_path: str) -> str:
         """Extract text from DOCX file"""
         text = ""
+        docx = _require('docx', 'python-docx')
         try:
             doc = docx.Document(file_path)
             for para in doc.paragraphs:
@@ -109,13 +244,107 @@ class RAGAgent(BaseAgent):
             self.logger.error(f"Error extracting text from DOCX {file_path}: {str(e)}")
         return text
 
+    def _is_tabular(self, file_path: str) -> bool:
+        return os.path.splitext(file_path)[1].lower() in ['.xlsx', '.xls']
+
+    def _format_row_group(self, sheet_name: str, header: List[str], rows: List[List[str]]) -> str:
+        """Render a group of rows with the sheet name and header repeated for context"""
+        lines = [f"Sheet: {sheet_name}", "Columns: " + " | ".join(header)]
+        lines.extend(" | ".join(row) for row in rows)
+        return "\n".join(lines)
+
+    def _iter_excel_row_groups(self, file_path: str) -> Iterator[Tuple[str, Dict]]:
+        """Stream (row group text, metadata) for every sheet of a spreadsheet
+
+        .xlsx files are read with openpyxl in read-only mode so only one row
+        group is held in memory; legacy .xls files fall back to pandas per sheet.
+        """
+        rows_per_chunk = self.excel_rows_per_chunk
+
+        if os.path.splitext(file_path)[1].lower() == '.xls':
+            pd = _require('pandas', 'pandas')
+            for sheet_name, df in pd.read_excel(file_path, sheet_name=None).items():
+                header = [str(column) for column in df.columns]
+                for start in range(0, len(df), rows_per_chunk):
+                    group = df.iloc[start:start + rows_per_chunk]
+                    rows = [["" if pd.isna(v) else str(v) for v in row] for row in group.itertuples(index=False)]
+                    yield self._format_row_group(sheet_name, header, rows), {
+                        'sheet': sheet_name,
+                        'row_start': start + 2,  # 1-based, after the header row
+                        'row_end': start + 1 + len(rows)
+                    }
+            return
+
+        openpyxl = _require('openpyxl', 'openpyxl')
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                header = None
+                rows = []
+                row_start = None
+                last_row = None
+                for row_idx, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                    values = ["" if value is None else str(value) for value in row]
+                    if not any(values):
+                        continue
+                    if header is None:
+                        header = values
+                        continue
+
+                    if row_start is None:
+                        row_start = row_idx
+                    rows.append(values)
+                    last_row = row_idx
+
+                    if len(rows) >= rows_per_chunk:
+                        yield self._format_row_group(sheet.title, header, rows), {
+                            'sheet': sheet.title, 'row_start': row_start, 'row_end': last_row
+                        }
+                        rows = []
+                        row_start = None
+
+                if rows:
+                    yield self._format_row_group(sheet.title, header, rows), {
+                        'sheet': sheet.title, 'row_start': row_start, 'row_end': last_row
+                    }
+        finally:
+            workbook.close()
+
+    def _embed_row_groups(self, file_path: str, job: IngestionJob) -> Tuple[List[str], List[Dict], List[np.ndarray]]:
+        """Embed spreadsheet row groups batch by batch as they are read
+
+        Returns the chunks, their per-chunk metadata and the embedding batches,
+        so callers can append batches without building one large matrix.
+        """
+        chunks, chunk_metadata, embedding_batches = [], [], []
+        batch = []
+        row_groups = self._iter_excel_row_groups(file_path)
+
+        while True:
+            with job.stage('extracting'):
+                row_group = next(row_groups, None)
+
+            if row_group is not None:
+                text, meta = row_group
+                chunks.append(text)
+                chunk_metadata.append(meta)
+                batch.append(text)
+
+            if batch and (row_group is None or len(batch) >= self.embedding_batch_size):
+                with job.stage('embedding'):
+                    embedding_batches.append(self._compute_embeddings(batch))
+                batch = []
+
+            if row_group is None:
+                break
+
+        return chunks, chunk_metadata, embedding_batches
+
     def _extract_text_from_excel(self, file_path: str) -> str:
-        """Extract text from Excel file"""
+        """Extract text from every sheet of an Excel file"""
         text = ""
         try:
-            df = pd.read_excel(file_path)
-            # Convert DataFrame to string representation
-            text = df.to_string(index=False)
+            text = "\n\n".join(chunk for chunk, _ in self._iter_excel_row_groups(file_path))
         except Exception as e:
             self.logger.error(f"Error extracting text from Excel {file_path}: {str(e)}")
         return text
@@ -130,6 +359,8 @@ class RAGAgent(BaseAgent):
             return self._extract_text_from_docx(file_path)
         elif file_extension in ['.xlsx', '.xls']:
             return self._extract_text_from_excel(file_path)
+        elif file_extension in SahayakConfig.STORAGE_CONFIG['allowed_image_types']:
+            return self._extract_text_from_image(file_path)
         elif file_extension == '.txt':
             with open(file_path, 'r', encoding='utf-8') as f:
                 return f.read()
@@ -171,20 +402,49 @@ class RAGAgent(BaseAgent):
         """Compute embeddings for a list of texts"""
         return self.embedding_model.encode(texts, show_progress_bar=True)
 
-    def initialize_knowledge_base(self, uploads_dir: str = None) -> Dict:
-        """Initialize knowledge base from uploaded documents"""
+    def initialize_knowledge_base(self, uploads_dir: str = None, background: bool = False) -> Dict:
+        """Initialize knowledge base from uploaded documents
+
+        With background=True the rebuild runs on the ingestion queue and a job id
+        is returned immediately; the current index keeps serving queries until
+        the new one is swapped in. Starting another rebuild supersedes this one,
+        which then returns status 'superseded' instead of swapping in its index.
+        """
+        if uploads_dir is None:
+            uploads_dir = self.uploads_dir
+
+        with self._kb_lock:
+            self._rebuild_generation += 1
+            generation = self._rebuild_generation
+
+        if background:
+            job_id = self.ingestion_queue.submit(
+                f"Rebuild knowledge base from {uploads_dir}",
+                lambda job: self._build_knowledge_base(uploads_dir, job, generation)
+            )
+            return {
+                'status': 'queued',
+                'job_id': job_id,
+                'uploads_dir': uploads_dir,
+                'timestamp': datetime.now().isoformat(),
+                'agent': self.name
+            }
+
+        return self._build_knowledge_base(uploads_dir, IngestionJob('inline', f"Rebuild from {uploads_dir}"),
+                                          generation)
+
+    def _superseded_result(self, uploads_dir: str) -> Dict:
+        self.logger.info(f"Discarding rebuild from {uploads_dir}, a newer rebuild was started")
+        return {
+            'status': 'superseded',
+            'uploads_dir': uploads_dir,
+            'timestamp': datetime.now().isoformat(),
+            'agent': self.name
+        }
+
+    def _build_knowledge_base(self, uploads_dir: str, job: IngestionJob, generation: int) -> Dict:
         try:
-            if uploads_dir is None:
-                uploads_dir = self.uploads_dir
-            
             self.logger.info(f"Processing documents from: {uploads_dir}")
-            
-            # Reset knowledge base
-            self.knowledge_base = {
-                'documents': [],
-                'embeddings': None,
-                'metadata': []
-            }
 
             if not os.path.exists(uploads_dir):
                 return {
@@ -196,16 +456,39 @@ class RAGAgent(BaseAgent):
 
             documents = []
             metadata = []
+            # Spreadsheets are embedded while streaming, so keep them apart
+            tabular_documents = []
+            tabular_metadata = []
+            tabular_embeddings = []
+            files = [file for file in os.listdir(uploads_dir) if os.path.isfile(os.path.join(uploads_dir, file))]
             
             # Process all files in uploads directory
-            for file in os.listdir(uploads_dir):
+            for file_idx, file in enumerate(files):
                 file_path = os.path.join(uploads_dir, file)
+                file_progress = 0.6 * (file_idx + 1) / len(files)
                 try:
                     self.logger.info(f"Processing file: {file}")
-                    content = self._extract_text_from_file(file_path)
+                    if self._is_tabular(file_path):
+                        chunks, chunk_metadata, embedding_batches = self._embed_row_groups(file_path, job)
+                        tabular_documents.extend(chunks)
+                        for chunk_idx, meta in enumerate(chunk_metadata):
+                            tabular_metadata.append({
+                                'source_file': file,
+                                'chunk_index': chunk_idx + 1,
+                                'created_at': datetime.now().isoformat(),
+                                **meta
+                            })
+                        tabular_embeddings.extend(embedding_batches)
+                        job.progress = file_progress
+                        self.logger.info(f"Added {len(chunks)} row groups from {file}")
+                        continue
+
+                    with job.stage('extracting'):
+                        content = self._extract_text_from_file(file_path)
                     
                     if content.strip():
-                        chunks = self._chunk_text(content)
+                        with job.stage('chunking', file_progress):
+                            chunks = self._chunk_text(content)
                         documents.extend(chunks)
                         
                         # Add metadata for each chunk
@@ -217,25 +500,42 @@ class RAGAgent(BaseAgent):
                             })
                         self.logger.info(f"Added {len(chunks)} chunks from {file}")
                     else:
+                        job.progress = file_progress
                         self.logger.warning(f"No content extracted from {file}")
                         
                 except Exception as e:
                     self.logger.error(f"Error processing file {file}: {str(e)}")
 
-            if documents:
+            if generation != self._rebuild_generation:
+                return self._superseded_result(uploads_dir)
+
+            if documents or tabular_documents:
                 # Compute embeddings for all chunks
-                embeddings = self._compute_embeddings(documents)
+                with job.stage('embedding', 0.95):
+                    embedding_parts = [self._compute_embeddings(documents)] if documents else []
+                    embeddings = np.concatenate(embedding_parts + tabular_embeddings)
+                documents.extend(tabular_documents)
+                metadata.extend(tabular_metadata)
                 
-                self.knowledge_base = {
-                    'documents': documents,
-                    'embeddings': embeddings,
-                    'metadata': metadata
-                }
+                # Swap the new index in as a single step so readers never see a mix
+                with job.stage('indexing'):
+                    with self._kb_lock:
+                        # A rebuild started after this one has newer documents; never replace its index
+                        if generation != self._rebuild_generation:
+                            return self._superseded_result(uploads_dir)
+                        self.knowledge_base = self._empty_knowledge_base()
+                        self.knowledge_base['documents'] = documents
+                        self.knowledge_base['metadata'] = metadata
+                        self._reset_embeddings(embeddings)
+                        self.kb_version += 1
+                        kb_version = self.kb_version
                 
                 return {
                     'status': 'success',
                     'num_documents': len(set(m['source_file'] for m in metadata)),
                     'num_chunks': len(documents),
+                    'kb_version': kb_version,
+                    'stage_timings': dict(job.stage_timings),
                     'timestamp': datetime.now().isoformat(),
                     'agent': self.name
                 }
@@ -257,8 +557,28 @@ class RAGAgent(BaseAgent):
                 'agent': self.name
             }
 
-    def add_document(self, file_path: str) -> Dict:
-        """Add a new document to the knowledge base"""
+    def add_document(self, file_path: str, background: bool = False) -> Dict:
+        """Add a new document to the knowledge base
+
+        With background=True extraction and embedding run on the ingestion queue
+        and a job id is returned immediately; poll it with get_job_status.
+        """
+        if background:
+            job_id = self.ingestion_queue.submit(
+                f"Add {os.path.basename(file_path)}",
+                lambda job: self._add_document(file_path, job)
+            )
+            return {
+                'status': 'queued',
+                'job_id': job_id,
+                'file_path': file_path,
+                'timestamp': datetime.now().isoformat(),
+                'agent': self.name
+            }
+
+        return self._add_document(file_path, IngestionJob('inline', f"Add {os.path.basename(file_path)}"))
+
+    def _add_document(self, file_path: str, job: IngestionJob, replace: bool = False) -> Dict:
         try:
             self.logger.info(f"Processing document: {file_path}")
             
@@ -271,8 +591,22 @@ class RAGAgent(BaseAgent):
                     'agent': self.name
                 }
 
-            content = self._extract_text_from_file(file_path)
-            if not content.strip():
+            if self._is_tabular(file_path):
+                chunks, chunk_metadata, embedding_batches = self._embed_row_groups(file_path, job)
+                job.progress = 0.9
+            else:
+                with job.stage('extracting', 0.4):
+                    content = self._extract_text_from_file(file_path)
+                if content.strip():
+                    with job.stage('chunking', 0.5):
+                        chunks = self._chunk_text(content)
+                    chunk_metadata = [{} for _ in chunks]
+                    with job.stage('embedding', 0.9):
+                        embedding_batches = [self._compute_embeddings(chunks)]
+                else:
+                    chunks = []
+
+            if not chunks:
                 return {
                     'status': 'error',
                     'error': f'No content extracted from file: {file_path}',
@@ -280,69 +614,231 @@ class RAGAgent(BaseAgent):
                     'timestamp': datetime.now().isoformat(),
                     'agent': self.name
                 }
-
-            chunks = self._chunk_text(content)
             self.logger.info(f"Created {len(chunks)} chunks from document")
-            
-            new_embeddings = self._compute_embeddings(chunks)
             file_extension = os.path.splitext(file_path)[1].lower()
 
+            with job.stage('indexing'):
+                with self._kb_lock:
+                    # Old and new version swap under one lock hold, so queries see one of them
+                    replaced_rows = self._tombstone_rows(file_path) if replace else []
+                    self._index_chunks(file_path, chunks, chunk_metadata, embedding_batches)
+                    if replaced_rows:
+                        self._compact_if_needed()
+
+                    # Auto-save after adding document
+                    self.save_knowledge_base()
+
+                    result = {
+                        'status': 'success',
+                        'file_path': file_path,
+                        'file_type': file_extension,
+                        'num_chunks': len(chunks),
+                        'total_documents': self._count_live_documents(),
+                        'total_chunks': self._count_live_chunks(),
+                        'kb_version': self.kb_version,
+                        'timestamp': datetime.now().isoformat(),
+                        'agent': self.name
+                    }
+                    if replace:
+                        result['replaced'] = bool(replaced_rows)
+            result['stage_timings'] = dict(job.stage_timings)
+
+            self.log_interaction(
+                "Document addition",
+                f"Added document: {file_path}",
+                {'num_chunks': len(chunks)}
+            )
+
+            return result
+
+        except Exception as e:
+            error_msg = str(e)
+            self.logger.error(f"Error adding document {file_path}: {error_msg}")
+            return {
+                'status': 'error',
+                'error': error_msg,
+                'file_path': file_path,
+                'timestamp': datetime.now().isoformat(),
+                'agent': self.name
+            }
+
+    def _index_chunks(self, file_path: str, chunks: List[str], chunk_metadata: List[Dict],
+                      embedding_batches: List[np.ndarray]):
+        """Append already-embedded chunks of one file to the knowledge base"""
+        file_extension = os.path.splitext(file_path)[1].lower()
+        with self._kb_lock:
             # Add new chunks and embeddings
-            if self.knowledge_base['embeddings'] is None:
-                self.knowledge_base['embeddings'] = new_embeddings
-            else:
-                self.knowledge_base['embeddings'] = np.vstack([
-                    self.knowledge_base['embeddings'],
-                    new_embeddings
-                ])
+            for embedding_batch in embedding_batches:
+                self._append_embeddings(embedding_batch)
 
             self.knowledge_base['documents'].extend(chunks)
             
-            for chunk_idx, _ in enumerate(chunks):
+            for chunk_idx, meta in enumerate(chunk_metadata):
                 self.knowledge_base['metadata'].append({
                     'source_file': os.path.basename(file_path),  # Store just the filename
                     'file_type': file_extension,
                     'chunk_index': chunk_idx,
-                    'created_at': datetime.now().isoformat()
+                    'created_at': datetime.now().isoformat(),
+                    **meta
                 })
+            self.kb_version += 1
 
-            # Auto-save after adding document
-            self.save_knowledge_base()
-
-            result = {
-                'status': 'success',
-                'file_path': file_path,
-                'file_type': file_extension,
-                'num_chunks': len(chunks),
-                'total_documents': len(set(m['source_file'] for m in self.knowledge_base['metadata'])),
-                'total_chunks': len(self.knowledge_base['documents']),
+    def get_job_status(self, job_id: str) -> Dict:
+        """Return progress, stage timings and result of an ingestion job"""
+        job = self.ingestion_queue.get_job(job_id)
+        if job is None:
+            return {
+                'status': 'error',
+                'error': f'Unknown ingestion job: {job_id}',
                 'timestamp': datetime.now().isoformat(),
                 'agent': self.name
             }
+        return job.to_dict()
+
+    def list_ingestion_jobs(self) -> List[Dict]:
+        return self.ingestion_queue.list_jobs()
+
+    def wait_for_job(self, job_id: str, timeout: float = None) -> Dict:
+        """Block until an ingestion job finishes and return its status"""
+        self.ingestion_queue.wait(job_id, timeout=timeout)
+        return self.get_job_status(job_id)
+
+    def remove_document(self, source_file: str) -> Dict:
+        """Remove a document from the knowledge base by tombstoning its chunks"""
+        try:
+            source_file = os.path.basename(source_file)
+            with self._kb_lock:
+                rows = self._tombstone_rows(source_file)
+
+                if not rows:
+                    return {
+                        'status': 'error',
+                        'error': f'Document not found in knowledge base: {source_file}',
+                        'source_file': source_file,
+                        'timestamp': datetime.now().isoformat(),
+                        'agent': self.name
+                    }
+
+                self.logger.info(f"Removed {len(rows)} chunks of {source_file}")
+
+                compacted = self._compact_if_needed()
+                self.kb_version += 1
+                self.save_knowledge_base()
+
+                result = {
+                    'status': 'success',
+                    'source_file': source_file,
+                    'num_chunks_removed': len(rows),
+                    'compacted': compacted,
+                    'total_documents': self._count_live_documents(),
+                    'total_chunks': self._count_live_chunks(),
+                    'timestamp': datetime.now().isoformat(),
+                    'agent': self.name
+                }
 
             self.log_interaction(
-                "Document addition",
-                f"Added document: {file_path}",
-                {'num_chunks': len(chunks)}
+                "Document removal",
+                f"Removed document: {source_file}",
+                {'num_chunks': len(rows)}
             )
 
             return result
 
         except Exception as e:
             error_msg = str(e)
-            self.logger.error(f"Error adding document {file_path}: {error_msg}")
+            self.logger.error(f"Error removing document {source_file}: {error_msg}")
             return {
                 'status': 'error',
                 'error': error_msg,
-                'file_path': file_path,
+                'source_file': source_file,
                 'timestamp': datetime.now().isoformat(),
                 'agent': self.name
             }
 
+    def replace_document(self, file_path: str) -> Dict:
+        """Replace an existing document with a new version of the same file
+
+        The new version is extracted and embedded first. Its chunks then take
+        the place of the old ones in a single step with a single save, so a
+        failed extraction keeps the old version and queries never see neither.
+        """
+        return self._add_document(file_path, IngestionJob('inline', f"Replace {os.path.basename(file_path)}"),
+                                  replace=True)
+
+    def _tombstone_rows(self, source_file: str) -> List[int]:
+        """Tombstone the live chunks of a file and return their rows; callers must hold _kb_lock"""
+        source_file = os.path.basename(source_file)
+        deleted = self.knowledge_base['deleted']
+        rows = [
+            i for i, meta in enumerate(self.knowledge_base['metadata'])
+            if meta['source_file'] == source_file and i not in deleted
+        ]
+        deleted.update(rows)
+        return rows
+
+    def _compact_if_needed(self) -> bool:
+        """Compact once tombstones pass compaction_threshold; callers must hold _kb_lock"""
+        if len(self.knowledge_base['deleted']) > self.compaction_threshold * len(self.knowledge_base['documents']):
+            self.compact_knowledge_base()
+            return True
+        return False
+
+    def compact_knowledge_base(self) -> Dict:
+        """Drop tombstoned chunks and rebuild the embedding buffer"""
+        with self._kb_lock:
+            num_removed = len(self.knowledge_base['deleted'])
+            live = self._live_indices()
+
+            documents = [self.knowledge_base['documents'][i] for i in live]
+            metadata = [self.knowledge_base['metadata'][i] for i in live]
+            embeddings = self.knowledge_base['embeddings'][live] if live else None
+
+            self.knowledge_base = self._empty_knowledge_base()
+            self.knowledge_base['documents'] = documents
+            self.knowledge_base['metadata'] = metadata
+            self._reset_embeddings(embeddings)
+
+        self.logger.info(f"Compacted knowledge base, dropped {num_removed} chunks")
+
+        return {
+            'status': 'success',
+            'num_chunks_removed': num_removed,
+            'num_chunks': len(documents),
+            'timestamp': datetime.now().isoformat(),
+            'agent': self.name
+        }
+
+    def _search(self, query_embedding: np.ndarray, num_chunks: int) -> List[Tuple[int, float]]:
+        """Exact cosine search over live chunks; callers must hold _kb_lock"""
+        if self.knowledge_base['embeddings'] is None:
+            return []
+
+        # Calculate similarities
+        cosine_similarity = _require('sklearn.metrics.pairwise', 'scikit-learn').cosine_similarity
+        similarities = cosine_similarity(
+            query_embedding,
+            self.knowledge_base['embeddings']
+        )[0]
+
+        # Tombstoned chunks must never be retrieved
+        if self.knowledge_base['deleted']:
+            similarities[list(self.knowledge_base['deleted'])] = -np.inf
+
+        # Get top k chunks
+        num_chunks = min(num_chunks, self._count_live_chunks())
+        top_indices = np.argsort(similarities)[::-1][:num_chunks]
+        return [(int(i), float(similarities[i])) for i in top_indices]
+
+    def retrieve(self, query: str, num_chunks: int = 3) -> List[Tuple[int, float]]:
+        """Return (row index, cosine similarity) of the top live chunks for a query"""
+        query_embedding = self._compute_embeddings([query])
+        with self._kb_lock:
+            return self._search(query_embedding, num_chunks)
+
     def generate_response(self, query: str, num_chunks: int = 3) -> Dict:
         """Generate a context-aware response"""
         try:
-            if not self.knowledge_base['documents']:
+            if not self._count_live_chunks():
                 return {
                     'status': 'error',
                     'error': 'Knowledge base is empty. Please upload some documents first.',
@@ -354,30 +850,18 @@ class RAGAgent(BaseAgent):
             # Get query embedding
             query_embedding = self._compute_embeddings([query])
 
-            # Calculate similarities
-            similarities = cosine_similarity(
-                query_embedding,
-                self.knowledge_base['embeddings']
-            )[0]
-
-            # Get top k chunks and their metadata
-            top_indices = np.argsort(similarities)[-num_chunks:][::-1]
-            relevant_chunks = [self.knowledge_base['documents'][i] for i in top_indices]
-            relevant_metadata = [self.knowledge_base['metadata'][i] for i in top_indices]
+            # Retrieve from a consistent snapshot; the LLM call below runs unlocked
+            with self._kb_lock:
+                top_indices = [index for index, _ in self._search(query_embedding, num_chunks)]
+                relevant_chunks = [self.knowledge_base['documents'][i] for i in top_indices]
+                relevant_metadata = [self.knowledge_base['metadata'][i] for i in top_indices]
             
             # Format sources information
             sources = [f"{meta['source_file']} (chunk {meta['chunk_index'] + 1})" 
                       for meta in relevant_metadata]
             
             # Construct prompt with context
-            prompt = f"""Based on the following context and question, provide a detailed response:
-
-Context:
-{' '.join(relevant_chunks)}
-
-Question: {query}
-
-Provide a response that incorporates relevant information from the context while staying focused on the question."""
+            prompt = render_prompt("rag.answer", context=' '.join(relevant_chunks), question=query)
 
             response = self._make_request(prompt)
             
@@ -421,14 +905,17 @@ Provide a response that incorporates relevant information from the context while
         try:
             save_path = self._get_knowledge_base_path()
             
-            with open(save_path, 'wb') as f:
-                pickle.dump(self.knowledge_base, f)
+            with self._kb_lock:
+                with open(save_path, 'wb') as f:
+                    pickle.dump(self.knowledge_base, f)
+                num_documents = self._count_live_documents()
+                num_chunks = self._count_live_chunks()
             
             result = {
                 'status': 'success',
                 'save_path': save_path,
-                'num_documents': len(set(m['source_file'] for m in self.knowledge_base['metadata'])),
-                'num_chunks': len(self.knowledge_base['documents']),
+                'num_documents': num_documents,
+                'num_chunks': num_chunks,
                 'timestamp': datetime.now().isoformat(),
                 'agent': self.name
             }
@@ -449,6 +936,17 @@ Provide a response that incorporates relevant information from the context while
                 'agent': self.name
             }
 
+    def ensure_loaded(self) -> Dict:
+        """Load the saved knowledge base unless this agent has already loaded or changed one
+
+        Call before adding documents to a new agent: saving would otherwise
+        replace the saved knowledge base with just the new documents.
+        """
+        with self._kb_lock:
+            if self.kb_version or not os.path.exists(self._get_knowledge_base_path()):
+                return {'status': 'success', 'loaded': False, 'agent': self.name}
+        return self.load_knowledge_base()
+
     def load_knowledge_base(self) -> Dict:
         """Load knowledge base from disk"""
         try:
@@ -463,13 +961,21 @@ Provide a response that incorporates relevant information from the context while
                 }
 
             with open(load_path, 'rb') as f:
-                self.knowledge_base = pickle.load(f)
+                loaded = pickle.load(f)
+
+            with self._kb_lock:
+                self.knowledge_base = self._empty_knowledge_base()
+                self.knowledge_base['documents'] = loaded['documents']
+                self.knowledge_base['metadata'] = loaded['metadata']
+                self.knowledge_base['deleted'] = set(loaded.get('deleted', set()))
+                self._reset_embeddings(loaded['embeddings'])
+                self.kb_version += 1
             
             result = {
                 'status': 'success',
                 'load_path': load_path,
-                'num_documents': len(set(m['source_file'] for m in self.knowledge_base['metadata'])),
-                'num_chunks': len(self.knowledge_base['documents']),
+                'num_documents': self._count_live_documents(),
+                'num_chunks': self._count_live_chunks(),
                 'timestamp': datetime.now().isoformat(),
                 'agent': self.name
             }
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from config.sahayak_config import SahayakConfig
+
+
+class RateLimiter:
+    """Thread-safe sliding-window limiter: at most max_requests per period seconds"""
+
+    def __init__(self, max_requests: int, period: float = 60.0):
+        self.max_requests = max_requests
+        self.period = period
+        self._timestamps = deque()
+        self._lock = threading.Lock()
+        self.num_acquired = 0
+        self.num_waits = 0
+        self.total_wait_seconds = 0.0
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= self.period:
+                    self._timestamps.popleft()
+
+                if len(self._timestamps) < self.max_requests:
+                    self._timestamps.append(now)
+                    self.num_acquired += 1
+                    if waited:
+                        self.num_waits += 1
+                        self.total_wait_seconds += waited
+                    return waited
+
+                sleep_time = self.period - (now - self._timestamps[0])
+
+            time.sleep(sleep_time)
+            waited += sleep_time
+
+
+_model_limiters: Dict[str, RateLimiter] = {}
+_model_limiters_lock = threading.Lock()
+
+
+def get_model_rate_limiter(model_name: str) -> RateLimiter:
+    """Shared per-minute limiter for a model, sized from the current tier's ModelConfig"""
+    with _model_limiters_lock:
+        if model_name not in _model_limiters:
+            requests_per_minute = SahayakConfig.SECURITY_CONFIG['max_requests_per_minute']
+            for model_config in SahayakConfig.MODEL_CONFIGS[SahayakConfig.MODEL_TIER].values():
+                if model_config and model_config.name == model_name:
+                    requests_per_minute = model_config.rate_limit_per_minute
+                    break
+            _model_limiters[model_name] = RateLimiter(requests_per_minute)
+        return _model_limiters[model_name]
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict]:
+    """Requests admitted and time spent waiting per model limiter"""
+    with _model_limiters_lock:
+        limiters = dict(_model_limiters)
+    return {
+        model_name: {
+            'acquired': limiter.num_acquired,
+            'waits': limiter.num_waits,
+            'total_wait_seconds': round(limiter.total_wait_seconds, 3)
+        }
+        for model_name, limiter in limiters.items()
+    }
@@ -0,0 +1,126 @@
+import dataclasses
+import json
+import re
+import typing
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Dict, Type, TypeVar
+
+T = TypeVar('T')
+
+_CODE_FENCE = re.compile(r'\A```(?:json)?\s*|\s*```\Z')
+_SCALAR_TYPES = {str: 'string', int: 'integer', float: 'number', bool: 'boolean'}
+
+
+class StructuredOutputError(ValueError):
+    """A model response that is not JSON or does not match the expected result type"""
+
+
+@lru_cache(maxsize=None)
+def response_schema(result_type: type) -> Dict:
+    """
+    Response schema for a dataclass, in the OpenAPI subset Gemini accepts.
+
+    Fields may be str, int, float, bool, an Enum of strings, a nested
+    dataclass, List[...] or Optional[...] of these. Fields without a
+    default are required. The returned dict is shared; do not modify it.
+    """
+    return _schema_for(result_type)
+
+
+def _schema_for(tp) -> Dict:
+    origin, args = typing.get_origin(tp), typing.get_args(tp)
+    if origin is typing.Union and type(None) in args:
+        inner = [arg for arg in args if arg is not type(None)]
+        if len(inner) == 1:
+            return {**_schema_for(inner[0]), 'nullable': True}
+    if origin is list:
+        return {'type': 'array', 'items': _schema_for(args[0])}
+    if dataclasses.is_dataclass(tp):
+        hints = typing.get_type_hints(tp)
+        fields = dataclasses.fields(tp)
+        return {
+            'type': 'object',
+            'properties': {field.name: _schema_for(hints[field.name]) for field in fields},
+            'required': [field.name for field in fields if _is_required(field)]
+        }
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        return {'type': 'string', 'format': 'enum', 'enum': [member.value for member in tp]}
+    if tp in _SCALAR_TYPES:
+        return {'type': _SCALAR_TYPES[tp]}
+    raise TypeError(f"No response schema for type {tp!r}")
+
+
+def _is_required(field: dataclasses.Field) -> bool:
+    return field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING
+
+
+def parse_structured(text: str, result_type: Type[T]) -> T:
+    """Parse a JSON response into result_type, raising StructuredOutputError if it doesn't fit"""
+    try:
+        data = json.loads(_CODE_FENCE.sub('', text.strip()))
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"response is not valid JSON ({e})")
+    return _convert(data, result_type, result_type.__name__)
+
+
+def _convert(value: Any, tp, path: str) -> Any:
+    origin, args = typing.get_origin(tp), typing.get_args(tp)
+    if origin is typing.Union and type(None) in args:
+        if value is None:
+            return None
+        tp = next(arg for arg in args if arg is not type(None))
+        origin, args = typing.get_origin(tp), typing.get_args(tp)
+
+    if origin is list:
+        if not isinstance(value, list):
+            raise StructuredOutputError(f"{path} must be a list")
+        return [_convert(item, args[0], f"{path}[{i}]") for i, item in enumerate(value)]
+
+    if dataclasses.is_dataclass(tp):
+        if not isinstance(value, dict):
+            raise StructuredOutputError(f"{path} must be an object")
+        hints = typing.get_type_hints(tp)
+        kwargs = {}
+        for field in dataclasses.fields(tp):
+            if field.name in value and value[field.name] is not None:
+                kwargs[field.name] = _convert(value[field.name], hints[field.name], f"{path}.{field.name}")
+            elif _is_required(field):
+                raise StructuredOutputError(f"{path}.{field.name} is missing")
+        return tp(**kwargs)
+
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        try:
+            return tp(value)
+        except ValueError:
+            raise StructuredOutputError(f"{path} is {value!r}, expected one of "
+                                        f"{', '.join(repr(member.value) for member in tp)}")
+
+    # Scalars: accept what JSON mode occasionally produces, like "5" for an integer
+    if tp is bool and isinstance(value, bool):
+        return value
+    if tp is int and not isinstance(value, bool):
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and re.fullmatch(r'\s*-?\d+\s*', value):
+            return int(value)
+    if tp is float and not isinstance(value, bool):
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    if tp is str and isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise StructuredOutputError(f"{path} is {value!r}, expected {_SCALAR_TYPES.get(tp, tp)}")
+
+
+def to_dict(result) -> Dict:
+    """A parsed result as plain JSON-compatible data, enums as their values"""
+    return dataclasses.asdict(result, dict_factory=lambda items: {
+        key: value.value if isinstance(value, Enum) else value for key, value in items
+    })
@@ -0,0 +1,251 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+
+class TaskStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class TaskPriority(Enum):
+    LOW = 1
+    NORMAL = 2
+    HIGH = 3
+    URGENT = 4
+
+
+# Fairness key of requests that carry neither a teacher nor a session id
+ANONYMOUS_TEACHER = "anonymous"
+
+
+class AdmissionError(Exception):
+    """Raised when the scheduler refuses a task because it is overloaded"""
+
+
+@dataclass
+class AgentTask:
+    """Handle for a scheduled agent call; status moves through TaskStatus"""
+    task_id: str
+    agent_key: str
+    teacher_id: str
+    priority: TaskPriority
+    fn: Callable[[], Any] = field(repr=False)
+    status: TaskStatus = TaskStatus.PENDING
+    result: Any = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None) -> Any:
+        """Block until the task finishes or is cancelled and return its result"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Task {self.task_id} did not finish within {timeout}s")
+        return self.result
+
+    def to_dict(self) -> Dict:
+        return {
+            'task_id': self.task_id,
+            'agent': self.agent_key,
+            'teacher_id': self.teacher_id,
+            'priority': self.priority.name,
+            'status': self.status.value,
+            'error': self.error,
+            'queue_wait': self.queue_wait,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class TaskScheduler:
+    """
+    Priority scheduler with a worker pool per agent.
+
+    Each agent has its own queue, split by priority and then by teacher.
+    Workers always serve the highest non-empty priority and rotate between
+    teachers within it, so one teacher's bulk job cannot starve another's
+    requests and urgent requests jump ahead of everything else. Requests
+    with no known teacher share the ANONYMOUS_TEACHER key; it is bounded by
+    the global queue size only, since it stands for many unrelated users.
+    """
+
+    def __init__(self, workers_per_agent: Dict[str, int] = None, default_workers: int = 2,
+                 max_queue_size: int = 100, max_pending_per_teacher: int = 10,
+                 max_tasks_kept: int = 1000):
+        self.workers_per_agent = workers_per_agent or {}
+        self.default_workers = default_workers
+        self.max_queue_size = max_queue_size
+        self.max_pending_per_teacher = max_pending_per_teacher
+        self.max_tasks_kept = max_tasks_kept
+
+        self._lock = threading.Lock()
+        self._conditions: Dict[str, threading.Condition] = {}
+        # agent -> priority -> teacher -> pending tasks
+        self._queues: Dict[str, Dict[TaskPriority, "OrderedDict[str, deque]"]] = {}
+        self._tasks: "OrderedDict[str, AgentTask]" = OrderedDict()
+        self._workers: Dict[str, list] = {}
+        self._pending_count = 0
+        self._pending_by_teacher: Dict[str, int] = {}
+        self._running_count = 0
+        self._shutdown = False
+
+    def submit(self, agent_key: str, fn: Callable[[], Any], priority: TaskPriority = TaskPriority.NORMAL,
+               teacher_id: str = ANONYMOUS_TEACHER) -> AgentTask:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+
+            # Urgent classroom requests bypass the global cap, never the per-teacher one
+            if priority != TaskPriority.URGENT and self._pending_count >= self.max_queue_size:
+                raise AdmissionError(f"Server busy: {self._pending_count} requests already queued")
+            if (teacher_id != ANONYMOUS_TEACHER
+                    and self._pending_by_teacher.get(teacher_id, 0) >= self.max_pending_per_teacher):
+                raise AdmissionError(f"Too many pending requests for {teacher_id}")
+
+            task = AgentTask(task_id=uuid.uuid4().hex[:12], agent_key=agent_key,
+                             teacher_id=teacher_id, priority=priority, fn=fn)
+            levels = self._queues.setdefault(agent_key, {})
+            teachers = levels.setdefault(priority, OrderedDict())
+            teachers.setdefault(teacher_id, deque()).append(task)
+
+            self._tasks[task.task_id] = task
+            self._pending_count += 1
+            self._pending_by_teacher[teacher_id] = self._pending_by_teacher.get(teacher_id, 0) + 1
+            self._prune_finished_tasks()
+
+            self._ensure_workers(agent_key)
+            self._conditions[agent_key].notify()
+
+        return task
+
+    def cancel(self, task_id: str) -> bool:
+        """Cancel a task that has not started yet"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.status != TaskStatus.PENDING:
+                return False
+
+            teachers = self._queues[task.agent_key][task.priority]
+            teachers[task.teacher_id].remove(task)
+            if not teachers[task.teacher_id]:
+                del teachers[task.teacher_id]
+            self._mark_dequeued(task)
+
+            task.status = TaskStatus.CANCELLED
+            task.finished_at = time.time()
+            task._done.set()
+            return True
+
+    def get_task(self, task_id: str) -> Optional[AgentTask]:
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'pending': self._pending_count,
+                'running': self._running_count,
+                'pending_by_agent': {
+                    agent_key: sum(len(tasks) for teachers in levels.values() for tasks in teachers.values())
+                    for agent_key, levels in self._queues.items()
+                },
+                'pending_by_teacher': dict(self._pending_by_teacher),
+                'workers': {agent_key: len(workers) for agent_key, workers in self._workers.items()}
+            }
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown = True
+            for condition in self._conditions.values():
+                condition.notify_all()
+
+    def _ensure_workers(self, agent_key: str):
+        if agent_key in self._workers:
+            return
+
+        self._conditions[agent_key] = threading.Condition(self._lock)
+        num_workers = self.workers_per_agent.get(agent_key, self.default_workers)
+        self._workers[agent_key] = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker_loop, args=(agent_key,),
+                                      name=f"{agent_key}-worker-{i}", daemon=True)
+            worker.start()
+            self._workers[agent_key].append(worker)
+
+    def _next_task(self, agent_key: str) -> Optional[AgentTask]:
+        levels = self._queues.get(agent_key, {})
+        for priority in sorted(levels, key=lambda p: p.value, reverse=True):
+            teachers = levels[priority]
+            if not teachers:
+                continue
+
+            # Round-robin: serve the first teacher, then move them to the back
+            teacher_id, tasks = next(iter(teachers.items()))
+            task = tasks.popleft()
+            if tasks:
+                teachers.move_to_end(teacher_id)
+            else:
+                del teachers[teacher_id]
+            return task
+        return None
+
+    def _mark_dequeued(self, task: AgentTask):
+        self._pending_count -= 1
+        self._pending_by_teacher[task.teacher_id] -= 1
+        if not self._pending_by_teacher[task.teacher_id]:
+            del self._pending_by_teacher[task.teacher_id]
+
+    def _prune_finished_tasks(self):
+        excess = len(self._tasks) - self.max_tasks_kept
+        if excess <= 0:
+            return
+        finished = [task_id for task_id, task in self._tasks.items() if task.done()]
+        for task_id in finished[:excess]:
+            del self._tasks[task_id]
+
+    def _worker_loop(self, agent_key: str):
+        condition = self._conditions[agent_key]
+        while True:
+            with self._lock:
+                task = self._next_task(agent_key)
+                while task is None:
+                    if self._shutdown:
+                        return
+                    condition.wait()
+                    task = self._next_task(agent_key)
+
+                self._mark_dequeued(task)
+                self._running_count += 1
+                task.status = TaskStatus.RUNNING
+                task.started_at = time.time()
+
+            try:
+                task.result = task.fn()
+                task.status = TaskStatus.COMPLETED
+            except Exception as e:
+                task.error = str(e)
+                task.status = TaskStatus.FAILED
+            finally:
+                task.finished_at = time.time()
+                with self._lock:
+                    self._running_count -= 1
+                task._done.set()
@@ -0,0 +1,216 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from config.sahayak_config import SahayakConfig
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('sahayak_current_span', default=None)
+
+
+class Span:
+    """A timed operation with attributes; nested spans share the trace_id of their root"""
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self._parent = parent
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def set_error(self, error: str):
+        self.status = "error"
+        self.error = error
+
+    def end(self):
+        if self.duration_ms is None:
+            self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+            self._tracer._export(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.set_error(f"{exc_type.__name__}: {exc}")
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+
+class _NoOpSpan:
+    """Returned while tracing is disabled; every method does nothing"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def set_error(self, error: str):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self) -> "_NoOpSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoOpSpan()
+
+
+class SpanExporter:
+    """Receives every finished span"""
+
+    def export(self, span: Span):
+        raise NotImplementedError
+
+
+class ConsoleSpanExporter(SpanExporter):
+    """Logs one line per span, indented by depth within its trace"""
+
+    def __init__(self):
+        self.logger = logging.getLogger("sahayak.tracing")
+
+    def export(self, span: Span):
+        depth = _depth(span._parent)
+        attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+        status = "" if span.status == "ok" else f" [{span.status}: {span.error}]"
+        self.logger.info(f"{span.trace_id[:8]} {'  ' * depth}{span.name} {span.duration_ms}ms {attributes}{status}")
+
+
+class JsonSpanExporter(SpanExporter):
+    """Appends spans as JSON lines, one file per process"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False, exporters: List[SpanExporter] = None):
+        self.enabled = enabled
+        self.exporters = exporters or []
+
+    def start_span(self, name: str, **attributes):
+        """Context manager for a span nested under the current one"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def _export(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logging.getLogger("sahayak.tracing").warning(f"Span export failed: {str(e)}")
+
+
+def _depth(span: Optional[Span]) -> int:
+    depth = 0
+    while span is not None and depth < 32:
+        depth += 1
+        span = getattr(span, '_parent', None)
+    return depth
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def _create_tracer() -> Tracer:
+    config = SahayakConfig.TRACING_CONFIG
+    if not config.get('enabled'):
+        return Tracer(enabled=False)
+
+    exporters = []
+    for name in config.get('exporters', ['console']):
+        if name == 'console':
+            exporters.append(ConsoleSpanExporter())
+        elif name == 'json':
+            path = config.get('json_path') or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "traces",
+                f"spans_{os.getpid()}.jsonl")
+            exporters.append(JsonSpanExporter(path))
+        else:
+            raise ValueError(f"Unknown span exporter '{name}'")
+    return Tracer(enabled=True, exporters=exporters)
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = _create_tracer()
+        return _tracer
+
+
+def set_tracer(tracer: Tracer):
+    """Replace the process tracer, e.g. Tracer(enabled=True, exporters=[...]) in tests"""
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+
+
+def start_span(name: str, **attributes):
+    """Shortcut for get_tracer().start_span; a no-op when tracing is disabled"""
+    return get_tracer().start_span(name, **attributes)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def propagate(fn: Callable) -> Callable:
+    """Bind fn to the caller's context (current span, usage scope) for running on another thread"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A Context can only be entered by one thread at a time, so run each call in a copy
+        return context.copy().run(fn, *args, **kwargs)
+    return run
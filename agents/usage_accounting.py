@@ -0,0 +1,241 @@
+import contextvars
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from config.sahayak_config import SahayakConfig
+
+# Who a model call is made for: teacher_id, session_id, language, method.
+# Set by AgentManager around each request and carried to worker threads
+# by tracing.propagate().
+_usage_scope: contextvars.ContextVar = contextvars.ContextVar('sahayak_usage_scope', default={})
+
+# Gemini bills an image as a fixed number of input tokens
+IMAGE_TOKENS = 258
+
+# Dimensions usage is aggregated over; budgets can be set for each
+DIMENSIONS = ('agent', 'model', 'language', 'teacher', 'session', 'method')
+
+
+class BudgetExceededError(Exception):
+    """Raised before a model call when a daily token budget is already spent"""
+
+    def __init__(self, dimension: str, key: str, used: int, budget: int):
+        super().__init__(f"Daily token budget for {dimension} '{key}' is spent ({used}/{budget} tokens)")
+        self.dimension = dimension
+        self.key = key
+        self.used = used
+        self.budget = budget
+
+
+@contextmanager
+def usage_scope(**attributes):
+    """Attribute model calls made inside the block, e.g. usage_scope(teacher_id='t1')
+
+    Nested scopes add to the enclosing one; None values are ignored.
+    """
+    scope = {**_usage_scope.get(), **{key: value for key, value in attributes.items() if value is not None}}
+    token = _usage_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _usage_scope.reset(token)
+
+
+def current_usage_scope() -> Dict:
+    return _usage_scope.get()
+
+
+def estimate_tokens(contents) -> int:
+    """Rough token count (about 4 characters per token) for backends that report none"""
+    parts = [contents] if isinstance(contents, str) else list(contents or [])
+    tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            tokens += (len(part) + 3) // 4
+        else:
+            tokens += IMAGE_TOKENS
+    return tokens
+
+
+class UsageTracker:
+    """
+    Token and cost counters per agent, model, language, teacher, session
+    and agent method, plus today's totals for enforcing daily budgets.
+    """
+
+    def __init__(self, daily_budgets: Dict = None, teacher_budgets: Dict[str, int] = None,
+                 token_prices: Dict[str, Dict[str, float]] = None, recent_calls: int = 500):
+        self.daily_budgets = daily_budgets or {}
+        self.teacher_budgets = teacher_budgets or {}
+        self.token_prices = token_prices or {}
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, Dict]] = {dimension: {} for dimension in DIMENSIONS}
+        self._day = date.today()
+        self._today: Dict[str, Dict[str, int]] = {dimension: {} for dimension in DIMENSIONS}
+        self._today_total = 0
+        self.recent = deque(maxlen=recent_calls)
+        self.budget_rejections = 0
+
+    def _keys(self, agent: str, model: str, scope: Dict) -> Dict[str, str]:
+        return {
+            'agent': agent,
+            'model': model,
+            'language': scope.get('language', 'unknown'),
+            'teacher': scope.get('teacher_id', 'anonymous'),
+            'session': scope.get('session_id', 'none'),
+            'method': f"{agent}.{scope['method']}" if scope.get('method') else agent
+        }
+
+    def _roll_day(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._today = {dimension: {} for dimension in DIMENSIONS}
+            self._today_total = 0
+
+    def _budget_for(self, dimension: str, key: str) -> Optional[int]:
+        if dimension == 'teacher' and key in self.teacher_budgets:
+            return self.teacher_budgets[key]
+        budget = self.daily_budgets.get(dimension)
+        if isinstance(budget, dict):
+            return budget.get(key)
+        return budget
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+        """Estimated USD: per-token prices if configured, else the model's cost_per_request
+
+        Cached input tokens are charged at the 'cached_input' price when one is set.
+        """
+        prices = self.token_prices.get(model)
+        if prices:
+            cached_price = prices.get('cached_input', prices.get('input', 0.0))
+            return ((input_tokens - cached_tokens) * prices.get('input', 0.0) + cached_tokens * cached_price
+                    + output_tokens * prices.get('output', 0.0)) / 1e6
+        for model_config in SahayakConfig.MODEL_CONFIGS[SahayakConfig.MODEL_TIER].values():
+            if model_config and model_config.name == model:
+                return model_config.cost_per_request
+        return 0.0
+
+    def check_budget(self, agent: str, model: str, scope: Dict = None):
+        """Raise BudgetExceededError if any budget covering this call is used up"""
+        scope = current_usage_scope() if scope is None else scope
+        with self._lock:
+            self._roll_day()
+            total_budget = self.daily_budgets.get('total')
+            if total_budget is not None and self._today_total >= total_budget:
+                self.budget_rejections += 1
+                raise BudgetExceededError('total', 'all', self._today_total, total_budget)
+            for dimension, key in self._keys(agent, model, scope).items():
+                budget = self._budget_for(dimension, key)
+                used = self._today[dimension].get(key, 0)
+                if budget is not None and used >= budget:
+                    self.budget_rejections += 1
+                    raise BudgetExceededError(dimension, key, used, budget)
+
+    def record(self, agent: str, model: str, input_tokens: int, output_tokens: int,
+               latency: float, estimated: bool = False, scope: Dict = None, cached_tokens: int = 0):
+        scope = current_usage_scope() if scope is None else scope
+        tokens = input_tokens + output_tokens
+        cost = self.cost(model, input_tokens, output_tokens, cached_tokens)
+        keys = self._keys(agent, model, scope)
+        with self._lock:
+            self._roll_day()
+            for dimension, key in keys.items():
+                totals = self._totals[dimension].setdefault(key, {
+                    'requests': 0, 'input_tokens': 0, 'cached_input_tokens': 0, 'output_tokens': 0,
+                    'cost_usd': 0.0, 'latency_seconds': 0.0
+                })
+                totals['requests'] += 1
+                totals['input_tokens'] += input_tokens
+                totals['cached_input_tokens'] += cached_tokens
+                totals['output_tokens'] += output_tokens
+                totals['cost_usd'] += cost
+                totals['latency_seconds'] += latency
+                self._today[dimension][key] = self._today[dimension].get(key, 0) + tokens
+            self._today_total += tokens
+            self.recent.append({
+                'timestamp': datetime.now().isoformat(),
+                **keys,
+                'input_tokens': input_tokens,
+                'cached_input_tokens': cached_tokens,
+                'output_tokens': output_tokens,
+                'estimated': estimated,
+                'cost_usd': cost,
+                'latency_seconds': round(latency, 3)
+            })
+
+    def get_usage(self, dimension: str = None, top: int = None) -> Dict:
+        """Totals per key, most tokens first; all dimensions if none is given"""
+        dimensions = [dimension] if dimension else DIMENSIONS
+        with self._lock:
+            self._roll_day()
+            usage = {}
+            for name in dimensions:
+                rows = []
+                for key, totals in self._totals[name].items():
+                    rows.append((key, {
+                        **totals,
+                        'total_tokens': totals['input_tokens'] + totals['output_tokens'],
+                        'cost_usd': round(totals['cost_usd'], 6),
+                        'latency_seconds': round(totals['latency_seconds'], 3),
+                        'avg_latency_seconds': round(totals['latency_seconds'] / totals['requests'], 3),
+                        'tokens_today': self._today[name].get(key, 0),
+                        'daily_budget': self._budget_for(name, key)
+                    }))
+                rows.sort(key=lambda row: row[1]['total_tokens'], reverse=True)
+                usage[name] = dict(rows[:top] if top else rows)
+            usage['today'] = {
+                'date': self._day.isoformat(),
+                'total_tokens': self._today_total,
+                'daily_budget': self.daily_budgets.get('total'),
+                'budget_rejections': self.budget_rejections
+            }
+            return usage
+
+    def get_recent(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self.recent)[-limit:]
+
+
+_tracker: Optional[UsageTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_usage_tracker() -> UsageTracker:
+    """Process-wide tracker configured from SahayakConfig.USAGE_CONFIG"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            config = SahayakConfig.USAGE_CONFIG
+            _tracker = UsageTracker(daily_budgets=config.get('daily_token_budgets'),
+                                    teacher_budgets=config.get('teacher_token_budgets'),
+                                    token_prices=config.get('token_prices_per_million'),
+                                    recent_calls=config.get('recent_calls', 500))
+        return _tracker
+
+
+def check_budget(agent: str, model: str):
+    if SahayakConfig.USAGE_CONFIG.get('enabled', True):
+        get_usage_tracker().check_budget(agent, model)
+
+
+def record_usage(agent: str, model: str, contents, response: str, latency: float):
+    """Record one upstream call, using the backend's token counts when it reports them"""
+    if not SahayakConfig.USAGE_CONFIG.get('enabled', True):
+        return
+    input_tokens = getattr(response, 'input_tokens', None)
+    output_tokens = getattr(response, 'output_tokens', None)
+    estimated = input_tokens is None or output_tokens is None
+    if input_tokens is None:
+        input_tokens = estimate_tokens(contents)
+    if output_tokens is None:
+        output_tokens = estimate_tokens(response)
+    get_usage_tracker().record(agent, model, input_tokens, output_tokens, latency, estimated=estimated,
+                               cached_tokens=getattr(response, 'cached_tokens', None) or 0)
+
+
+def get_usage_stats(dimension: str = None, top: int = None) -> Dict:
+    return get_usage_tracker().get_usage(dimension, top)
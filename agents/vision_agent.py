@@ -1,7 +1,65 @@
 import os
+import re
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List
-from agents.base_agent import BaseAgent
+from typing import Dict, List, Optional, Union
+from agents.base_agent import BaseAgent, ModelError, find_model_error
+from agents.extraction_cache import ExtractionCache, exact_hash, get_extraction_cache, perceptual_hash
+from agents.prompts import render_prompt
+from agents.rate_limiter import get_model_rate_limiter
+from agents.structured_output import to_dict
+from agents.tracing import propagate, start_span
+from config.sahayak_config import SahayakConfig
+
+@dataclass
+class MultipleChoiceQuestion:
+    question: str
+    options: List[str]
+    answer: str
+
+@dataclass
+class WorksheetQuestion:
+    question: str
+    answer: str
+
+@dataclass
+class Worksheet:
+    title: str
+    instructions: str
+    multiple_choice: List[MultipleChoiceQuestion]
+    short_answers: List[WorksheetQuestion]
+    fill_in_the_blanks: List[WorksheetQuestion]
+    think_and_apply: List[WorksheetQuestion]
+
+@dataclass
+class GradeWorksheet:
+    grade: int
+    worksheet: Worksheet
+
+@dataclass
+class WorksheetSet:
+    worksheets: List[GradeWorksheet]
+
+
+def format_worksheet(worksheet: Dict) -> str:
+    """Render a worksheet dict as the sectioned text saved and shown to teachers"""
+    lines = [f"**Worksheet Title:** {worksheet['title']}", "", f"**Instructions:** {worksheet['instructions']}"]
+    answers = []
+    sections = [('Section A - Multiple Choice', 'multiple_choice'), ('Section B - Short Answers', 'short_answers'),
+                ('Section C - Fill in the Blanks', 'fill_in_the_blanks'), ('Section D - Think and Apply', 'think_and_apply')]
+    for heading, key in sections:
+        lines += ["", f"**{heading}:**"]
+        for i, item in enumerate(worksheet[key], 1):
+            lines.append(f"{i}. {item['question']}")
+            for letter, option in zip("abcdefgh", item.get('options', [])):
+                lines.append(f"   {letter}) {option}")
+            answers.append(f"{heading.split(' - ')[0]} {i}: {item['answer']}")
+    lines += ["", "**Answer Key:**", *answers]
+    return "\n".join(lines)
+
 
 class GeminiVisionAgent(BaseAgent):
     """Agent for processing images and creating differentiated content"""
@@ -16,43 +74,65 @@ class GeminiVisionAgent(BaseAgent):
         # This ensures all paths resolve to project root
         return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-    def extract_text_from_textbook(self, image_path: str) -> Dict:
-        """Extract text and structure from a textbook page"""
-
-        prompt = """
-        Analyze this textbook page and extract:
-        1. All visible text content
-        2. The subject/topic being covered
-        3. Grade level (if identifiable)
-        4. Key concepts mentioned
-        5. Any diagrams, charts, or images described
-
-        Format your response as:
-        **Subject:** [Subject identified]
-        **Grade Level:** [Estimated grade level]
-        **Main Topic:** [Primary topic]
-        **Text Content:** [All text content]
-        **Key Concepts:** [Important concepts listed]
-        **Visual Elements:** [Description of any diagrams/images]
-        **Learning Objectives:** [What students should learn from this page]
+    def _get_extraction_cache(self, prompt: str) -> Optional[ExtractionCache]:
+        config = SahayakConfig.AGENT_CONFIGS.get('vision_agent', {})
+        if not config.get('extraction_cache', True):
+            return None
+        # A new model or prompt starts a fresh namespace instead of serving stale extractions
+        namespace = hashlib.sha256(f"{self.model}\0{prompt}".encode('utf-8')).hexdigest()[:16]
+        return get_extraction_cache(namespace, os.path.join(self._get_project_root(), "data", "extraction_cache"),
+                                    max_distance=config.get('extraction_cache_max_distance'))
+
+    def extract_text_from_textbook(self, image_path: str, save_folder: Optional[str] = None) -> Dict:
+        """Extract text and structure from a textbook page
+
+        Extractions are stored by hash of the photo, so a page already
+        extracted by any teacher or process is answered from the store
+        without a model call.
         """
 
-        response = self._make_request(prompt, image_path=image_path)
+        prompt = render_prompt("vision.extract_text")
+
+        cache = self._get_extraction_cache(prompt)
+        cached = None
+        if cache:
+            max_file_size_mb = SahayakConfig.AGENT_CONFIGS.get('vision_agent', {}).get('max_file_size_mb')
+            try:
+                # Oversized files are left to _make_request to reject rather than decoded here
+                if max_file_size_mb is None or os.path.getsize(image_path) <= max_file_size_mb * 1024 * 1024:
+                    image_hash = exact_hash(image_path)
+                    image_phash = perceptual_hash(image_path) if cache.max_distance is not None else None
+                    cached = cache.get(image_hash, image_phash)
+                else:
+                    cache = None
+            except Exception:
+                cache = None  # unreadable image; _make_request reports it
+
+        if cached:
+            response = cached['extraction']
+        else:
+            response = self._make_request(prompt, image_path=image_path)
+            if cache and not isinstance(response, ModelError):
+                if image_phash is None:
+                    image_phash = perceptual_hash(image_path)
+                cache.put(image_hash, image_phash, response, {'image_name': os.path.basename(image_path)})
 
         # Save response
         image_filename = os.path.splitext(os.path.basename(image_path))[0]
         root = self._get_project_root()
-        save_folder = os.path.join(root, "data", "extracted_text")
+        save_folder = save_folder or os.path.join(root, "data", "extracted_text")
         os.makedirs(save_folder, exist_ok=True)
 
         text_path = os.path.join(save_folder, f"{image_filename}_extracted.txt")
-        with open(text_path, "w", encoding="utf-8") as f:
-            f.write(response)
+        with start_span("file.write", path=text_path, chars=len(response)):
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write(response)
 
         result = {
             'image_path': image_path,
             'extracted_content': response,
             'saved_path': text_path,
+            'cache_match': cached['match'] if cached else None,
             'timestamp': datetime.now().isoformat(),
             'agent': self.name
         }
@@ -63,56 +143,242 @@ class GeminiVisionAgent(BaseAgent):
 
         return result
 
-    def generate_differentiated_worksheets(self, content: str, target_grades: List[int]) -> Dict:
-        """Generate worksheets for different grade levels"""
+    def _list_page_images(self, images: Union[str, List[str]]) -> List[str]:
+        """Page photos from a directory in natural order (page_2 before page_10), or the given list"""
+        if isinstance(images, (list, tuple)):
+            return list(images)
+        if not os.path.isdir(images):
+            raise ValueError(f"Not a directory: {images}")
+        formats = SahayakConfig.AGENT_CONFIGS.get('vision_agent', {}).get('supported_formats', [])
+        names = [name for name in os.listdir(images)
+                 if os.path.splitext(name)[1].lower().lstrip('.') in formats]
+        names.sort(key=lambda name: [int(part) if part.isdigit() else part.lower()
+                                     for part in re.split(r'(\d+)', name)])
+        return [os.path.join(images, name) for name in names]
+
+    @staticmethod
+    def _page_fingerprint(image_path: str) -> Dict:
+        stat = os.stat(image_path)
+        return {'image_path': os.path.abspath(image_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def digitize_textbook(self, images: Union[str, List[str]], book_name: Optional[str] = None,
+                          max_concurrency: Optional[int] = None, add_to_knowledge_base: bool = False,
+                          rag_agent=None) -> Dict:
+        """Extract every page of a textbook into data/extracted_text/<book_name>/
+
+        images is a directory of page photos or a list of paths, in page order.
+        Pages are extracted max_concurrency at a time, within the model's rate
+        limit. Each page is written as soon as it is ready and recorded in
+        manifest.jsonl. Calling this again for the same book therefore skips
+        pages already done and unchanged, which resumes an interrupted run, and
+        retries failed ones. The pages are then joined into <book_name>.txt.
+        With add_to_knowledge_base, that file replaces any earlier version in
+        the index of rag_agent, which is then required.
+        """
+        if add_to_knowledge_base and rag_agent is None:
+            raise ValueError("rag_agent is required to add a digitized textbook to the knowledge base")
+
+        vision_config = SahayakConfig.AGENT_CONFIGS.get('vision_agent', {})
+        max_concurrency = max_concurrency or vision_config.get('digitize_max_concurrency', 4)
+        image_paths = self._list_page_images(images)
+        if not book_name:
+            book_name = os.path.basename(os.path.normpath(images)) if isinstance(images, str) else "textbook"
+        book_name = re.sub(r'[^\w\-]+', '_', book_name).strip('_') or "textbook"
+
+        folder = os.path.join(self._get_project_root(), "data", "extracted_text", book_name)
+        os.makedirs(folder, exist_ok=True)
+        manifest_path = os.path.join(folder, "manifest.jsonl")
+
+        # Last manifest record per page wins; a line cut off by an interruption is ignored
+        done = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    done[record['image_path']] = record
+
+        fingerprints = {path: self._page_fingerprint(path) for path in image_paths}
+        page_numbers = {path: number for number, path in enumerate(image_paths, 1)}
+
+        def is_done(path: str) -> bool:
+            record = done.get(fingerprints[path]['image_path'])
+            return bool(record and record['status'] == 'success' and os.path.exists(record['text_path'])
+                        and all(record.get(key) == value for key, value in fingerprints[path].items()))
+
+        pending = [path for path in image_paths if not is_done(path)]
+        failed_pages = {}
+        cache_hits = 0
+
+        def extract_page(path: str) -> Dict:
+            get_model_rate_limiter(self.model).acquire()
+            return self.extract_text_from_textbook(path, folder)
+
+        with open(manifest_path, 'a', encoding='utf-8') as manifest:
+            if pending:
+                with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending)))) as executor:
+                    futures = {executor.submit(propagate(extract_page), path): path for path in pending}
+                    for future in as_completed(futures):
+                        path = futures[future]
+                        record = {**fingerprints[path], 'page': page_numbers[path],
+                                  'timestamp': datetime.now().isoformat()}
+                        try:
+                            result = future.result()
+                            error = find_model_error(result)
+                        except Exception as e:
+                            result, error = None, e
+                        if error is not None:
+                            failed_pages[os.path.basename(path)] = str(error)
+                            record.update(status='error', error=str(error))
+                        else:
+                            cache_hits += result['cache_match'] is not None
+                            record.update(status='success', text_path=result['saved_path'])
+                        done[record['image_path']] = record
+                        manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        manifest.flush()
+
+        # Join the finished pages in page order, including those from earlier runs
+        pages = []
+        for path in image_paths:
+            record = done.get(fingerprints[path]['image_path'])
+            if record and record['status'] == 'success':
+                with open(record['text_path'], 'r', encoding='utf-8') as f:
+                    pages.append(f"### PAGE {page_numbers[path]} ({os.path.basename(path)})\n{f.read().strip()}")
+        book_path = os.path.join(folder, f"{book_name}.txt")
+        with start_span("file.write", path=book_path, pages=len(pages)):
+            with open(book_path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write("\n\n".join(pages))
+            os.replace(book_path + ".tmp", book_path)
+
+        knowledge_base = None
+        if add_to_knowledge_base and pages:
+            knowledge_base = rag_agent.ensure_loaded()
+            if knowledge_base['status'] == 'success':
+                knowledge_base = rag_agent.replace_document(book_path)
+
+        if not pages:
+            status = 'error'
+        elif failed_pages:
+            status = 'partial'
+        else:
+            status = 'success'
+
+        result = {
+            'status': status,
+            'book_name': book_name,
+            'total_pages': len(image_paths),
+            'pages_extracted': len(pending) - len(failed_pages),
+            'pages_resumed': len(image_paths) - len(pending),
+            'cache_hits': cache_hits,
+            'failed_pages': failed_pages,
+            'output_folder': folder,
+            'book_path': book_path,
+            'knowledge_base': knowledge_base,
+            'timestamp': datetime.now().isoformat(),
+            'agent': self.name
+        }
+        if status == 'error':
+            result['error'] = "; ".join(failed_pages.values()) or "No page images found"
+
+        self.log_interaction("Textbook digitization", f"Digitized {len(pages)} of {len(image_paths)} pages", {
+            'book_name': book_name,
+            'failed_pages': list(failed_pages)
+        })
+
+        return result
+
+    def _generate_worksheet(self, content: str, grade: int) -> Dict:
+        prompt = render_prompt("vision.worksheet", grade=grade, content=content)
+        get_model_rate_limiter(self.model).acquire()
+        worksheet = self._make_structured_request(prompt, Worksheet)
+        if isinstance(worksheet, ModelError):
+            raise RuntimeError(worksheet)
+        return to_dict(worksheet)
+
+    def _generate_worksheets_single_prompt(self, content: str, target_grades: List[int]) -> Dict[int, Dict]:
+        """One request for every grade; returns the grades whose worksheet came back"""
+        prompt = render_prompt("vision.worksheets_multi_grade", grades=', '.join(str(g) for g in target_grades),
+                               content=content)
+        get_model_rate_limiter(self.model).acquire()
+        worksheet_set = self._make_structured_request(prompt, WorksheetSet)
+        if isinstance(worksheet_set, ModelError):
+            return {}
+        return {item.grade: to_dict(item.worksheet) for item in worksheet_set.worksheets if item.grade in target_grades}
+
+    def generate_differentiated_worksheets(self, content: str, target_grades: List[int],
+                                           mode: Optional[str] = None) -> Dict:
+        """Generate worksheets for different grade levels
+
+        mode 'per_grade' runs one request per grade concurrently; 'single_prompt'
+        asks for all grades in one response, which sends the content only once,
+        and regenerates any grade missing from it per grade. Each worksheet is
+        saved as soon as it is ready and failed grades are reported, not raised.
+        """
+        vision_config = SahayakConfig.AGENT_CONFIGS.get('vision_agent', {})
+        mode = mode or vision_config.get('worksheet_mode', 'per_grade')
+        max_concurrency = vision_config.get('worksheet_max_concurrency', 3)
 
         worksheets = {}
+        worksheet_data = {}
+        failed_grades = {}
         root = self._get_project_root()
         save_folder = os.path.join(root, "data", "worksheets")
         os.makedirs(save_folder, exist_ok=True)
 
-        for grade in target_grades:
-            prompt = f"""
-            Create a worksheet for Grade {grade} based on this textbook content:
-
-            Content: {content}
-
-            Requirements for Grade {grade}:
-            1. Adjust vocabulary to grade level
-            2. Create age-appropriate questions
-            3. Include variety: MCQ, short answer, fill-in-blanks, true/false
-            4. Add visual thinking questions
-            5. Include practical applications
-
-            Format:
-            **Worksheet Title:** [Title for the worksheet]
-            **Instructions:** [Clear instructions for students]
-            **Section A - Multiple Choice:** [3 MCQ questions with options]
-            **Section B - Short Answers:** [3 short answer questions]
-            **Section C - Fill in the Blanks:** [3 fill-in-the-blank questions]
-            **Section D - Think and Apply:** [1 practical application question]
-            **Answer Key:** [All correct answers]
-            """
-
-            response = self._make_request(prompt)
-            worksheets[f'grade_{grade}'] = response
-
-            # Save each worksheet
+        def save(grade: int, data: Dict):
+            worksheet = format_worksheet(data)
+            worksheets[f'grade_{grade}'] = worksheet
+            worksheet_data[f'grade_{grade}'] = data
             worksheet_path = os.path.join(save_folder, f"worksheet_grade_{grade}.txt")
-            with open(worksheet_path, "w", encoding="utf-8") as f:
-                f.write(response)
+            with start_span("file.write", path=worksheet_path, chars=len(worksheet)):
+                with open(worksheet_path, "w", encoding="utf-8") as f:
+                    f.write(worksheet)
+
+        remaining = list(dict.fromkeys(target_grades))
+        if mode == 'single_prompt' and len(remaining) > 1:
+            for grade, data in self._generate_worksheets_single_prompt(content, remaining).items():
+                save(grade, data)
+            remaining = [grade for grade in remaining if f'grade_{grade}' not in worksheets]
+
+        if remaining:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(remaining)))) as executor:
+                futures = {executor.submit(propagate(self._generate_worksheet), content, grade): grade for grade in remaining}
+                for future in as_completed(futures):
+                    grade = futures[future]
+                    try:
+                        save(grade, future.result())
+                    except Exception as e:
+                        failed_grades[f'grade_{grade}'] = str(e)
+
+        if not failed_grades:
+            status = 'success'
+        elif worksheets:
+            status = 'partial'
+        else:
+            status = 'error'
 
         result = {
+            'status': status,
             'original_content': content,
             'target_grades': target_grades,
-            'worksheets': worksheets,
+            'worksheets': {f'grade_{g}': worksheets[f'grade_{g}'] for g in target_grades if f'grade_{g}' in worksheets},
+            'worksheet_data': {f'grade_{g}': worksheet_data[f'grade_{g}'] for g in target_grades
+                               if f'grade_{g}' in worksheet_data},
+            'failed_grades': failed_grades,
+            'mode': mode,
             'timestamp': datetime.now().isoformat(),
             'agent': self.name
         }
+        if status == 'error':
+            result['error'] = "; ".join(failed_grades.values())
 
         self.log_interaction("Differentiated worksheets creation",
                              f"Created worksheets for grades {target_grades}", {
-                                 'target_grades': target_grades
+                                 'target_grades': target_grades,
+                                 'failed_grades': list(failed_grades),
+                                 'mode': mode
                              })
 
         return result
@@ -159,7 +425,16 @@ class GeminiVisionAgent(BaseAgent):
             if not content or not target_grades:
                 raise ValueError("Both 'content' and 'target_grades' are required for generating worksheets")
 
-            return self.generate_differentiated_worksheets(content=content, target_grades=target_grades)
+            return self.generate_differentiated_worksheets(content=content, target_grades=target_grades,
+                                                           mode=kwargs.get('worksheet_mode'))
+
+        elif task_type == "digitize_textbook":
+            images = kwargs.get('images') or kwargs.get('image_dir')
+            if not images:
+                raise ValueError("'image_dir' or 'images' is required for textbook digitization")
+            return self.digitize_textbook(images, book_name=kwargs.get('book_name'),
+                                          add_to_knowledge_base=kwargs.get('add_to_knowledge_base', False),
+                                          rag_agent=kwargs.get('rag_agent'))
 
         else:
             raise ValueError(f"Unsupported task_type '{task_type}' in VisionAgent.")
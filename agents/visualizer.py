@@ -27,6 +27,39 @@ def save_mindmap_text(text, topic, folder=None):
     return filepath
 
 
+def format_mindmap_text(mindmap):
+    """Render a mind map dict (central_topic, branches, sub_branches, details) as indented text"""
+    lines = [f"**CENTRAL TOPIC: {mindmap['central_topic']}**", "**MAIN BRANCHES (Level 1):**"]
+    for i, branch in enumerate(mindmap['branches'], 1):
+        lines.append(f"Branch {i}: {branch['title']}")
+        sub_branches = branch.get('sub_branches', [])
+        for j, sub_branch in enumerate(sub_branches, 1):
+            last = j == len(sub_branches)
+            lines.append(f"  {'└──' if last else '├──'} Sub-branch {i}.{j}: {sub_branch['title']}")
+            details = sub_branch.get('details', [])
+            for k, detail in enumerate(details, 1):
+                connector = '└──' if k == len(details) else '├──'
+                lines.append(f"  {' ' if last else '│'}   {connector} {i}.{j}.{k}: {detail}")
+    return "\n".join(lines)
+
+
+def mindmap_to_graph(mindmap):
+    """Graph of a mind map dict: the central topic, branches, sub-branches and details at levels 0-3"""
+    G = nx.DiGraph()
+    root = mindmap['central_topic']
+    G.add_node(root, level=0)
+    for branch in mindmap['branches']:
+        G.add_node(branch['title'], level=1)
+        G.add_edge(root, branch['title'])
+        for sub_branch in branch.get('sub_branches', []):
+            G.add_node(sub_branch['title'], level=2)
+            G.add_edge(branch['title'], sub_branch['title'])
+            for detail in sub_branch.get('details', []):
+                G.add_node(detail, level=3)
+                G.add_edge(sub_branch['title'], detail)
+    return G
+
+
 def parse_mindmap_to_graph(structure_text):
     G = nx.DiGraph()
     current_branch = None
@@ -53,7 +86,8 @@ def parse_mindmap_to_graph(structure_text):
     return G
 
 
-def visualize_mindmap_with_networkx(structure_text, topic, folder=None):
+def visualize_mindmap_with_networkx(structure, topic, folder=None):
+    """Draw a mind map, given as a dict (see mindmap_to_graph) or as saved text, to a PNG"""
     # Ensure consistent absolute path to project-root-level data/mindmap_data
     if folder is None:
         root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -61,7 +95,7 @@ def visualize_mindmap_with_networkx(structure_text, topic, folder=None):
 
     os.makedirs(folder, exist_ok=True)
 
-    G = parse_mindmap_to_graph(structure_text)
+    G = mindmap_to_graph(structure) if isinstance(structure, dict) else parse_mindmap_to_graph(structure)
 
     # Layout
     pos = nx.multipartite_layout(G, subset_key="level")
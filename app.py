@@ -1,5 +1,7 @@
 import streamlit as st
 import os
+import shutil
+import uuid
 from utils.setup_env import configure_environment
 import time
 from config.sahayak_config import SahayakConfig
@@ -28,6 +30,10 @@ if 'initialized' not in st.session_state:
     st.session_state.video_agent = VideoAgent()  # Add this line
     st.session_state.uploaded_files = []
     st.session_state.documents_processed = False
+    st.session_state.ingestion_job_id = None
+    st.session_state.session_id = uuid.uuid4().hex  # queues this browser session's requests fairly
+    st.session_state.upload_set_dir = None
+    st.session_state.superseded_upload_sets = []  # (folder, job id) of earlier uploads
     
     # Initialize language preference in RAG agent's context
     st.session_state.rag_agent.context = {
@@ -348,7 +354,8 @@ with tab1:
                 context = {
                     'language': st.session_state.language,
                     'grade_level': 5,
-                    'context': 'rural'
+                    'context': 'rural',
+                    'session_id': st.session_state.session_id
                 }
                 
                 if uploaded_file:
@@ -445,8 +452,8 @@ with tab2:
     # Document Upload Section
     st.markdown("#### 📎 Upload Documents")
     uploaded_docs = st.file_uploader(
-        "Upload PDF, Word, or text documents",
-        type=['txt', 'pdf', 'docx'],
+        "Upload PDF, Word, or text documents (scanned pages and photos are transcribed)",
+        type=['txt', 'pdf', 'docx', 'png', 'jpg', 'jpeg'],
         accept_multiple_files=True,
         help="Upload documents you want to ask questions about"
     )
@@ -461,13 +468,14 @@ with tab2:
         previous_files = [doc.name for doc in st.session_state.uploaded_files]
         
         if current_files != previous_files:
-            # Clear uploads directory
-            for file in os.listdir(uploads_dir):
-                os.remove(os.path.join(uploads_dir, file))
+            # Each upload set gets its own folder, so a rebuild still reading
+            # the previous set never sees its files deleted or overwritten
+            upload_set_dir = os.path.join(uploads_dir, f"set_{uuid.uuid4().hex[:12]}")
+            os.makedirs(upload_set_dir)
             
             # Save new documents
             for doc in uploaded_docs:
-                file_path = os.path.join(uploads_dir, doc.name)
+                file_path = os.path.join(upload_set_dir, doc.name)
                 with open(file_path, "wb") as f:
                     f.write(doc.getvalue())
                 st.info(f"📄 Uploaded: {doc.name}")
@@ -476,14 +484,35 @@ with tab2:
             st.session_state.uploaded_files = uploaded_docs
             st.session_state.documents_processed = False
             
-            # Process documents
-            with st.spinner("Processing documents..."):
-                result = st.session_state.rag_agent.initialize_knowledge_base(uploads_dir)
-                if result['status'] == 'success':
-                    st.success("✅ Documents processed successfully")
-                    st.session_state.documents_processed = True
-                else:
-                    st.error(f"❌ Error: {result.get('error', 'Unknown error')}")
+            # Process documents in the background so the session stays responsive
+            result = st.session_state.rag_agent.initialize_knowledge_base(upload_set_dir, background=True)
+            if st.session_state.upload_set_dir:
+                st.session_state.superseded_upload_sets.append(
+                    (st.session_state.upload_set_dir, st.session_state.ingestion_job_id))
+            st.session_state.upload_set_dir = upload_set_dir
+            st.session_state.ingestion_job_id = result['job_id']
+
+        # Delete earlier upload sets once no rebuild is reading them
+        still_in_use = []
+        for folder, job_id in st.session_state.superseded_upload_sets:
+            if st.session_state.rag_agent.get_job_status(job_id)['status'] in ('queued', 'running'):
+                still_in_use.append((folder, job_id))
+            else:
+                shutil.rmtree(folder, ignore_errors=True)
+        st.session_state.superseded_upload_sets = still_in_use
+
+        # Report progress of the ingestion job
+        if st.session_state.ingestion_job_id and not st.session_state.documents_processed:
+            job = st.session_state.rag_agent.get_job_status(st.session_state.ingestion_job_id)
+            if job['status'] == 'completed':
+                st.success("✅ Documents processed successfully")
+                st.session_state.documents_processed = True
+            elif job['status'] in ('failed', 'error'):
+                st.error(f"❌ Error: {job.get('error', 'Unknown error')}")
+            else:
+                st.progress(job['progress'])
+                st.info(f"⏳ Processing documents... ({job['current_stage'] or 'queued'})")
+                st.button("🔄 Refresh status", key="refresh_ingestion")
         
         # Display currently uploaded files
         st.markdown("#### 📑 Current Documents")
@@ -590,7 +619,8 @@ with tab3:
                 context={
                     "game_type": game_type.lower(),
                     "difficulty": difficulty,
-                    "language": st.session_state.language
+                    "language": st.session_state.language,
+                    "session_id": st.session_state.session_id
                 }
             )
             
@@ -623,7 +653,8 @@ with tab3:
                         "game_type": game_type.lower(),
                         "difficulty": st.session_state.current_difficulty,
                         "language": st.session_state.language,
-                        "request_type": "answer"
+                        "request_type": "answer",
+                        "session_id": st.session_state.session_id
                     }
                 )
                 
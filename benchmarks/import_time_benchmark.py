@@ -0,0 +1,174 @@
+"""
+Import-time benchmark for the app's entry points.
+
+Runs each entry point in a fresh interpreter under `python -X importtime`,
+reports the median cumulative import time and the slowest modules as
+JSON, and exits non-zero when a heavy dependency (torch,
+sentence-transformers, scikit-learn, pandas, PDF/Office readers, plotting)
+is pulled in at import time. That check does not depend on the machine.
+
+Import times over the stored baseline by more than the tolerance are
+reported as timing warnings. Milliseconds differ between machines, so they
+only fail the run with --fail-on-slowdown, e.g. on the machine that
+recorded the baseline. Re-record it with --update-baseline whenever a
+change adds imports to the startup path.
+
+Usage:
+    python -m benchmarks.import_time_benchmark
+    python -m benchmarks.import_time_benchmark --update-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, "benchmarks", "import_time_baseline.json")
+
+# app.py itself cannot be imported outside `streamlit run`, so its entry is the
+# project imports it performs at startup
+ENTRY_POINTS = {
+    'config': "import config.sahayak_config",
+    'agent_router': "import agents.agent_router",
+    'agent_manager': "import agents.agent_manager",
+    'rag_agent': "import agents.rag_agent",
+    'app': ("import agents.agent_manager, agents.agent_router, "
+            "agents.rag_agent, agents.video_agent"),
+}
+
+# Top-level packages that must only be imported when a feature first needs them
+DEFERRED_MODULES = [
+    'torch', 'sentence_transformers', 'transformers', 'sklearn', 'scipy', 'pandas',
+    'PyPDF2', 'docx', 'openpyxl', 'matplotlib', 'networkx',
+]
+
+
+def measure(statement: str) -> Dict:
+    """Import time of one statement in a fresh interpreter"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=ROOT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"'{statement}' failed:\n{result.stderr.strip()[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us)
+        })
+
+    # Top-level imports (depth 0) are disjoint, so their cumulative times add up
+    total_us = sum(m['cumulative_us'] for m in modules if m['depth'] == 0)
+    top_level = {m['module'].split('.')[0] for m in modules}
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'num_modules': len(modules),
+        'deferred_modules_loaded': sorted(top_level & set(DEFERRED_MODULES)),
+        'slowest': [
+            {'module': m['module'], 'self_ms': round(m['self_us'] / 1000, 1)}
+            for m in sorted(modules, key=lambda m: m['self_us'], reverse=True)[:10]
+        ]
+    }
+
+
+def run_benchmark(entry_points: List[str], repeat: int) -> Dict:
+    results = {}
+    for name in entry_points:
+        # Report the median run: a single fast or slow run is mostly disk and scheduler noise
+        runs = sorted((measure(ENTRY_POINTS[name]) for _ in range(repeat)), key=lambda run: run['total_ms'])
+        result = runs[(len(runs) - 1) // 2]
+        result['total_ms'] = round(statistics.median(run['total_ms'] for run in runs), 1)
+        result['runs_ms'] = [run['total_ms'] for run in runs]
+        # A heavy module loaded in any run is a regression, not noise
+        result['deferred_modules_loaded'] = sorted({module for run in runs
+                                                    for module in run['deferred_modules_loaded']})
+        results[name] = result
+    return results
+
+
+def find_regressions(results: Dict) -> List[str]:
+    return [f"{name}: imports {', '.join(result['deferred_modules_loaded'])} at startup"
+            for name, result in results.items() if result['deferred_modules_loaded']]
+
+
+def find_slowdowns(results: Dict, baseline: Dict, tolerance: float, slack_ms: float) -> List[str]:
+    slowdowns = []
+    for name, result in results.items():
+        budget = baseline.get(name)
+        if budget is not None:
+            limit = budget * (1 + tolerance) + slack_ms
+            if result['total_ms'] > limit:
+                slowdowns.append(f"{name}: median {result['total_ms']}ms exceeds baseline {budget}ms "
+                                 f"(limit {round(limit, 1)}ms)")
+    return slowdowns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure and guard import time of the app's entry points")
+    parser.add_argument('--entry-point', action='append', choices=sorted(ENTRY_POINTS),
+                        help="Entry point to measure (repeatable; default: all)")
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="JSON file mapping entry point to its baseline import time in ms")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown over the baseline")
+    parser.add_argument('--slack-ms', type=float, default=50.0,
+                        help="Allowed absolute slowdown, absorbs noise on fast entry points")
+    parser.add_argument('--fail-on-slowdown', action='store_true',
+                        help="Also fail when a median import time exceeds the baseline limit")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Record this run as the new baseline instead of checking it")
+    parser.add_argument('--output', help="Write the JSON report to this path as well as stdout")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.entry_point or list(ENTRY_POINTS), args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    regressions = find_regressions(results)
+    slowdowns = [] if args.update_baseline else find_slowdowns(results, baseline, args.tolerance, args.slack_ms)
+    if args.fail_on_slowdown:
+        regressions += slowdowns
+    report = {
+        'benchmark': 'import_time',
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'entry_points': results,
+        'baseline_ms': baseline,
+        'timing_warnings': slowdowns,
+        'regressions': regressions
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline.update({name: result['total_ms'] for name, result in results.items()})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+    for slowdown in slowdowns:
+        if not args.fail_on_slowdown:
+            print(f"WARNING {slowdown}", file=sys.stderr)
+    if regressions:
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+End-to-end load test for AgentManager.
+
+Replays a weighted request mix against AgentManager.process_request with
+the simulated LLM backend swapped in (no API calls), using open-loop
+arrivals: requests are sent on a Poisson or constant schedule whether or
+not earlier ones have finished, and latency is measured from each
+request's scheduled arrival so queueing is never hidden.
+
+The mix comes from a YAML/JSON scenario (see benchmarks/scenarios/) or
+from a JSON dump of AgentManager.execution_history. The report covers
+throughput, latency percentiles overall and per agent, scheduler queue
+wait and depth, and rate-limiter waits, as JSON.
+
+Usage:
+    python -m benchmarks.load_test benchmarks/scenarios/staff_room.yaml --output load.json
+    python -m benchmarks.load_test --history history.json --rate 5 --duration 60
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.rag_benchmark import git_commit, percentiles_ms
+from config.sahayak_config import SahayakConfig
+from agents.agent_manager import AgentManager
+from agents.llm_backend import SimulatedBackend, set_llm_backend
+from agents.rate_limiter import get_rate_limiter_stats
+from agents.task_scheduler import TaskPriority
+
+
+def load_scenario(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required. Please install it using 'pip install pyyaml'")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def scenario_from_history(path: str) -> Dict:
+    """Equal-weight mix of the requests in an execution_history dump"""
+    with open(path, 'r', encoding='utf-8') as f:
+        history = json.load(f)
+    requests = [{'request': entry['request'], 'context': entry.get('context') or {}}
+                for entry in history if entry.get('request')]
+    return {'name': os.path.splitext(os.path.basename(path))[0], 'requests': requests}
+
+
+def arrival_times(process: str, rate: float, duration: float, rng: random.Random) -> List[float]:
+    """Scheduled send times in seconds from the start of the run"""
+    times, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate) if process == 'poisson' else 1.0 / rate
+        if t >= duration:
+            return times
+        times.append(t)
+
+
+def apply_config_overrides(overrides: Dict):
+    """Merge e.g. {'SCHEDULER_CONFIG': {'max_queue_size': 500}} into SahayakConfig"""
+    for attribute, values in (overrides or {}).items():
+        current = getattr(SahayakConfig, attribute)
+        if isinstance(current, dict):
+            current.update(values)
+        else:
+            setattr(SahayakConfig, attribute, values)
+
+
+def run_load_test(scenario: Dict, args) -> Dict:
+    apply_config_overrides(scenario.get('config_overrides'))
+    backend_config = {**SahayakConfig.LLM_BACKEND_CONFIG['simulated'], **scenario.get('backend', {})}
+    set_llm_backend(SimulatedBackend(**backend_config))
+
+    manager = AgentManager()
+    rng = random.Random(scenario.get('seed', 0))
+    arrival = scenario.get('arrival', {})
+    rate = args.rate or arrival.get('rate_per_second', 2.0)
+    duration = args.duration or scenario.get('duration_seconds', 30)
+    num_teachers = scenario.get('teachers', 20)
+
+    mix = scenario['requests']
+    weights = [item.get('weight', 1) for item in mix]
+    schedule = arrival_times(arrival.get('process', 'poisson'), rate, duration, rng)
+    picks = rng.choices(range(len(mix)), weights=weights, k=len(schedule))
+
+    results = []
+    results_lock = threading.Lock()
+    depth_samples = []
+    stop_sampling = threading.Event()
+
+    def sample_queue_depth():
+        while not stop_sampling.wait(0.25):
+            stats = manager.scheduler.get_stats()
+            depth_samples.append((stats['pending'], stats['running']))
+
+    def send(index: int, scheduled_at: float):
+        item = mix[picks[index]]
+        context = {**(item.get('context') or {}), 'teacher_id': f"teacher-{index % num_teachers}"}
+        priority = TaskPriority[item.get('priority', 'NORMAL')]
+        response = manager.process_request(item['request'], context, priority)
+        finished_at = time.perf_counter()
+        with results_lock:
+            results.append({
+                'agent': response.agent_name,
+                'success': response.success,
+                'error': response.error,
+                'latency': finished_at - scheduled_at,
+                'queue_wait': (response.metadata or {}).get('queue_wait')
+            })
+
+    sampler = threading.Thread(target=sample_queue_depth, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.max_in_flight) as executor:
+        for index, offset in enumerate(schedule):
+            scheduled_at = start + offset
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, index, scheduled_at)
+    elapsed = time.perf_counter() - start
+    stop_sampling.set()
+
+    by_agent = {}
+    for result in results:
+        by_agent.setdefault(result['agent'], []).append(result)
+
+    def summarize(group: List[Dict]) -> Dict:
+        successes = [r for r in group if r['success']]
+        queue_waits = [r['queue_wait'] for r in group if r['queue_wait'] is not None]
+        errors = {}
+        for r in group:
+            if not r['success']:
+                key = (r['error'] or 'unknown')[:80]
+                errors[key] = errors.get(key, 0) + 1
+        return {
+            'requests': len(group),
+            'successful': len(successes),
+            'error_rate': round(1 - len(successes) / len(group), 4) if group else 0.0,
+            'latency_ms': percentiles_ms([r['latency'] for r in group]) if group else None,
+            'queue_wait_ms': percentiles_ms(queue_waits) if queue_waits else None,
+            'errors': errors
+        }
+
+    pending = [p for p, _ in depth_samples] or [0]
+    running = [r for _, r in depth_samples] or [0]
+    throttling = {}
+    for agent_type, agent in manager.agents.items():
+        stats = agent.get_stats()
+        throttling[agent_type.value] = {
+            'waits': stats['throttle_waits'],
+            'wait_seconds': stats['throttle_wait_seconds']
+        }
+
+    return {
+        'benchmark': 'agent_manager_load',
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'scenario': scenario.get('name', 'unnamed'),
+        'config': {
+            'arrival_process': arrival.get('process', 'poisson'),
+            'rate_per_second': rate,
+            'duration_seconds': duration,
+            'teachers': num_teachers,
+            'backend': backend_config,
+            'scheduler': SahayakConfig.SCHEDULER_CONFIG
+        },
+        'offered_requests': len(schedule),
+        'completed_requests': len(results),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(sum(r['success'] for r in results) / elapsed, 3) if elapsed else None,
+        'overall': summarize(results),
+        'by_agent': {agent: summarize(group) for agent, group in sorted(by_agent.items())},
+        'queue_depth': {
+            'pending_max': int(max(pending)),
+            'pending_mean': round(float(np.mean(pending)), 2),
+            'pending_p95': round(float(np.percentile(pending, 95)), 2),
+            'running_max': int(max(running))
+        },
+        'rate_limiting': {
+            'model_limiters': get_rate_limiter_stats(),
+            'agent_throttling': throttling
+        },
+        'manager_stats': manager.get_agent_stats()['latency']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test of AgentManager on the simulated backend")
+    parser.add_argument('scenario', nargs='?', help="YAML or JSON scenario file")
+    parser.add_argument('--history', help="Replay requests from a JSON dump of execution_history instead")
+    parser.add_argument('--rate', type=float, help="Arrivals per second (overrides the scenario)")
+    parser.add_argument('--duration', type=float, help="Seconds of arrivals (overrides the scenario)")
+    parser.add_argument('--max-in-flight', type=int, default=500,
+                        help="Client threads; arrivals beyond this wait client-side, still timed from arrival")
+    parser.add_argument('--output', help="Write the JSON report to this path as well as stdout")
+    args = parser.parse_args()
+
+    if not args.scenario and not args.history:
+        parser.error("a scenario file or --history is required")
+    scenario = scenario_from_history(args.history) if args.history else load_scenario(args.scenario)
+
+    report = run_load_test(scenario, args)
+    print(json.dumps(report, indent=2, default=str))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
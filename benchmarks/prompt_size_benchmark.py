@@ -0,0 +1,145 @@
+"""
+Prompt-size benchmark for the templates in agents/prompts.py.
+
+Renders every registered template with representative values and reports
+its size in characters and input tokens as JSON: the whole prompt, the
+static instructions alone, and the share of the prompt that is a fixed
+prefix (what context caching can reuse). Exits non-zero when a template
+grows more than the tolerance over benchmarks/prompt_size_baseline.json
+or has no sample values here.
+
+Tokens are estimated at about 4 characters each by default; with
+--count-with backend they are counted by the configured LLM backend
+(Gemini's count_tokens, which needs GOOGLE_API_KEY).
+
+Usage:
+    python -m benchmarks.prompt_size_benchmark
+    python -m benchmarks.prompt_size_benchmark --update-baseline
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from config.sahayak_config import SahayakConfig
+from agents.prompts import get_prompt, list_prompts
+from agents.usage_accounting import estimate_tokens
+
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, "benchmarks", "prompt_size_baseline.json")
+
+PAGE_CONTENT = ("Plants make their own food by photosynthesis. Leaves take in carbon dioxide from the air, "
+                "roots absorb water from the soil, and chlorophyll captures sunlight. The plant turns these "
+                "into glucose and releases oxygen.")
+
+# Representative values per template, sized like real requests
+SAMPLE_VALUES = {
+    'router.intent': {'request': "Explain photosynthesis to my grade 5 class in Hindi"},
+    'lesson_planner.weekly_plan': {'language': "Hindi", 'subjects': "mathematics, science",
+                                   'grades': "3, 4", 'total_hours': 30},
+    'lesson_planner.daily_schedule': {'date': "2024-07-01", 'subjects': "mathematics, science",
+                                      'special_events': "assembly"},
+    'vision.extract_text': {},
+    'vision.worksheet': {'grade': 4, 'content': PAGE_CONTENT},
+    'vision.worksheets_multi_grade': {'grades': "3, 4, 5", 'content': PAGE_CONTENT},
+    'content.story': {'language': "Hindi", 'grade_level': 5, 'age': 11, 'setting': "rural",
+                      'topic': "water cycle"},
+    'content.explanation': {'language': "Hindi", 'difficulty': "medium", 'concept': "gravity"},
+    'doubt.answer': {'language': "Hindi", 'native_name': "हिन्दी", 'context': "rural",
+                     'adaptations': "local examples, simple language", 'grade_level': 5,
+                     'question': "Why is the sky blue?"},
+    'drawings.diagram_instructions': {'diagram_type': "simple_drawing", 'concept': "water cycle"},
+    'drawings.visual_aid_plan': {'grades': "3, 4", 'topic': "water cycle"},
+    'mindmap.topic': {'language': "Hindi", 'topic': "photosynthesis"},
+    'ocr.pages': {'num_pages': 4},
+    'rag.answer': {'context': " ".join([PAGE_CONTENT] * 3), 'question': "How do plants make food?"},
+    'structured.repair': {'error': "RouteDecision.confidence is missing",
+                          'response': '{"agent_type": "doubt_assistant", "parameters": {"language": "hindi"}, '
+                                      '"reasoning": "A question about a concept"}'},
+}
+
+
+def measure(name: str, count_tokens: Callable[[str], int]) -> Dict:
+    template = get_prompt(name)
+    prompt = template.render(**SAMPLE_VALUES[name])
+    return {
+        'chars': len(prompt),
+        'tokens': count_tokens(prompt),
+        'static_tokens': count_tokens(template.static_text),
+        'static_prefix_share': round(len(template.static_prefix) / len(prompt), 3) if prompt else 0.0,
+        'fields': list(template.fields)
+    }
+
+
+def find_regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        budget = baseline.get(name)
+        if budget is not None and result['tokens'] > budget * (1 + tolerance):
+            regressions.append(f"{name}: {result['tokens']} tokens exceeds baseline {budget} "
+                               f"(+{round(tolerance * 100)}% allowed)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure and guard the input size of prompt templates")
+    parser.add_argument('--count-with', choices=['estimate', 'backend'], default='estimate',
+                        help="Estimate tokens offline, or count them with the configured LLM backend")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="JSON file mapping template name to its baseline token count")
+    parser.add_argument('--tolerance', type=float, default=0.05,
+                        help="Allowed relative growth over the baseline")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Record this run as the new baseline instead of checking it")
+    parser.add_argument('--output', help="Write the JSON report to this path as well as stdout")
+    args = parser.parse_args()
+
+    if args.count_with == 'backend':
+        from agents.llm_backend import get_llm_backend
+        backend = get_llm_backend()
+        count_tokens = lambda text: backend.count_tokens(SahayakConfig.DEFAULT_MODEL, text)
+    else:
+        count_tokens = estimate_tokens
+
+    unmeasured = [name for name in list_prompts() if name not in SAMPLE_VALUES]
+    results = {name: measure(name, count_tokens) for name in list_prompts() if name in SAMPLE_VALUES}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    regressions = [] if args.update_baseline else find_regressions(results, baseline, args.tolerance)
+    regressions += [f"{name}: no sample values in SAMPLE_VALUES" for name in unmeasured]
+    report = {
+        'benchmark': 'prompt_size',
+        'timestamp': datetime.now().isoformat(),
+        'token_counter': args.count_with,
+        'templates': results,
+        'total_tokens': sum(result['tokens'] for result in results.values()),
+        'baseline_tokens': baseline,
+        'regressions': regressions
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.update_baseline:
+        baseline.update({name: result['tokens'] for name, result in results.items()})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+    if regressions:
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
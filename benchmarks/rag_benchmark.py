@@ -0,0 +1,194 @@
+"""
+RAG ingestion and retrieval benchmark.
+
+Builds a synthetic corpus, ingests it into a RAGAgent that uses a
+deterministic hashing encoder (no model download, no API calls), and
+reports ingestion throughput, index size, query latency percentiles and
+recall@k as JSON. Each query is drawn from one corpus chunk, which is its
+relevant result, so recall does not depend on the search being measured.
+
+Usage:
+    python -m benchmarks.rag_benchmark --num-chunks 100000 --output bench.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from agents.ingestion_queue import IngestionJob
+from agents.rag_agent import RAGAgent
+
+
+class HashingEncoder:
+    """Deterministic stand-in for SentenceTransformer
+
+    Each token is hashed with crc32 into one of `buckets` fixed random
+    vectors; a text embeds to the sum of its token vectors. Texts sharing
+    words land close together, which is all retrieval benchmarks need.
+    """
+
+    def __init__(self, dim: int = 384, buckets: int = 1 << 16, seed: int = 0):
+        self.dim = dim
+        self.buckets = buckets
+        self.projection = np.random.default_rng(seed).standard_normal((buckets, dim)).astype(np.float32)
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = [zlib.crc32(token.encode()) % self.buckets for token in text.split()]
+            if ids:
+                embeddings[row] = self.projection[ids].sum(axis=0)
+        return embeddings
+
+
+def generate_corpus(num_chunks: int, words_per_chunk: int, vocab_size: int, num_topics: int,
+                    seed: int) -> List[str]:
+    """Topic-clustered chunks of Zipf-distributed words"""
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    topic_offsets = rng.integers(0, vocab_size, size=num_topics)
+    topics = rng.integers(0, num_topics, size=num_chunks)
+
+    chunks = []
+    for topic in topics:
+        ranks = rng.zipf(1.3, size=words_per_chunk) - 1
+        word_ids = (topic_offsets[topic] + ranks) % vocab_size
+        chunks.append(" ".join(vocab[word_ids]))
+    return chunks
+
+
+def generate_queries(corpus: List[str], num_queries: int, words_per_query: int,
+                     seed: int) -> Tuple[List[str], List[int]]:
+    """Queries are word subsets of random corpus chunks; returns them with their source chunk ids"""
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    chunk_ids = rng.integers(0, len(corpus), size=num_queries).tolist()
+    for chunk_id in chunk_ids:
+        words = corpus[chunk_id].split()
+        picked = rng.choice(len(words), size=min(words_per_query, len(words)), replace=False)
+        queries.append(" ".join(words[i] for i in sorted(picked)))
+    return queries, chunk_ids
+
+
+def percentiles_ms(samples: List[float]) -> Dict[str, float]:
+    values = np.array(samples) * 1000
+    return {
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'mean': round(float(values.mean()), 3),
+        'max': round(float(values.max()), 3)
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return 'unknown'
+
+
+def run_benchmark(args) -> Dict:
+    encoder = HashingEncoder(dim=args.dim, seed=args.seed)
+    agent = RAGAgent(embedding_model=encoder)
+    agent.kb_dir = tempfile.mkdtemp(prefix="rag_benchmark_")
+
+    corpus = generate_corpus(args.num_chunks, args.words_per_chunk, args.vocab_size, args.num_topics, args.seed)
+    queries, relevant_chunks = generate_queries(corpus, args.num_queries, args.words_per_query, args.seed)
+
+    # Ingestion: embed and index the corpus as a sequence of synthetic files
+    job = IngestionJob('benchmark', 'synthetic corpus')
+    start = time.perf_counter()
+    for file_idx, offset in enumerate(range(0, len(corpus), args.chunks_per_file)):
+        chunks = corpus[offset:offset + args.chunks_per_file]
+        with job.stage('embedding'):
+            embeddings = agent._compute_embeddings(chunks)
+        with job.stage('indexing'):
+            agent._index_chunks(f"synthetic_{file_idx}.txt", chunks, [{} for _ in chunks], [embeddings])
+    ingestion_seconds = time.perf_counter() - start
+
+    # Index size in memory and on disk
+    embeddings = agent.knowledge_base['embeddings']
+    save_start = time.perf_counter()
+    save_result = agent.save_knowledge_base()
+    save_seconds = time.perf_counter() - save_start
+    disk_bytes = os.path.getsize(save_result['save_path']) if save_result['status'] == 'success' else None
+
+    # Warm-up query: the first search pays one-off imports and allocations
+    agent.retrieve(queries[0], args.k)
+
+    # Query latency, and recall of each query's source chunk in the top k
+    # (rows are in corpus order: chunks were indexed in order, none removed)
+    latencies = []
+    hits = 0
+    for query, relevant_chunk in zip(queries, relevant_chunks):
+        query_start = time.perf_counter()
+        retrieved = agent.retrieve(query, args.k)
+        latencies.append(time.perf_counter() - query_start)
+
+        hits += any(index == relevant_chunk for index, _ in retrieved)
+
+    if disk_bytes is not None:
+        os.remove(save_result['save_path'])
+    os.rmdir(agent.kb_dir)
+
+    return {
+        'benchmark': 'rag_retrieval',
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'config': vars(args),
+        'ingestion': {
+            'num_chunks': len(corpus),
+            'seconds': round(ingestion_seconds, 3),
+            'chunks_per_second': round(len(corpus) / ingestion_seconds, 1),
+            'stage_seconds': {name: round(seconds, 3) for name, seconds in job.stage_timings.items()}
+        },
+        'index_size': {
+            'embedding_bytes': int(embeddings.nbytes),
+            'embedding_buffer_bytes': int(agent._embedding_buffer.nbytes),
+            'document_bytes': sum(len(chunk.encode('utf-8')) for chunk in corpus),
+            'disk_bytes': disk_bytes,
+            'save_seconds': round(save_seconds, 3)
+        },
+        'query_latency_ms': percentiles_ms(latencies),
+        f'recall_at_{args.k}': round(hits / len(queries), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAGAgent ingestion and retrieval on a synthetic corpus")
+    parser.add_argument('--num-chunks', type=int, default=1000)
+    parser.add_argument('--num-queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--words-per-chunk', type=int, default=60)
+    parser.add_argument('--words-per-query', type=int, default=8)
+    parser.add_argument('--vocab-size', type=int, default=50000)
+    parser.add_argument('--num-topics', type=int, default=200)
+    parser.add_argument('--chunks-per-file', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the JSON report to this path as well as stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -199,7 +199,12 @@ class SahayakConfig:
             'supported_formats': ['jpg', 'jpeg', 'png', 'webp'],
             'max_file_size_mb': 10,
             'ocr_languages': ['hi', 'en', 'mr', 'gu'],
-            'worksheet_difficulty_levels': 3
+            'worksheet_difficulty_levels': 3,
+            'worksheet_mode': 'per_grade',  # or 'single_prompt': all grades in one response
+            'worksheet_max_concurrency': 3,
+            'digitize_max_concurrency': 4,  # pages extracted at once by digitize_textbook
+            'extraction_cache': True,  # extractions shared across processes in data/extraction_cache
+            'extraction_cache_max_distance': None  # exact matches only; an int allows perceptual matches differing in that many bits (of 256)
         },
         'audio_agent': {
             'supported_formats': ['mp3', 'wav', 'm4a'],
@@ -218,6 +223,16 @@ class SahayakConfig:
             'include_activities': True,
             'resource_suggestions': True,
             'assessment_integration': True
+        },
+        'rag_agent': {
+            'ingestion_workers': 2,
+            'max_jobs_kept': 100,
+            'ocr_enabled': True,
+            'ocr_min_text_chars': 20,  # Pages with less extractable text are treated as scans
+            'ocr_batch_size': 4,
+            'ocr_max_concurrency': 3,
+            'excel_rows_per_chunk': 50,
+            'embedding_batch_size': 256
         }
     }
     
@@ -234,13 +249,121 @@ class SahayakConfig:
     # Performance and Monitoring
     PERFORMANCE_CONFIG = {
         'max_response_time_seconds': 30,
+        'router_timeout_seconds': 10,  # routing falls back to keywords rather than wait the full deadline
         'retry_attempts': 3,
+        'retry_backoff_base_seconds': 0.5,  # doubled per attempt, with +/-50% jitter
+        'retry_backoff_max_seconds': 8.0,
+        'hedge_requests': False,  # send a second request when the first exceeds the model's p95
+        'hedge_min_delay_seconds': 1.0,
+        'hedge_min_samples': 20,
         'cache_enabled': True,
         'cache_expiry_minutes': 60,
         'log_level': 'INFO',
-        'metrics_collection': True
+        'metrics_collection': True,
+        'execution_history_size': 1000,
+        'coalesce_requests': True,  # identical concurrent model calls share one upstream request
+        'structured_output_repair_attempts': 1,  # repair requests after a JSON response fails validation
+        'warm_up_agents': []  # AgentType values to construct in the background at startup
     }
     
+    # Agent task scheduling (see agents/task_scheduler.py)
+    SCHEDULER_CONFIG = {
+        'default_workers': 2,
+        'workers_per_agent': {
+            'doubt_assistant': 4,
+            'content_generation': 3,
+            'vision_agent': 2,
+            'rag': 2
+        },
+        'max_queue_size': 100,
+        'max_pending_per_teacher': 10
+    }
+    
+    # Model backend: 'gemini', or 'simulated' for offline load testing (see agents/llm_backend.py)
+    LLM_BACKEND_CONFIG = {
+        'backend': os.getenv('SAHAYAK_LLM_BACKEND', 'gemini'),
+        'simulated': {
+            'latency': {'distribution': 'lognormal', 'median_seconds': 0.8, 'sigma': 0.4},
+            'latency_by_agent': {
+                'Vision Agent': {'distribution': 'lognormal', 'median_seconds': 2.5, 'sigma': 0.5},
+                'Intent Router': {'distribution': 'lognormal', 'median_seconds': 0.4, 'sigma': 0.3}
+            },
+            'error_rate': 0.0,
+            'error_codes': [429, 503],
+            'responses': {},  # agent name -> template using {agent}, {model}, {prompt}, {prompt_excerpt}
+            'seed': 0
+        }
+    }
+
+    # Images are downscaled and re-encoded before upload (see agents/image_preprocessing.py).
+    # Gemini splits large images into 768 px tiles billed per tile, so a full-resolution
+    # phone photo costs upload time and tokens; 2048 px on the longest side keeps textbook
+    # print legible
+    IMAGE_PREPROCESSING_CONFIG = {
+        'enabled': True,
+        'max_dimension': 2048,
+        'format': 'jpeg',  # or 'webp'
+        'quality': 85,
+        'cache_mb': 64  # prepared images kept in memory, keyed by source hash
+    }
+
+    # Gemini context caching of static prompt prefixes (see agents/context_cache.py).
+    # The API rejects caches below a minimum size (4096 tokens for current Flash
+    # models), so shorter prefixes are sent inline as usual
+    CONTEXT_CACHE_CONFIG = {
+        'enabled': os.getenv('SAHAYAK_CONTEXT_CACHE', 'true').lower() in ('1', 'true', 'yes'),
+        'ttl_seconds': 600,
+        'refresh_margin_seconds': 60,  # extend the TTL when a used cache is this close to expiring
+        'min_prefix_tokens': 4096,
+        'retry_after_seconds': 300  # after a failed cache creation, send full prompts this long
+    }
+
+    # Request tracing (see agents/tracing.py); spans cost nothing while disabled
+    TRACING_CONFIG = {
+        'enabled': os.getenv('SAHAYAK_TRACING', '').lower() in ('1', 'true', 'yes'),
+        'exporters': ['console'],  # 'console' logs each span, 'json' appends JSON lines
+        'json_path': None  # default: data/traces/spans_<pid>.jsonl
+    }
+
+    # Token and cost accounting (see agents/usage_accounting.py)
+    USAGE_CONFIG = {
+        'enabled': True,
+        # Daily token limits, reset at local midnight. Each is None (no limit),
+        # one number for every key, or a dict of limits per key; 'agent' and
+        # 'method' keys are agent names like 'Lesson Planner'
+        'daily_token_budgets': {
+            'total': None,
+            'teacher': None,
+            'session': None,
+            'agent': None,
+            'language': None,
+            'model': None,
+            'method': None
+        },
+        'teacher_token_budgets': {},  # per-teacher overrides, e.g. {'teacher-42': 200000}
+        # USD per million tokens, e.g. {'gemini-2.0-flash': {'input': 0.10, 'output': 0.40}};
+        # models without prices are charged their ModelConfig.cost_per_request
+        'token_prices_per_million': {},
+        'recent_calls': 500
+    }
+
+    # Per-model circuit breakers (see agents/circuit_breaker.py)
+    CIRCUIT_BREAKER_CONFIG = {
+        'enabled': True,
+        'window_seconds': 60,
+        'min_calls': 10,
+        'failure_rate_threshold': 0.5,
+        'slow_call_seconds': 15,
+        'slow_call_rate_threshold': 0.8,
+        'open_seconds': 30,
+        'half_open_max_calls': 1,
+        # Tried in order while a model's circuit is open, before the tier's other models
+        'fallback_models': {
+            'gemini-2.0-flash': ['gemini-1.5-flash'],
+            'gemini-1.5-pro': ['gemini-2.0-flash'],
+        }
+    }
+
     # Security Configuration
     SECURITY_CONFIG = {
         'max_requests_per_minute': 60,